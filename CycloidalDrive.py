@@ -3,17 +3,194 @@
 #
 # Copyright (C) 2018  Martin Muehlhaeuser <github@mmone.de>
 
-from .packages.cycloidal import CycloidalComponent
-from .packages.cycloidal.components import PrinterConfig
-from .packages.cycloidal.components import DriveConfig
+from .packages.cycloidal import HandlerRegistry
 import adsk.core, adsk.fusion, adsk.cam, traceback
+import importlib, time
+
+# Modules are imported on first use so that run() only registers the command
+# at Fusion startup, see LoadModules. The names are bound to the modules then.
+_LAZY_MODULES = {
+    'CycloidalComponent': '.packages.cycloidal.CycloidalComponent',
+    'CompoundDrive': '.packages.cycloidal.CompoundDrive',
+    'ComponentCache': '.packages.cycloidal.ComponentCache',
+    'DriveRegistry': '.packages.cycloidal.DriveRegistry',
+    'PrinterConfig': '.packages.cycloidal.components.PrinterConfig',
+    'DriveConfig': '.packages.cycloidal.components.DriveConfig',
+    'DriveValidator': '.packages.cycloidal.components.DriveValidator',
+    'DriveGeometry': '.packages.cycloidal.components.DriveGeometry',
+    'Optimizer': '.packages.cycloidal.analysis.Optimizer',
+    'StageSolver': '.packages.cycloidal.analysis.StageSolver'
+}
+
+# seconds spent importing each lazy module
+_import_seconds = {}
+
+def LoadModules(*names):
+    missing = [name for name in names if name not in _import_seconds]
+    for name in missing:
+        start = time.perf_counter()
+        globals()[name] = importlib.import_module(_LAZY_MODULES[name], __package__)
+        _import_seconds[name] = time.perf_counter() - start
+
+    log = getattr(_app, 'log', None)
+    if log and missing:
+        log('CycloidalDrive imports: {:.3f}s total, {}'.format(
+            sum(_import_seconds.values()),
+            ', '.join('{} {:.3f}s'.format(n, s) for n, s in _import_seconds.items())
+        ))
 
 # Globals
 _app = None
 _ui = None
 _units = ''
 
-_handlers = []
+# the command created handler lives as long as the add-in, the dialog
+# handlers only for one invocation of the command
+_handlers = HandlerRegistry.HandlerRegistry('add-in')
+_command_handlers = HandlerRegistry.HandlerRegistry('command')
+
+# dialog state dropped when the command is destroyed
+_COMMAND_GLOBALS = [
+    '_roller_count', '_roller_diameter', '_roller_spacing', '_create_select', '_cam_bearing_outer_dia',
+    '_cam_bearing_inner_dia', '_ring_bolt_count', '_ring_bolt_dia', '_disc_bolt_count', '_disc_bolt_dia',
+    '_output_pin_diameter', '_instance_rollers', '_keep_history', '_in_memory_solids',
+    '_target_ratio', '_max_outer_dia', '_err_message', '_drive_config', '_info_message',
+    '_drive_select', '_drive_ids', '_edit_drive_id', '_disc_count', '_stage_count',
+    '_stage_solution', '_stage_key', '_use_cache'
+]
+
+def ReleaseCommand():
+    _command_handlers.Release()
+    for name in _COMMAND_GLOBALS:
+        globals()[name] = None
+
+def LogHandlerStats(event):
+    log = getattr(_app, 'log', None)
+    if log:
+        log('CycloidalDrive {}: {}'.format(event, HandlerRegistry.HandlerRegistry.Stats()))
+
+def CreatePrinterConfig():
+    return PrinterConfig.PrinterConfig(0.4, 0.2)
+
+# copies the dialog values into drive_config
+def ReadInputs(drive_config):
+    drive_config.roller_count = _roller_count.value
+    drive_config.roller_diameter = _roller_diameter.value
+    drive_config.roller_spacing = _roller_spacing.value
+    drive_config.output_pin_diameter = _output_pin_diameter.value
+
+    drive_config.cam_bearing_outer_diameter = _cam_bearing_outer_dia.value
+    drive_config.cam_bearing_inner_diameter = _cam_bearing_inner_dia.value
+    drive_config.disc_count = _disc_count.value
+
+    drive_config.ring_bolt_count = _ring_bolt_count.value
+    drive_config.ring_bolt_diameter = _ring_bolt_dia.value
+    drive_config.disc_bolt_count = _disc_bolt_count.value
+    drive_config.disc_bolt_diameter = _disc_bolt_dia.value
+
+    drive_config.components.clear()
+    for item in _create_select.listItems:
+        if(item.isSelected):
+            drive_config.components.add(item.name)
+
+    drive_config.instance_rollers = _instance_rollers.value
+    drive_config.keep_history = _keep_history.value
+    drive_config.solid_backend = 'brep' if _in_memory_solids.value else 'features'
+
+# shows the values of drive_config in the dialog
+def WriteInputs(drive_config):
+    _roller_count.value = drive_config.roller_count
+    _roller_diameter.value = drive_config.roller_diameter
+    _roller_spacing.value = drive_config.roller_spacing
+    _output_pin_diameter.value = drive_config.output_pin_diameter
+
+    _cam_bearing_outer_dia.value = drive_config.cam_bearing_outer_diameter
+    _cam_bearing_inner_dia.value = drive_config.cam_bearing_inner_diameter
+    _disc_count.value = drive_config.disc_count
+
+    _ring_bolt_count.value = drive_config.ring_bolt_count
+    _ring_bolt_dia.value = drive_config.ring_bolt_diameter
+    _disc_bolt_count.value = drive_config.disc_bolt_count
+    _disc_bolt_dia.value = drive_config.disc_bolt_diameter
+
+    for item in _create_select.listItems:
+        item.isSelected = item.name in drive_config.components
+
+    _instance_rollers.value = drive_config.instance_rollers
+    _keep_history.value = drive_config.keep_history
+    _in_memory_solids.value = drive_config.solid_backend == 'brep'
+
+# the dialog settings a compound drive is solved for
+def StageKey(base_config):
+    return (base_config.Fingerprint(), _stage_count.value, _target_ratio.value, _max_outer_dia.value)
+
+# description of a drive component
+def DriveDescription(drive_config):
+    desc = 'Cycloadial Drive;  '
+    desc += str(drive_config.roller_count) + 'D: ' + str(drive_config.roller_diameter) + 'S: ' + str(drive_config.roller_spacing) + ';'
+    return desc
+
+# solves the stages of a compound drive for the target ratio and envelope,
+# returns the best solution
+def SolveStages(base_config):
+    LoadModules('StageSolver')
+
+    solver = StageSolver.StageSolver(CreatePrinterConfig(), base_config)
+    solutions = solver.Solve(_target_ratio.value, _stage_count.value, _max_outer_dia.value, ratio_tolerance = 0.5)
+    if not solutions:
+        _info_message.text = 'No {} stage drive fits the target ratio and outer diameter.'.format(_stage_count.value)
+        return None
+
+    lines = ['<b>{} stage solutions</b>'.format(len(solutions))]
+    for s in solutions[:5]:
+        lines.append('{} - {}:1, {}mm, {}g'.format(
+            ' + '.join('{}x{}mm'.format(c.roller_count, round(c.roller_diameter * 10.0, 2)) for c in s.configs),
+            s.ratio,
+            round(s.outer_diameter * 10.0, 1),
+            round(s.mass, 1)
+        ))
+    _info_message.text = '<br>'.join(lines)
+    return solutions[0]
+
+# searches rollers for the target ratio and envelope and applies the best candidate
+def RunOptimizer():
+    base_config = DriveConfig.DriveConfig()
+    base_config.Load(_drive_config.ToString())
+    ReadInputs(base_config)
+
+    # the inputs stay on the base config the stages are solved from, Execute
+    # builds the solution shown here as long as they don't change
+    if _stage_count.value > 1:
+        global _stage_solution, _stage_key
+        _stage_solution = SolveStages(base_config)
+        _stage_key = StageKey(base_config)
+        return
+
+    LoadModules('Optimizer')
+
+    optimizer = Optimizer.Optimizer(CreatePrinterConfig(), base_config)
+    candidates = optimizer.Optimize(_target_ratio.value, _max_outer_dia.value, ratio_tolerance = 0.5)
+    if not candidates:
+        _info_message.text = 'No drive fits the target ratio and outer diameter.'
+        return
+
+    best = candidates[0].config
+    _roller_count.value = best.roller_count
+    _roller_diameter.value = best.roller_diameter
+    _roller_spacing.value = best.roller_spacing
+
+    lines = ['<b>{} Pareto candidates</b>'.format(len(candidates))]
+    for c in candidates[:5]:
+        lines.append('{}x{}mm S: {} - {}:1, {}mm, {}g, {}MPa'.format(
+            c.config.roller_count,
+            round(c.config.roller_diameter * 10.0, 2),
+            round(c.config.roller_spacing, 2),
+            c.ratio,
+            round(c.outer_diameter * 10.0, 1),
+            round(c.mass, 1),
+            round(c.stress * 1e-6, 1)
+        ))
+    _info_message.text = '<br>'.join(lines)
 
 def run(context):
     try:
@@ -21,7 +198,7 @@ def run(context):
         _app = adsk.core.Application.get()
         _ui  = _app.userInterface
 
-        cmd_def = _ui.commandDefinitions.itemById('adskCycloidalDrive')
+        cmd_def = _ui.commandDefinitions.itemById('mmoneCycloidalDrive')
         if not cmd_def:
             cmd_def = _ui.commandDefinitions.addButtonDefinition(
                 'mmoneCycloidalDrive',
@@ -30,9 +207,7 @@ def run(context):
                 'resources/CycloidalDrive') 
         
         # Connect to the command created event.
-        on_command_created = CommandCreatedHandler()
-        cmd_def.commandCreated.add(on_command_created)
-        _handlers.append(on_command_created)
+        _handlers.Add(cmd_def.commandCreated, CommandCreatedHandler())
         
         # Execute the command.
         #cmd_def.execute()
@@ -50,6 +225,10 @@ def run(context):
 
 def stop(context):
     try:        
+        ReleaseCommand()
+        _handlers.Release()
+        LogHandlerStats('stop')
+
         # Delete controls and associated command definitions created by this add-ins
         panel = _ui.allToolbarPanels.itemById('SolidScriptsAddinsPanel')
         cmd = panel.controls.itemById('mmoneCycloidalDrive')
@@ -83,22 +262,50 @@ class CommandCreatedHandler(adsk.core.CommandCreatedEventHandler):
             else:
                 _units = 'mm'
             
+            # handlers of an invocation that was never destroyed
+            ReleaseCommand()
+
+            # everything but the optimizer is needed from here on
+            LoadModules('CycloidalComponent', 'ComponentCache', 'DriveRegistry',
+                'PrinterConfig', 'DriveConfig', 'DriveValidator', 'DriveGeometry')
+
             cmd = event_args.command
             cmd.isExecutedWhenPreEmpted = False
             inputs = cmd.commandInputs
             
             global _roller_count, _roller_diameter, _roller_spacing, _create_select, _cam_bearing_outer_dia, \
             _cam_bearing_inner_dia, _ring_bolt_count, _ring_bolt_dia, _disc_bolt_count, _disc_bolt_dia, \
-            _output_pin_diameter, \
-            _err_message, _drive_config, _info_message
+            _output_pin_diameter, _instance_rollers, _keep_history, _in_memory_solids, \
+            _target_ratio, _max_outer_dia, _err_message, _drive_config, _info_message, \
+            _drive_select, _drive_ids, _edit_drive_id, _disc_count, _stage_count, \
+            _stage_solution, _stage_key, _use_cache
             
+            _stage_solution = None
+            _stage_key = None
+
             # Load existing parameter values
             _drive_config = DriveConfig.DriveConfig()
             drive_config_json = des.attributes.itemByName('CycloidalDrive', 'drive_config')
             if drive_config_json:
                 _drive_config.Load(drive_config_json.value)
 
+            # Open on the drive of the current selection
+            registry = DriveRegistry.DriveRegistry(des)
+            _edit_drive_id = None
+            for i in range(0, _ui.activeSelections.count):
+                _edit_drive_id = registry.DriveOf(_ui.activeSelections.item(i).entity)
+                if _edit_drive_id:
+                    registry.LoadConfig(_edit_drive_id, _drive_config)
+                    break
+
             # Define the command dialog.
+            _drive_select = inputs.addDropDownCommandInput('drive_select', 'Drive', adsk.core.DropDownStyles.TextListDropDownStyle)
+            _drive_ids = [None]
+            _drive_select.listItems.add('New Drive', _edit_drive_id is None)
+            for drive_id, name in registry.Drives():
+                _drive_ids.append(drive_id)
+                _drive_select.listItems.add('{} #{}'.format(name, len(_drive_ids) - 1), drive_id == _edit_drive_id)
+
             _roller_diameter = inputs.addValueInput(
                 'roller_diameter',
                 'Roller Diameter',
@@ -140,6 +347,13 @@ class CommandCreatedHandler(adsk.core.CommandCreatedEventHandler):
                 adsk.core.ValueInput.createByReal(_drive_config.cam_bearing_inner_diameter)
             )
 
+            _disc_count = inputs.addIntegerSpinnerCommandInput(
+                'disc_count',
+                'Number of Discs',
+                1, 3, 1,
+                _drive_config.disc_count
+            )
+
             inputs.addTextBoxCommandInput('textbox_2', '', "<br><b>Flange Settings</b>", 2, True) 
 
             _ring_bolt_count = inputs.addIntegerSpinnerCommandInput(
@@ -183,6 +397,63 @@ class CommandCreatedHandler(adsk.core.CommandCreatedEventHandler):
             _create_select_items.add('Brace',        ('Brace' in _drive_config.components))
             _create_select_items.add('Rollers',      ('Rollers' in _drive_config.components))
 
+            _instance_rollers = inputs.addBoolValueInput(
+                'instance_rollers',
+                'Instance Rollers',
+                True, '',
+                _drive_config.instance_rollers
+            )
+
+            _keep_history = inputs.addBoolValueInput(
+                'keep_history',
+                'Keep History',
+                True, '',
+                _drive_config.keep_history
+            )
+
+            _in_memory_solids = inputs.addBoolValueInput(
+                'in_memory_solids',
+                'In-Memory Solids',
+                True, '',
+                _drive_config.solid_backend == 'brep'
+            )
+
+            # cached drives are stored per drive and printer config, the cache
+            # can be bypassed or cleared if an inserted drive looks stale
+            _use_cache = inputs.addBoolValueInput(
+                'use_cache',
+                'Use Cache',
+                True, '',
+                True
+            )
+            inputs.addBoolValueInput('clear_cache', 'Clear Cache', False, '', False)
+
+            inputs.addTextBoxCommandInput('textbox_5', '', "<br><b>Optimizer</b>", 2, True)
+
+            _target_ratio = inputs.addValueInput(
+                'target_ratio',
+                'Target Ratio',
+                '',
+                adsk.core.ValueInput.createByReal(DriveGeometry.DriveGeometry.ReductionRatio(_drive_config.roller_count))
+            )
+
+            current_geometry = DriveGeometry.DriveGeometry(_drive_config, CreatePrinterConfig())
+            _max_outer_dia = inputs.addValueInput(
+                'max_outer_dia',
+                'Max Outer Diameter',
+                _units,
+                adsk.core.ValueInput.createByReal(current_geometry.ring_outer_radius * 2.0)
+            )
+
+            _stage_count = inputs.addIntegerSpinnerCommandInput(
+                'stage_count',
+                'Number of Stages',
+                1, 3, 1,
+                1
+            )
+
+            inputs.addBoolValueInput('optimize', 'Optimize', False, '', False)
+
             _err_message = inputs.addTextBoxCommandInput('err_message', '', '', 2, True)
             _err_message.isFullWidth = True
             
@@ -196,26 +467,34 @@ class CommandCreatedHandler(adsk.core.CommandCreatedEventHandler):
             )
 
             # Connect the neccesary event handlers.
-            onExecute = CommandExecuteHandler()
-            cmd.execute.add(onExecute)
-            _handlers.append(onExecute)        
-            
-            onInputChanged = CommandInputChangedHandler()
-            cmd.inputChanged.add(onInputChanged)
-            _handlers.append(onInputChanged)     
-            
-            onValidateInputs = CommandValidateInputsHandler()
-            cmd.validateInputs.add(onValidateInputs)
-            _handlers.append(onValidateInputs)
-
-            #onDestroy = CommandDestroyHandler()
-            #cmd.destroy.add(onDestroy)
-            #_handlers.append(onDestroy)
+            _command_handlers.Add(cmd.execute, CommandExecuteHandler())
+            _command_handlers.Add(cmd.inputChanged, CommandInputChangedHandler())
+            _command_handlers.Add(cmd.validateInputs, CommandValidateInputsHandler())
+            _command_handlers.Add(cmd.destroy, CommandDestroyHandler())
         except:
             if _ui:
                 _ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
 
 
+# builds the stage solution the optimizer showed, each stage is registered as
+# a drive of its own. Compound drives are always built as new drives and not
+# cached, the stages and couplings only fit each other as one solution
+def BuildCompoundDrive(design, printer_config, eventArgs):
+    configs = _stage_solution.configs
+
+    LoadModules('CompoundDrive')
+    compound = CompoundDrive.CompoundDrive(design, _ui, configs, printer_config)
+    compound.Report(_ui)
+
+    if not compound.Succeeded():
+        eventArgs.executeFailed = True
+        eventArgs.executeFailedMessage = 'The compound drive could not be built.'
+        return
+
+    registry = DriveRegistry.DriveRegistry(design)
+    for config, occurrence in zip(configs, compound.Occurrences()):
+        registry.Register(occurrence, config)
+
 class CommandExecuteHandler(adsk.core.CommandEventHandler):
     def __init__(self):
         super().__init__()
@@ -227,40 +506,60 @@ class CommandExecuteHandler(adsk.core.CommandEventHandler):
             design = adsk.fusion.Design.cast(_app.activeProduct)
             attributes = design.attributes
 
-            _drive_config.roller_count = _roller_count.value
-            _drive_config.roller_diameter = _roller_diameter.value
-            _drive_config.roller_spacing = _roller_spacing.value
-            _drive_config.output_pin_diameter = _output_pin_diameter.value
-
-            _drive_config.cam_bearing_outer_diameter = _cam_bearing_outer_dia.value
-            _drive_config.cam_bearing_inner_diameter = _cam_bearing_inner_dia.value
-
-            _drive_config.ring_bolt_count = _ring_bolt_count.value
-            _drive_config.ring_bolt_diameter = _ring_bolt_dia.value
-            _drive_config.disc_bolt_count = _disc_bolt_count.value
-            _drive_config.disc_bolt_diameter = _disc_bolt_dia.value
-
-            _drive_config.components.clear()
-            for item in _create_select.listItems:
-                if(item.isSelected):
-                    _drive_config.components.add(item.name)
+            ReadInputs(_drive_config)
 
             attributes.add('CycloidalDrive', 'drive_config', _drive_config.ToString())
+            printer_config = CreatePrinterConfig()
 
-            # Create the gear.
-            printer_config = PrinterConfig.PrinterConfig(0.4, 0.2)
-            c = CycloidalComponent.CycloidalComponent(
-                    design,
-                    _ui,
-                    _drive_config,
-                    printer_config
-                )
-            compo = c.GetComponent()
+            if _stage_count.value > 1:
+                BuildCompoundDrive(design, printer_config, eventArgs)
+                return
+
+            # An edited drive is cleared and rebuilt inside its own occurrence so
+            # joints and references to it stay valid
+            registry = DriveRegistry.DriveRegistry(design)
+            edit_occurrence = registry.Occurrence(_edit_drive_id) if _edit_drive_id else None
+
+            # Create the gear, reusing a cached drive with the same settings.
+            # Cached drives are inserted as new drives only, importing into an
+            # edited drive would nest them one level deeper.
+            cache = ComponentCache.ComponentCache() if _use_cache.value else None
+            occurrence = None
+            if cache and not edit_occurrence:
+                occurrence = cache.Insert(design, _drive_config, printer_config)
+            succeeded = occurrence is not None
+
+            if not occurrence:
+                c = CycloidalComponent.CycloidalComponent(
+                        design,
+                        _ui,
+                        _drive_config,
+                        printer_config,
+                        occurrence = edit_occurrence
+                    )
+                compo = c.GetComponent()
+                occurrence = c.occurrence
+                c.result.Report(_ui)
+                succeeded = c.result.Succeeded()
             
-            if compo:
-                desc = 'Cycloadial Drive;  '
-                desc += str(_roller_count.value) + 'D: ' + str(_roller_diameter.value) + 'S: ' + str(_roller_spacing.value) + ';'
-                compo.description = desc
+                if succeeded:
+                    compo.description = DriveDescription(_drive_config)
+                    if cache:
+                        cache.Store(design, compo, _drive_config, printer_config)
+
+            # a failed build is dropped and the command rolled back, an edited
+            # drive comes back as it was
+            if not succeeded:
+                if occurrence and not edit_occurrence:
+                    occurrence.deleteMe()
+                eventArgs.executeFailed = True
+                eventArgs.executeFailedMessage = 'The drive could not be built.'
+                return
+
+            # drives from the cache get their description too, it may have
+            # changed since they were stored
+            occurrence.component.description = DriveDescription(_drive_config)
+            registry.Register(occurrence, _drive_config, _edit_drive_id if edit_occurrence else None)
         except:
             if _ui:
                 _ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
@@ -274,12 +573,26 @@ class CommandInputChangedHandler(adsk.core.InputChangedEventHandler):
             eventArgs = adsk.core.InputChangedEventArgs.cast(args)
             changedInput = eventArgs.input
             
-            global _units
+            global _units, _edit_drive_id
+
+            if changedInput.id == 'drive_select':
+                _edit_drive_id = _drive_ids[_drive_select.selectedItem.index]
+                if _edit_drive_id:
+                    drive_config = DriveConfig.DriveConfig()
+                    design = adsk.fusion.Design.cast(_app.activeProduct)
+                    if DriveRegistry.DriveRegistry(design).LoadConfig(_edit_drive_id, drive_config):
+                        WriteInputs(drive_config)
             
             median = CycloidalComponent.CycloidalComponent.CalculateMedianDiameter(_roller_diameter.value, _roller_count.value, _roller_spacing.value)
             rad = CycloidalComponent.CycloidalComponent.CalculateOuterRadius(median * 0.5, _roller_diameter.value, _ring_bolt_dia.value)
 
             _info_message.text = 'Outer Diameter: {}mm'.format(round((rad * 2.0) * 10.0, 2))
+
+            if changedInput.id == 'optimize':
+                RunOptimizer()
+            if changedInput.id == 'clear_cache':
+                ComponentCache.ComponentCache().Clear()
+                _info_message.text = 'The drive cache is cleared.'
             #if changedInput.id == 'pressureAngle':
             #    if _pressureAngle.selectedItem.name == 'Custom':
             #        _pressureAngleCustom.isVisible = True
@@ -299,10 +612,25 @@ class CommandValidateInputsHandler(adsk.core.ValidateInputsEventHandler):
             
             _err_message.text = ''
 
-            if _roller_count.value < 6:
-                _err_message.text = 'The number of rollers must be 6 or more.'
+            drive_config = DriveConfig.DriveConfig()
+            drive_config.Load(_drive_config.ToString())
+            ReadInputs(drive_config)
+
+            validator = DriveValidator.DriveValidator(drive_config, CreatePrinterConfig())
+            if not validator.IsValid():
+                _err_message.text = '<br>'.join(validator.errors)
                 event_args.areInputsValid = False
                 return
+
+            # a compound drive is built from the solution Optimize found for
+            # the current inputs, it is not solved again on execute
+            if _stage_count.value > 1:
+                if _edit_drive_id:
+                    _err_message.text = 'Compound drives are built as new drives, select New Drive.'
+                    event_args.areInputsValid = False
+                elif not _stage_solution or _stage_key != StageKey(drive_config):
+                    _err_message.text = 'Optimize the stages for the current settings.'
+                    event_args.areInputsValid = False
             return
         except:
             if _ui:
@@ -315,9 +643,10 @@ class CommandDestroyHandler(adsk.core.CommandEventHandler):
         try:
             eventArgs = adsk.core.CommandEventArgs.cast(args)
 
-            # when the command is done, terminate the script
-            # this will release all globals which will remove all event handlers
-            adsk.terminate()
+            # when the command is done, release its handlers and dialog state,
+            # the add-in keeps running
+            ReleaseCommand()
+            LogHandlerStats('destroy')
         except:
             if _ui:
                 _ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
\ No newline at end of file
@@ -0,0 +1,116 @@
+# Copyright (C) 2018  Martin Muehlhaeuser <github@mmone.de>
+
+import json
+import time
+import traceback
+
+class StageResult:
+    def __init__(self, name):
+        self.name = name
+        self.status = 'ok'
+        self.errors = []
+        self.seconds = 0.0
+        self.outputs = []
+
+    def ToDict(self):
+        return {
+            'name': self.name,
+            'status': self.status,
+            'errors': self.errors,
+            'seconds': round(self.seconds, 4),
+            'outputs': self.outputs
+        }
+
+# Collects status, errors, timing and created bodies of every build stage so a
+# failing stage doesn't stop the build with a dialog.
+class BuildResult:
+    def __init__(self, name = ''):
+        self.name = name
+        self.stages = []
+        self.current = None
+
+    # runs function as a stage, outputs returns the body names used to record
+    # what the stage created
+    def Run(self, name, function, *args, outputs = None):
+        stage = StageResult(name)
+        self.stages.append(stage)
+        parent = self.current
+        self.current = stage
+
+        before = set(outputs()) if outputs else set()
+        start = time.perf_counter()
+        value = None
+        try:
+            value = function(*args)
+        except Exception as error:
+            self.Fail(name, error)
+        stage.seconds = time.perf_counter() - start
+        if outputs:
+            stage.outputs = [body for body in outputs() if body not in before]
+
+        self.current = parent
+        return value
+
+    # records an error of source on the running stage
+    def Fail(self, source, error):
+        if not self.current:
+            self.current = StageResult(self.name or 'Build')
+            self.stages.append(self.current)
+        self.current.status = 'failed'
+        self.current.errors.append({
+            'source': source,
+            'error': str(error),
+            'traceback': traceback.format_exc() if isinstance(error, Exception) else ''
+        })
+
+    # records a stage that wasn't run because of reason
+    def Skip(self, name, reason):
+        stage = StageResult(name)
+        stage.status = 'skipped'
+        stage.errors.append({'source': 'Scheduler', 'error': reason, 'traceback': ''})
+        self.stages.append(stage)
+
+    def Skipped(self):
+        return [stage for stage in self.stages if stage.status == 'skipped']
+
+    def Passed(self, name):
+        return all(stage.status == 'ok' for stage in self.stages if stage.name == name)
+
+    def Failures(self):
+        return [stage for stage in self.stages if stage.status not in ('ok', 'skipped')]
+
+    def Succeeded(self):
+        return not self.Failures() and not self.Skipped()
+
+    def Seconds(self):
+        return sum(stage.seconds for stage in self.stages)
+
+    def Summary(self):
+        failures = self.Failures()
+        skipped = self.Skipped()
+        lines = ['{}: {} of {} stages failed, {} skipped ({:.1f}s)'.format(
+            self.name or 'Build', len(failures), len(self.stages), len(skipped), self.Seconds()
+        )]
+        for stage in failures:
+            for error in stage.errors:
+                lines.append('{} - {} : {}'.format(stage.name, error['source'], error['error']))
+        if skipped:
+            lines.append('Skipped: ' + ', '.join(stage.name for stage in skipped))
+        return '\n'.join(lines)
+
+    def ToDict(self):
+        return {
+            'name': self.name,
+            'succeeded': self.Succeeded(),
+            'seconds': round(self.Seconds(), 4),
+            'stages': [stage.ToDict() for stage in self.stages]
+        }
+
+    def WriteJson(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.ToDict(), f, indent = 2)
+
+    # shows a single summary dialog if anything failed
+    def Report(self, ui):
+        if ui and not self.Succeeded():
+            ui.messageBox(self.Summary())
@@ -0,0 +1,121 @@
+# Copyright (C) 2018  Martin Muehlhaeuser <github@mmone.de>
+
+from concurrent.futures import ThreadPoolExecutor
+
+class Stage:
+    def __init__(self, name, function, inputs, outputs, after, component, always, pure):
+        self.name = name
+        self.function = function
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.after = list(after)
+        self.component = component
+        self.always = always
+        self.pure = pure
+
+# Build stages as a graph with declared inputs and outputs. Stages of
+# unselected components and stages nothing selected depends on are skipped.
+# Pure stages don't touch the Fusion API, they start on a thread pool before
+# the serial CAD stages run and their return value is published as their
+# single output. Serial stages whose inputs come from a failed or skipped
+# stage are skipped.
+class BuildScheduler:
+    def __init__(self, workers = 4):
+        self.workers = workers
+        self.stages = []
+        self.values = {}
+        self.plan = []
+        self.failed = set()
+        self.skipped = set()
+
+    def Add(self, name, function, inputs = (), outputs = (), after = (), component = None, always = False):
+        self.stages.append(Stage(name, function, inputs, outputs, after, component, always, False))
+
+    def AddPure(self, name, function, output):
+        self.stages.append(Stage(name, function, (), [output], (), None, False, True))
+
+    # value computed by a pure stage, waits for it if still running
+    def Value(self, key):
+        return self.values[key].result()
+
+    def Producers(self):
+        producers = {}
+        for stage in self.stages:
+            for output in stage.outputs:
+                if output in producers:
+                    raise ValueError('{} is produced by {} and {}'.format(output, producers[output].name, stage.name))
+                producers[output] = stage
+        return producers
+
+    # the stages to run for the selected components in dependency order,
+    # ties keep the declaration order
+    def Plan(self, components):
+        producers = self.Producers()
+
+        needed = []
+        pending = [stage for stage in self.stages if stage.always or (stage.component and stage.component in components)]
+        while pending:
+            stage = pending.pop()
+            if stage in needed:
+                continue
+            needed.append(stage)
+            for key in stage.inputs:
+                if key not in producers:
+                    raise ValueError('{} needs {} which no stage produces'.format(stage.name, key))
+                pending.append(producers[key])
+
+        def Dependencies(stage):
+            keys = stage.inputs + [key for key in stage.after if key in producers and producers[key] in needed]
+            return [producers[key] for key in keys]
+
+        ordered = []
+        remaining = [stage for stage in self.stages if stage in needed]
+        while remaining:
+            for stage in remaining:
+                if all(dependency in ordered for dependency in Dependencies(stage)):
+                    ordered.append(stage)
+                    remaining.remove(stage)
+                    break
+            else:
+                raise ValueError('Cyclic stage dependencies: ' + ', '.join(stage.name for stage in remaining))
+        return ordered
+
+    # submits the pure stages to pool, several schedulers can share one pool
+    # to compute ahead of all their serial stages
+    def Start(self, components, pool):
+        self.plan = self.Plan(components)
+        for stage in self.plan:
+            if stage.pure:
+                self.values[stage.outputs[0]] = pool.submit(stage.function)
+        return self.plan
+
+    # why stage can't run, empty if all stages its inputs come from succeeded
+    def SkipReason(self, stage):
+        producers = self.Producers()
+        reasons = []
+        for producer in dict.fromkeys(producers[key] for key in stage.inputs):
+            if producer in self.failed:
+                reasons.append('{} failed'.format(producer.name))
+            elif producer in self.skipped:
+                reasons.append('{} was skipped'.format(producer.name))
+        return ', '.join(reasons)
+
+    # run_stage(name, function) runs a single serial stage and returns
+    # whether it succeeded, skip_stage(name, reason) records a skipped one
+    def Finish(self, run_stage, skip_stage = None):
+        for stage in self.plan:
+            if stage.pure:
+                continue
+            reason = self.SkipReason(stage)
+            if reason:
+                self.skipped.add(stage)
+                if skip_stage:
+                    skip_stage(stage.name, reason)
+            elif not run_stage(stage.name, stage.function):
+                self.failed.add(stage)
+        return self.plan
+
+    def Run(self, components, run_stage, skip_stage = None):
+        with ThreadPoolExecutor(max_workers = self.workers) as pool:
+            self.Start(components, pool)
+            return self.Finish(run_stage, skip_stage)
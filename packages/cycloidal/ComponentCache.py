@@ -0,0 +1,138 @@
+# Copyright (C) 2018  Martin Muehlhaeuser <github@mmone.de>
+
+import adsk.core, adsk.fusion, traceback
+import hashlib
+import json
+import os
+import time
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cycloidal_drive', 'cache')
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+MAX_ENTRY_BYTES = 64 * 1024 * 1024
+
+_version_key = None
+
+# hash of the package sources, cached drives built by other code are stale
+def VersionKey():
+    global _version_key
+    if _version_key is None:
+        digest = hashlib.sha1()
+        root = os.path.dirname(os.path.abspath(__file__))
+        for folder, dirs, files in os.walk(root):
+            dirs.sort()
+            for name in sorted(files):
+                if name.endswith('.py'):
+                    path = os.path.join(folder, name)
+                    digest.update(os.path.relpath(path, root).encode())
+                    with open(path, 'rb') as f:
+                        digest.update(f.read())
+        _version_key = digest.hexdigest()
+    return _version_key
+
+# Local archive of generated drive components keyed by the drive and printer
+# config, evicted least recently used first once the size limit is exceeded.
+class ComponentCache:
+    def __init__(self, cache_dir = CACHE_DIR, max_bytes = MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(self.cache_dir, 'index.json')
+        self.index = self.LoadIndex()
+
+    @staticmethod
+    def Key(drive_config, printer_config):
+        return hashlib.sha1('{}:{}:{}'.format(
+            VersionKey(),
+            drive_config.Fingerprint(),
+            printer_config.Fingerprint()
+        ).encode()).hexdigest()
+
+    def LoadIndex(self):
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def SaveIndex(self):
+        os.makedirs(self.cache_dir, exist_ok = True)
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def Path(self, key):
+        return os.path.join(self.cache_dir, key + '.f3d')
+
+    def Lookup(self, drive_config, printer_config):
+        key = self.Key(drive_config, printer_config)
+        entry = self.index.get(key)
+        if not entry:
+            return None
+
+        path = self.Path(key)
+        if not os.path.isfile(path):
+            del self.index[key]
+            self.SaveIndex()
+            return None
+
+        entry['last_used'] = time.time()
+        self.SaveIndex()
+        return path
+
+    def Evict(self):
+        total = sum(entry['size'] for entry in self.index.values())
+        for key in sorted(self.index, key = lambda k: self.index[k]['last_used']):
+            if total <= self.max_bytes:
+                break
+            total -= self.index[key]['size']
+            del self.index[key]
+            try:
+                os.remove(self.Path(key))
+            except OSError:
+                pass
+
+    def Add(self, key, path):
+        size = os.path.getsize(path)
+        if size > MAX_ENTRY_BYTES or size > self.max_bytes:
+            os.remove(path)
+            return False
+
+        self.index[key] = {'size': size, 'last_used': time.time()}
+        self.Evict()
+        self.SaveIndex()
+        return True
+
+    # exports a generated component into the cache
+    def Store(self, design, component, drive_config, printer_config):
+        os.makedirs(self.cache_dir, exist_ok = True)
+        key = self.Key(drive_config, printer_config)
+        path = self.Path(key)
+
+        export_manager = design.exportManager
+        options = export_manager.createFusionArchiveExportOptions(path, component)
+        if not export_manager.execute(options) or not os.path.isfile(path):
+            return False
+        return self.Add(key, path)
+
+    # inserts a cached component into the design, returns its occurrence or
+    # None on a miss
+    def Insert(self, design, drive_config, printer_config):
+        path = self.Lookup(drive_config, printer_config)
+        if not path:
+            return None
+
+        import_manager = adsk.core.Application.get().importManager
+        options = import_manager.createFusionArchiveImportOptions(path)
+        occurrences = import_manager.importToTarget2(options, design.rootComponent)
+        if not occurrences or occurrences.count == 0:
+            return None
+        return adsk.fusion.Occurrence.cast(occurrences.item(0))
+
+    def Clear(self):
+        for key in list(self.index):
+            try:
+                os.remove(self.Path(key))
+            except OSError:
+                pass
+        self.index = {}
+        self.SaveIndex()
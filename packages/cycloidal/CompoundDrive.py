@@ -0,0 +1,99 @@
+# Copyright (C) 2018  Martin Muehlhaeuser <github@mmone.de>
+
+import adsk.core, adsk.fusion
+from concurrent.futures import ThreadPoolExecutor
+from .components import DriveGeometry
+from .components import helpers
+from . import BuildResult
+from . import CycloidalComponent
+
+# Builds the stages of a compound drive on top of each other, the housings
+# line up on the drive axis, see DriveGeometry.StagePlacements. The output of
+# every stage drives the cam of the next one through an Oldham coupling that
+# takes up the cam eccentricity. The pure stages of all drives are started on
+# one pool before the first one is built, the cad stages run one drive after
+# the other. The threads share the GIL, so the race points only overlap with
+# the cad stages, they are not computed in parallel.
+class CompoundDrive:
+    def __init__(self, design, ui, drive_configs, printer_config, transform = None, workers = 4):
+        self.design = design
+        self.configs = drive_configs
+        self.printer_config = printer_config
+        self.result = BuildResult.BuildResult('Couplings')
+
+        geometries = [DriveGeometry.DriveGeometry(config, printer_config) for config in drive_configs]
+        placements = DriveGeometry.DriveGeometry.StagePlacements(geometries)
+
+        self.stages = []
+        matrices = []
+        with ThreadPoolExecutor(max_workers = workers) as pool:
+            for index, (config, placement) in enumerate(zip(drive_configs, placements)):
+                mat = adsk.core.Matrix3D.create()
+                mat.translation = adsk.core.Vector3D.create(*placement)
+                if transform:
+                    mat.transformBy(transform)
+                matrices.append(mat)
+
+                stage = CycloidalComponent.CycloidalComponent(design, ui, config, printer_config,
+                    BuildResult.BuildResult('Stage {}'.format(index + 1)), mat, pool
+                )
+                stage.GetComponent().name = 'Stage {} - {}'.format(index + 1, stage.GetComponent().name)
+                self.stages.append(stage)
+
+            for stage in self.stages:
+                stage.Build()
+
+        self.couplings = []
+        for index, (below, above) in enumerate(zip(self.stages, self.stages[1:])):
+            self.BuildCoupling(index, below, above, matrices[index])
+
+    # Oldham coupling in the frame of below, a hub in the output disc and one
+    # in the cam shaft of above, each turning about its own axis, and the
+    # disc sliding between them in the gap under the cam
+    def BuildCoupling(self, index, below, above, mat):
+        try:
+            occurrence = self.design.rootComponent.occurrences.addNewComponent(mat)
+            self.couplings.append(occurrence)
+            compo = adsk.fusion.Component.cast(occurrence.component)
+            compo.name = 'Coupling {}'.format(index + 1)
+
+            (bottom, low, high, top), offset = DriveGeometry.DriveGeometry.StageCoupling(below.geometry, above.geometry)
+            output_radius = below.config.shaft_diameter * 0.5
+            input_radius = DriveGeometry.DriveGeometry.CAM_SHAFT_RADIUS
+            disc_radius = offset * 0.5 + max(output_radius, input_radius) + self.printer_config.ewToCm(3)
+
+            parts = [
+                ('Output Hub', 0.0, output_radius, bottom, low),
+                ('Oldham Disc', offset * 0.5, disc_radius, low, high),
+                ('Input Hub', offset, input_radius, high, top)
+            ]
+            for name, y, radius, start, end in parts:
+                sketch = helpers.CreateSketch(compo, name, True, False)
+                helpers.AddCircle(sketch, 0, y, 0, radius)
+                sketch.isComputeDeferred = False
+
+                out = helpers.OneSideExtrude(compo,
+                    helpers.CreateCollection(sketch.profiles.item(0)),
+                    start,
+                    end - start,
+                    adsk.fusion.ExtentDirections.PositiveExtentDirection,
+                    adsk.fusion.FeatureOperations.NewBodyFeatureOperation
+                )
+                out.bodies.item(0).name = name
+        except Exception as error:
+            self.result.Fail('Coupling {}'.format(index + 1), error)
+
+    def Occurrences(self):
+        return [stage.occurrence for stage in self.stages]
+
+    # every occurrence the compound drive added to the design
+    def AllOccurrences(self):
+        return self.Occurrences() + self.couplings
+
+    def Succeeded(self):
+        return all(stage.result.Succeeded() for stage in self.stages) and self.result.Succeeded()
+
+    def Report(self, ui):
+        for stage in self.stages:
+            stage.result.Report(ui)
+        self.result.Report(ui)
@@ -2,88 +2,166 @@
 
 import adsk.core, adsk.fusion, traceback
 import math
-from .components import Brace, OutputDisc, WheelAssembly
+from .components import Brace, OutputDisc, WheelAssembly, BRepBackend
 from .components import helpers
 from .components import DriveConfig
+from .components import DriveGeometry
+from .components import DriveValidator
 from .components import PrinterConfig
+from . import BuildResult
+from . import BuildScheduler
 
 class CycloidalComponent:
    
-    def __init__(self, design, ui, drive_config, printer_config ):
+    # with a pool only the pure stages are started, Build runs the cad stages.
+    # An existing drive occurrence is cleared and built into again.
+    def __init__(self, design, ui, drive_config, printer_config, result = None, transform = None, pool = None,
+            occurrence = None):
         self.design = design
         self.ui = ui
         self.config = drive_config
         self.printer_config = printer_config
+        self.geometry = DriveGeometry.DriveGeometry(drive_config, printer_config)
 
-        self.RACE_HEIGHT_RAD_PLUS = 0.01
-        self.CURVE_SUBSAMPLING = 32
-        self.CAGE_SLOT_HEIGHT = self.printer_config.lToCm(5)
+        self.RACE_HEIGHT_RAD_PLUS = self.geometry.RACE_HEIGHT_RAD_PLUS
+        self.CURVE_SUBSAMPLING = self.geometry.CURVE_SUBSAMPLING
+        self.CAGE_SLOT_HEIGHT = self.geometry.cage_slot_height
 
-        occs = design.rootComponent.occurrences
-        mat = adsk.core.Matrix3D.create()
-        newOcc = occs.addNewComponent(mat)
+        if occurrence:
+            self.occurrence = occurrence
+            helpers.ClearComponent(occurrence.component)
+        else:
+            occs = design.rootComponent.occurrences
+            mat = transform if transform else adsk.core.Matrix3D.create()
+            self.occurrence = occs.addNewComponent(mat)
         
-        self.compo = adsk.fusion.Component.cast(newOcc.component)
+        self.compo = adsk.fusion.Component.cast(self.occurrence.component)
         self.compo.name = 'Drive (' + str(self.config.roller_count) + ' rollers @' + str(self.config.roller_spacing) +')'
+        self.compo.attributes.add('CycloidalDrive', 'drive_config', self.config.ToString())
+        self.result = result if result else BuildResult.BuildResult(self.compo.name)
         
         self.sketches = self.compo.sketches
-        # calculates the diameter from the length of the circle segment intersected with the main planet orbit
-        self.median_dia  = self.CalculateMedianDiameter(
-            self.config.roller_diameter,
-            self.config.roller_count,
-            self.config.roller_spacing
-        )
-        self.median_radius = self.median_dia  * 0.5
-        self.roller_rad = self.config.roller_diameter * 0.5
-        self.thickness = self.config.roller_diameter + 2 * self.printer_config.lToCm(5) + 2 * self.RACE_HEIGHT_RAD_PLUS
-
-        self.ring_outer_radius = self.CalculateOuterRadius(
-            self.median_radius,
-            self.config.roller_diameter,
-            self.config.ring_bolt_diameter
-        )
-        self.ring_bolt_circle_radius = self.ring_outer_radius - self.config.ring_bolt_diameter * 0.25
-        self.disc_bolt_circle_radius = self.median_radius - (self.roller_rad * 3.0) - self.config.disc_bolt_diameter * 0.5
-        self.slot_radius = self.median_radius + (self.roller_rad * 2.25)
+        self.median_dia = self.geometry.median_dia
+        self.median_radius = self.geometry.median_radius
+        self.roller_rad = self.geometry.roller_rad
+        self.thickness = self.geometry.thickness
+
+        self.ring_outer_radius = self.geometry.ring_outer_radius
+        self.ring_bolt_circle_radius = self.geometry.ring_bolt_circle_radius
+        self.disc_bolt_circle_radius = self.geometry.disc_bolt_circle_radius
+        self.slot_radius = self.geometry.slot_radius
 
         self.cycloid_cut_plane = None
         self.output_cut_plane = None
+        self.layer_cut_planes = []
 
-        self.DrawConstructionSketch()
-        self.CreateSplitPlanes()
-        self.CreateRollerSketch()
-        if('Ring' in self.config.components):
-            self.BuildRing()
-        if('Disc' in self.config.components):
-            self.BuildDisc()
-        if('Bearing Seat' in self.config.components):
-            self.CreateBearingSeat()
-        if('Rollers' in self.config.components):
-            self.BuildRollers()
-        if('Cage' in self.config.components):
-            self.BuildRollerCage()
-        if('Cam' in self.config.components):
-            self.BuildCam()
-        # deactivate temporarily to avoid conflicts when cutting
-        self.compo.isBodiesFolderLightBulbOn = False
-        if('Brace' in self.config.components):
-            self.BuildBrace()
-        self.compo.isBodiesFolderLightBulbOn = True 
-        if('Output' in self.config.components):
-            self.BuildOutputDisc()
+        self.brep = None
+        if self.config.solid_backend == 'brep':
+            self.brep = BRepBackend.BRepBackend(self.compo, self.result, self.geometry)
+
+        self.scheduler = BuildScheduler.BuildScheduler()
+        self.AddStages(self.scheduler)
+        if pool:
+            self.scheduler.Start(self.config.components, pool)
+        else:
+            self.scheduler.Run(self.config.components, self.RunStage, self.result.Skip)
+
+    def Build(self):
+        self.scheduler.Finish(self.RunStage, self.result.Skip)
+
+    def AddStages(self, scheduler):
+        # fusion independent, computed on the pool ahead of the cad stages
+        scheduler.AddPure('Ring Race Points', self.geometry.RingRacePoints, 'ring_race_points')
+        scheduler.AddPure('Disc Race Points', self.geometry.DiscRacePoints, 'disc_race_points')
+        scheduler.AddPure('Validation',
+            lambda: DriveValidator.DriveValidator(self.config, self.printer_config).errors,
+            'validation'
+        )
+
+        # every cad stage waits for the config check and is skipped if it fails
+        scheduler.Add('Check Config', self.CheckConfig, inputs = ['validation'], outputs = ['valid_config'], always = True)
+        scheduler.Add('Construction', self.DrawConstructionSketch, inputs = ['valid_config'], outputs = ['circle_center'], always = True)
+        scheduler.Add('Split Planes', self.CreateSplitPlanes, inputs = ['valid_config'],
+            outputs = ['cycloid_cut_plane', 'output_cut_plane', 'layer_cut_planes']
+        )
+
+        scheduler.Add('Ring', self.BuildRing,
+            inputs = ['valid_config', 'ring_race_points', 'cycloid_cut_plane', 'output_cut_plane', 'layer_cut_planes'],
+            outputs = ['ring'], component = 'Ring'
+        )
+        scheduler.Add('Disc', self.BuildDisc,
+            inputs = ['valid_config', 'disc_race_points', 'cycloid_cut_plane'],
+            outputs = ['disc'], component = 'Disc'
+        )
+        # cuts through whatever ring and disc bodies exist
+        scheduler.Add('Bearing Seat', self.CreateBearingSeat,
+            inputs = ['valid_config'], outputs = ['bearing_seat'], after = ['ring', 'disc'], component = 'Bearing Seat'
+        )
+        # the further discs are copies of the finished first one
+        scheduler.Add('Disc Layers', self.PlaceDiscLayers,
+            inputs = ['valid_config', 'disc'], outputs = ['disc_layers'], after = ['bearing_seat'], component = 'Disc'
+        )
+        scheduler.Add('Rollers', self.BuildRollers,
+            inputs = ['valid_config', 'circle_center'], outputs = ['rollers'], after = ['bearing_seat'], component = 'Rollers'
+        )
+        scheduler.Add('Cage', self.BuildRollerCage,
+            inputs = ['valid_config', 'circle_center'], outputs = ['cage'], after = ['bearing_seat'], component = 'Cage'
+        )
+        scheduler.Add('Cam', self.BuildCam, inputs = ['valid_config'], outputs = ['cam'], after = ['bearing_seat'], component = 'Cam')
+
+        bodies = ['ring', 'disc', 'bearing_seat', 'disc_layers', 'rollers', 'cage', 'cam']
+        scheduler.Add('Brace', self.BuildBrace, inputs = ['valid_config'], outputs = ['brace'], after = bodies, component = 'Brace')
+        scheduler.Add('Output', self.BuildOutputDisc,
+            inputs = ['valid_config', 'output_cut_plane'], outputs = ['output'], after = bodies + ['brace'], component = 'Output'
+        )
         #self.CreateWheelAssembly()
 
+        scheduler.Add('Freeze History', self.FreezeHistory, inputs = ['valid_config'],
+            after = bodies + ['brace', 'output'], always = not self.config.keep_history
+        )
+
+    def CheckConfig(self):
+        for error in self.scheduler.Value('validation'):
+            self.result.Fail("Validation", error)
+
     @staticmethod
     def CalculateMedianDiameter(roller_diameter, roller_count, roller_gap_factor):
-        return roller_diameter / (2 * math.sin(math.pi / ((1 + roller_gap_factor) * roller_count * 2.0)))
+        return DriveGeometry.DriveGeometry.CalculateMedianDiameter(roller_diameter, roller_count, roller_gap_factor)
 
     @staticmethod
     def CalculateOuterRadius(median_radius, roller_diameter, ring_bolt_diameter):
-        return median_radius + roller_diameter + ring_bolt_diameter * 1.5
+        return DriveGeometry.DriveGeometry.CalculateOuterRadius(median_radius, roller_diameter, ring_bolt_diameter)
+
+    # placements of the layers after the first one
+    def LayerMatrices(self):
+        return [
+            helpers.PlacementMatrix(*self.geometry.LayerPlacement(layer))
+            for layer in range(1, self.geometry.disc_count)
+        ]
 
     def GetComponent(self):
         return self.compo
 
+    def BodyNames(self):
+        bodies = self.compo.bRepBodies
+        return [bodies.item(i).name for i in range(0, bodies.count)]
+
+    def RunStage(self, name, function, *args):
+        self.result.Run(name, function, *args, outputs = self.BodyNames)
+        return self.result.Passed(name)
+
+    # replaces the generated features with static bodies so later edits of the
+    # design don't regenerate the drive features
+    def FreezeHistory(self):
+        try:
+            if self.design.designType == adsk.fusion.DesignTypes.DirectDesignType:
+                return
+
+            helpers.FreezeComponent(self.compo)
+        except Exception as error:
+            self.result.Fail("Freeze History", error)
+            return None
+
     def DrawConstructionSketch(self):
         try:
             baseSketch = helpers.CreateSketch(self.compo, "Construction", True, False)
@@ -112,7 +190,6 @@ class CycloidalComponent:
               circle.isFixed = True
 
             #######
-            groveRootRadius = (self.median_dia  + self.GrooveRootToBallCenter(self.config.roller_diameter) + self.roller_rad) * 0.5
             topRailPoints = adsk.core.ObjectCollection.create()
             radOffset = 2.0 * math.pi * 0.25 / (self.config.roller_count + 1)
             rad = 0.0
@@ -143,28 +220,30 @@ class CycloidalComponent:
             baseSketch.isComputeDeferred = False
 
         except Exception as error:
-            if self.ui:
-                self.ui.messageBox("drawConstructionSketch Failed : " + str(error))
+            self.result.Fail("drawConstructionSketch", error)
             return None
 
     def CreateSplitPlanes(self):
         try:
             planes = self.compo.constructionPlanes
-            planeInput = planes.createInput()
-            planeInput.setByOffset(
-                self.compo.xYConstructionPlane,
-                adsk.core.ValueInput.createByReal(self.CAGE_SLOT_HEIGHT * 0.5)
-            )
-            self.cycloid_cut_plane = planes.add(planeInput)
-            self.cycloid_cut_plane.name = "cycloid-cut"
-            self.cycloid_cut_plane.isLightBulbOn = False
+            for layer, height in enumerate(self.geometry.LayerCutHeights()):
+                planeInput = planes.createInput()
+                planeInput.setByOffset(
+                    self.compo.xYConstructionPlane,
+                    adsk.core.ValueInput.createByReal(height)
+                )
+                plane = planes.add(planeInput)
+                plane.name = "cycloid-cut" if layer == 0 else "cycloid-cut {}".format(layer + 1)
+                plane.isLightBulbOn = False
+                self.layer_cut_planes.append(plane)
+            self.cycloid_cut_plane = self.layer_cut_planes[0]
             
             if 'Output' in self.config.components:
                 planeInput2 = planes.createInput()
                 planeInput2.setByOffset(
                     self.compo.xYConstructionPlane,
                     adsk.core.ValueInput.createByReal(
-                        self.thickness * 0.5 + self.printer_config.lToCm(5) + self.config.output_bearing_ball_diameter * 0.5
+                        self.geometry.output_cut_height
                     )
                 )
                 self.output_cut_plane = planes.add(planeInput2)
@@ -172,15 +251,14 @@ class CycloidalComponent:
                 self.output_cut_plane.isLightBulbOn = False
 
         except Exception as error:
-            if self.ui:
-                self.ui.messageBox("createSpPlane Failed : " + str(error)) 
+            self.result.Fail("createSpPlane", error)
             return None
     
-    def CreateRollerSketch(self):
+    def CreateRollerSketch(self, component):
         try:
             profileCenter = adsk.core.Point3D.create(0, self.median_radius + self.config.roller_diameter / 12.0, 0)
 
-            self.roller_sketch = helpers.CreateSketch(self.compo, "Roller", True, False, self.compo.yZConstructionPlane)
+            self.roller_sketch = helpers.CreateSketch(component, "Roller", True, False, component.yZConstructionPlane)
             helpers.AddCircle(self.roller_sketch,
                 0, self.median_radius + self.config.roller_diameter / 12.0, 0,
                 self.roller_rad
@@ -193,12 +271,15 @@ class CycloidalComponent:
 
             self.roller_sketch.isComputeDeferred = False
         except Exception as error:
-            if self.ui:
-                self.ui.messageBox("Create Roller Sketch Failed : " + str(error)) 
+            self.result.Fail("Create Roller Sketch", error)
             return None
 
     def BuildRollers(self):
+        if self.config.instance_rollers:
+            return self.BuildRollerOccurrences()
         try:
+            self.CreateRollerSketch(self.compo)
+
             revolves = self.compo.features.revolveFeatures
             revolveInput = revolves.createInput(
                 self.roller_sketch.profiles.item(0),
@@ -213,41 +294,63 @@ class CycloidalComponent:
             inputEntites = adsk.core.ObjectCollection.create()
             inputEntites.add(revolve.bodies.item(0))
 
-            helpers.CircularPattern(self.compo,
+            pattern = helpers.CircularPattern(self.compo,
                 inputEntites,
                 self.circle_center,
                 self.config.roller_count
             )
+
+            rollers = [revolve.bodies.item(0)] + [pattern.bodies.item(i) for i in range(0, pattern.bodies.count)]
+            helpers.AddTransformedCopies(self.compo, rollers, self.LayerMatrices())
         except Exception as error:
-            if self.ui:
-                self.ui.messageBox("buildRoller Failed : " + str(error)) 
+            self.result.Fail("buildRoller", error)
             return None
 
-    def GrooveRootToBallCenter(self, planet_diameter):
-        return (planet_diameter * planet_diameter) / (2.0 * (planet_diameter * 3/4.0))
+    # builds a single roller component and places one occurrence per roller
+    # around the circle center instead of patterning independent bodies
+    def BuildRollerOccurrences(self):
+        try:
+            occs = self.compo.occurrences
+            first_occ = occs.addNewComponent(adsk.core.Matrix3D.create())
+            roller_compo = adsk.fusion.Component.cast(first_occ.component)
+            roller_compo.name = "Roller"
+
+            self.CreateRollerSketch(roller_compo)
+            revolve = helpers.Revolve(roller_compo,
+                self.roller_sketch.profiles.item(0),
+                self.roller_mirror_line,
+                adsk.fusion.FeatureOperations.NewBodyFeatureOperation
+            )
+            revolve.bodies.item(0).name = "Roller"
 
-    def TangentFunction(self, planet_diameter, contact_diameter, x):
-        return contact_diameter / math.sqrt(planet_diameter * planet_diameter - contact_diameter * contact_diameter) * x
+            axis = adsk.core.Vector3D.create(0, 0, 1)
+            center = adsk.core.Point3D.create(0, self.config.roller_diameter / 12.0, 0)
+            radOffset = math.pi * 2.0 / self.config.roller_count
 
-    def TangentFunctionInverse(self, planet_diameter, contact_diameter, y):
-        if( contact_diameter == planet_diameter):
-            return 0
-        elif ( contact_diameter == 0):
-            return planet_diameter * 0.5
-        else:
-            return y / (contact_diameter / math.sqrt(planet_diameter * planet_diameter - contact_diameter * contact_diameter))
+            layers = [adsk.core.Matrix3D.create()] + self.LayerMatrices()
+            for layer, placement in enumerate(layers):
+                for i in range(0, self.config.roller_count):
+                    if layer == 0 and i == 0:
+                        continue
+                    mat = adsk.core.Matrix3D.create()
+                    mat.setToRotation(radOffset * i, axis, center)
+                    mat.transformBy(placement)
+                    occs.addExistingComponent(roller_compo, mat)
+        except Exception as error:
+            self.result.Fail("buildRoller", error)
+            return None
 
     def BuildRing(self):
+        if self.brep:
+            return self.brep.BuildRing(self.scheduler.Value('ring_race_points'))
         try:
-            half_race_height = self.roller_rad + self.RACE_HEIGHT_RAD_PLUS
-
-            groveRootRadius = (self.median_dia  + self.GrooveRootToBallCenter(self.config.roller_diameter) + self.roller_rad) * 0.5
+            groveRootRadius = self.geometry.ring_groove_root_radius
 
             housingSketch = helpers.CreateSketch(self.compo, "Ring", True, False)
             raceSketch = helpers.CreateSketch(self.compo, "Ring Race", True, False)
 
             # inner ring
-            helpers.AddCircle(housingSketch, 0,0,0, self.median_radius + self.roller_rad * 0.42)
+            helpers.AddCircle(housingSketch, 0,0,0, self.geometry.ring_inner_radius)
 
             # slot
             helpers.AddCircle(housingSketch, 0,0,0, self.slot_radius)
@@ -256,25 +359,8 @@ class CycloidalComponent:
             helpers.AddCircle(housingSketch, 0,0,0, self.ring_outer_radius)
             
             topRailPoints = adsk.core.ObjectCollection.create()
-
-            radOffset = 2.0 * math.pi * 0.25 / (self.config.roller_count + 1)
-            rad = 0.0
-
-            div =  (self.config.roller_count+1) * self.CURVE_SUBSAMPLING
-            for i in range(0, div):
-                rad = 2.0 * math.pi * (i / div * 1.0)
-                amp = math.sin(rad * (self.config.roller_count+1))
-
-                o = groveRootRadius - self.TangentFunctionInverse(
-                    self.config.roller_diameter,
-                    self.config.roller_diameter * (1 - (0.25 * ((amp + 1) * 0.5) )),
-                    half_race_height
-                )
-                topRailPoints.add( adsk.core.Point3D.create(
-                    math.sin(rad + radOffset) * o,
-                    math.cos(rad + radOffset) * o,
-                    half_race_height)
-                )
+            for x, y, z in self.scheduler.Value('ring_race_points'):
+                topRailPoints.add(adsk.core.Point3D.create(x, y, z))
 
             top_1    = raceSketch.sketchCurves.sketchLines.addByTwoPoints(topRailPoints.item(0), topRailPoints.item(1))
 
@@ -291,28 +377,29 @@ class CycloidalComponent:
             raceSketch.isComputeDeferred = False
             housingSketch.isComputeDeferred = False
 
-            # ring
-            if 'Output' in self.config.components:
-               extend = self.thickness + self.config.output_bearing_ball_diameter + 2 * self.printer_config.lToCm(5)
-            else:
-               extend = self.thickness
+            # ring, reaching down over all disc layers
+            extend = self.geometry.ring_extend
+            bottom = self.geometry.ring_bottom
 
             extrudeOut = helpers.OneSideExtrude(self.compo,
                 helpers.CreateCollection(
                     housingSketch.profiles.item(1),
                     housingSketch.profiles.item(2)
                 ),
-                -self.thickness * 0.5,
+                bottom,
                 extend,
                 adsk.fusion.ExtentDirections.PositiveExtentDirection,
                 adsk.fusion.FeatureOperations.JoinFeatureOperation
             )
+            ring = extrudeOut.bodies.item(0)
             
-            self.CreateRingHoles(-self.thickness * 0.5, extend)
+            self.CreateRingHoles(bottom, extend)
 
+            # race and cage slot are lofted once as tool bodies, the other
+            # layers are cut with copies turned about the ring axis
             loft = self.compo.features.loftFeatures
             loftInput = loft.createInput(
-                adsk.fusion.FeatureOperations.CutFeatureOperation
+                adsk.fusion.FeatureOperations.NewBodyFeatureOperation
             )
 
             loftSections = loftInput.loftSections
@@ -322,40 +409,61 @@ class CycloidalComponent:
             s2.setFreeEndCondition()
             loft_out = loft.add(loftInput)
        
-            helpers.Mirror(self.compo,
+            mirror_out = helpers.Mirror(self.compo,
                 helpers.CreateCollection(loft_out),
                 self.compo.xYConstructionPlane
             )
 
-            # cut slot
-            extrudeOut = helpers.SymmetricExtrude(
+            helpers.Combine(self.compo,
+                adsk.fusion.FeatureOperations.JoinFeatureOperation,
+                loft_out.bodies.item(0),
+                mirror_out.bodies.item(0)
+            )
+
+            slot = helpers.SymmetricExtrude(
                 self.compo,
                 helpers.CreateCollection(
                     housingSketch.profiles.item(0),
                     housingSketch.profiles.item(1),
                 ),
                 self.CAGE_SLOT_HEIGHT,
-                adsk.fusion.FeatureOperations.CutFeatureOperation
+                adsk.fusion.FeatureOperations.NewBodyFeatureOperation
             )
-            
-            splits = self.compo.features.splitBodyFeatures
-            splitInput = splits.createInput(extrudeOut.bodies.item(0), self.cycloid_cut_plane, True)
-            split = splits.add(splitInput)
-            split.bodies.item(0).name = "Ring-bottom"
-            split.bodies.item(1).name = "Ring-top"
 
-            self.CreateRingKeyFeatures(split.bodies.item(1), split.bodies.item(0))
+            tools = [loft_out.bodies.item(0), slot.bodies.item(0)]
+            tools += helpers.AddTransformedCopies(self.compo, tools, self.LayerMatrices())
+            helpers.Combine(self.compo,
+                adsk.fusion.FeatureOperations.CutFeatureOperation,
+                ring,
+                *tools
+            )
+
+            # one split per layer from the top down, the part below the
+            # lowest layer is the bottom ring
+            splits = self.compo.features.splitBodyFeatures
+            lower = ring
+            top = None
+            for layer, plane in enumerate(self.layer_cut_planes):
+                splitInput = splits.createInput(lower, plane, True)
+                split = splits.add(splitInput)
+                lower = split.bodies.item(0)
+                upper = split.bodies.item(1)
+                if layer == 0:
+                    upper.name = "Ring-top"
+                    top = upper
+                else:
+                    upper.name = "Ring-middle {}".format(layer)
+                self.CreateRingKeyFeatures(upper, lower, plane)
+            lower.name = "Ring-bottom"
             
             if 'Output' in self.config.components:
-                splits = self.compo.features.splitBodyFeatures
-                splitInput = splits.createInput(split.bodies.item(1), self.output_cut_plane, True)
+                splitInput = splits.createInput(top, self.output_cut_plane, True)
                 split = splits.add(splitInput)
                 split.bodies.item(0).name = "Ring-top"
                 split.bodies.item(1).name = "Output-top"
 
         except Exception as error:
-            if self.ui:
-                self.ui.messageBox("buildRing Failed : " + str(error)) 
+            self.result.Fail("buildRing", error)
             return None
 
     def CreateRingHoles(self, start, extend):
@@ -364,12 +472,12 @@ class CycloidalComponent:
             
             helpers.AddCircle(holeSketch,
                 0, self.ring_bolt_circle_radius, 0,
-                self.config.ring_bolt_diameter * 0.5
+                self.geometry.ring_bolt_hole_radius
             )
 
             helpers.AddCircle(holeSketch,
                 0, self.ring_bolt_circle_radius, 0,
-                self.config.ring_bolt_diameter * 0.5 + self.printer_config.ewToCm(3)
+                self.geometry.ring_bolt_boss_radius
             )
 
             holeSketch.isComputeDeferred = False
@@ -414,7 +522,8 @@ class CycloidalComponent:
             out = helpers.CircularPattern(self.compo,
                 inputEntites,
                 self.compo.zConstructionAxis,
-                self.config.ring_bolt_count
+                self.config.ring_bolt_count,
+                isolated = True
             )
 
             filletEdges = adsk.core.ObjectCollection.create()
@@ -426,16 +535,15 @@ class CycloidalComponent:
             filletInput.addConstantRadiusEdgeSet(filletEdges, adsk.core.ValueInput.createByReal(0.1), False)
             return self.compo.features.filletFeatures.add(filletInput)
         except Exception as error:
-            if self.ui:
-                self.ui.messageBox("Ring Holes Failed : " + str(error)) 
+            self.result.Fail("Ring Holes", error)
             return None
 
-    def CreateRingKeyFeatures(self, top_ring_body, bottom_ring_body):
+    def CreateRingKeyFeatures(self, top_ring_body, bottom_ring_body, plane = None):
         try:
             sketch = helpers.CreateSketchOnPlane(self.compo,
                 "Ring Keys",
                 True, False,
-                self.cycloid_cut_plane
+                plane if plane else self.cycloid_cut_plane
             )
             
             # inner circle
@@ -481,7 +589,8 @@ class CycloidalComponent:
             helpers.CircularPattern(self.compo,
                 helpers.CreateCollection(slot),
                 self.compo.zConstructionAxis,
-                self.config.ring_bolt_count
+                self.config.ring_bolt_count,
+                isolated = True
             )
 
             key = helpers.OneSideExtrude(self.compo,
@@ -505,54 +614,33 @@ class CycloidalComponent:
             helpers.CircularPattern(self.compo,
                 helpers.CreateCollection(key, key_fillet),
                 self.compo.zConstructionAxis,
-                self.config.ring_bolt_count
+                self.config.ring_bolt_count,
+                isolated = True
             )
         except Exception as error:
-            if self.ui:
-                self.ui.messageBox("Ring Key Features Failed : " + str(error)) 
+            self.result.Fail("Ring Key Features", error)
             return None
 
     def BuildDisc(self):
+        if self.brep:
+            return self.brep.BuildDisc(self.scheduler.Value('disc_race_points'))
         try:
-            half_race_height = self.roller_rad + self.RACE_HEIGHT_RAD_PLUS
+            half_race_height = self.geometry.half_race_height
 
-            groveRootRadius = (self.median_dia  - self.GrooveRootToBallCenter(self.config.roller_diameter) - self.roller_rad) * 0.5
+            groveRootRadius = self.geometry.disc_groove_root_radius
 
             discSketch = helpers.CreateSketch(self.compo, "Disc", True, False)
             raceSketch = helpers.CreateSketch(self.compo, "Disc Race", True, False)
 
             # slot
-            helpers.AddCircle(discSketch, 0,0,0, self.median_radius - self.roller_rad * 2.25)
+            helpers.AddCircle(discSketch, 0,0,0, self.geometry.disc_slot_radius)
 
             # outer ring
-            helpers.AddCircle(discSketch, 0,0,0,
-                groveRootRadius + self.TangentFunctionInverse(
-                    self.config.roller_diameter,
-                    self.config.roller_diameter * 3/4.0,
-                    half_race_height
-                )
-            )
+            helpers.AddCircle(discSketch, 0,0,0, self.geometry.disc_outer_radius)
 
             topRailPoints = adsk.core.ObjectCollection.create()
-
-            radOffset = 2.0 * math.pi * 0.25 / (self.config.roller_count -1)# math.pi * 3/2.0 # 1/4 phase
-            rad = 0.0
-
-            div =  (self.config.roller_count-1) * self.CURVE_SUBSAMPLING
-            for i in range(0, div):
-                rad = 2.0 * math.pi * (i / div * 1.0)
-                amp = math.sin(rad * (self.config.roller_count-1))
-
-                o = groveRootRadius + self.TangentFunctionInverse(
-                    self.config.roller_diameter,
-                    self.config.roller_diameter * (1 - (0.25 * ((amp + 1) * 0.5) )),
-                    half_race_height
-                )
-                topRailPoints.add( adsk.core.Point3D.create(
-                    math.sin(rad - radOffset) * o,
-                    math.cos(rad - radOffset) * o,
-                    half_race_height)
-                )
+            for x, y, z in self.scheduler.Value('disc_race_points'):
+                topRailPoints.add(adsk.core.Point3D.create(x, y, z))
 
             top_1    = raceSketch.sketchCurves.sketchLines.addByTwoPoints(topRailPoints.item(0), topRailPoints.item(1))
 
@@ -635,8 +723,17 @@ class CycloidalComponent:
             split.bodies.item(1).name = "Disc-top"
             
         except Exception as error:
-            if self.ui:
-                self.ui.messageBox("BuildDisc Failed : " + str(error)) 
+            self.result.Fail("BuildDisc", error)
+            return None
+
+    def PlaceDiscLayers(self):
+        if self.geometry.disc_count < 2:
+            return None
+        try:
+            bodies = [self.compo.bRepBodies.itemByName(name) for name in ("Disc-bottom", "Disc-top")]
+            helpers.AddTransformedCopies(self.compo, [body for body in bodies if body], self.LayerMatrices())
+        except Exception as error:
+            self.result.Fail("Disc Layers", error)
             return None
 
     def CreateBearingSeat(self):
@@ -667,8 +764,7 @@ class CycloidalComponent:
                 adsk.fusion.FeatureOperations.CutFeatureOperation
             )
         except Exception as error:
-            if self.ui:
-                self.ui.messageBox("Bearing Seat Failed : " + str(error)) 
+            self.result.Fail("Bearing Seat", error)
             return None
 
     def CreateDiscHoles(self):
@@ -677,7 +773,7 @@ class CycloidalComponent:
             
             helpers.AddCircle(holeSketch,
                 0, self.disc_bolt_circle_radius, 0,
-                self.config.disc_bolt_diameter * 0.5
+                self.geometry.disc_bolt_hole_radius
             )
 
             holeSketch.isComputeDeferred = False
@@ -709,18 +805,19 @@ class CycloidalComponent:
             helpers.CircularPattern(self.compo,
                 inputEntites,
                 self.compo.zConstructionAxis,
-                self.config.disc_bolt_count
+                self.config.disc_bolt_count,
+                isolated = True
             )
         except Exception as error:
-            if self.ui:
-                self.ui.messageBox("Disc Holes Failed : " + str(error)) 
+            self.result.Fail("Disc Holes", error)
             return None
 
     def BuildRollerCage(self):
+        if self.brep:
+            return self.brep.BuildRollerCage()
         try:
             carrierSketch = helpers.CreateSketch(self.compo, "Cage", True, False)
 
-            radOffset = math.pi * 2 / self.config.roller_count
             yOffset = self.config.roller_diameter / 12.0
 
             helpers.AddCircle(carrierSketch,
@@ -732,35 +829,59 @@ class CycloidalComponent:
                 0, yOffset, 0,
                 self.median_radius - (self.roller_rad * 1.7)
             )    
-        
-            for i in range(0, self.config.roller_count):
-                helpers.AddCircle(carrierSketch,
-                    math.sin(radOffset * i) * self.median_radius , (math.cos( radOffset * i) * self.median_radius) + yOffset, 0,
-                    self.roller_rad * 1.1
-                )
             
             carrierSketch.isComputeDeferred = False
 
-            # extrusion
+            # the carrier ring is the only profile with an inner loop
             profiles = adsk.core.ObjectCollection.create()
-            profiles.add(carrierSketch.profiles.item(0))
+            for i in range(0, carrierSketch.profiles.count):
+                if carrierSketch.profiles.item(i).profileLoops.count == 2:
+                    profiles.add(carrierSketch.profiles.item(i))
+
             extrude = helpers.SymmetricExtrude(self.compo,
                 profiles, self.CAGE_SLOT_HEIGHT - self.printer_config.lToCm(1),
                 adsk.fusion.FeatureOperations.NewBodyFeatureOperation
             )
-            extrude.bodies.item(0).name = "Cage"
-        
+            cage = extrude.bodies.item(0)
+            cage.name = "Cage"
+
+            # one pocket patterned around the circle center, the sketch
+            # doesn't grow with the number of rollers
+            pocketSketch = helpers.CreateSketch(self.compo, "Cage Pocket", True, False)
+            helpers.AddCircle(pocketSketch,
+                0, self.median_radius + yOffset, 0,
+                self.roller_rad * 1.1
+            )
+            pocketSketch.isComputeDeferred = False
+
+            pocket = helpers.SymmetricExtrude(self.compo,
+                helpers.CreateCollection(pocketSketch.profiles.item(0)),
+                self.CAGE_SLOT_HEIGHT,
+                adsk.fusion.FeatureOperations.CutFeatureOperation,
+                None,
+                [cage]
+            )
+
+            helpers.CircularPattern(self.compo,
+                helpers.CreateCollection(pocket),
+                self.circle_center,
+                self.config.roller_count,
+                isolated = True
+            )
+
+            helpers.AddTransformedCopies(self.compo, [cage], self.LayerMatrices())
         except Exception as error:
-            if self.ui:
-                self.ui.messageBox("Build Cage Failed : " + str(error)) 
+            self.result.Fail("Build Cage", error)
             return None
 
     def BuildCam(self):
+        if self.brep:
+            return self.brep.BuildCam()
         try:
             sketch = helpers.CreateSketch(self.compo, "Cam", True, False)
             helpers.AddCircle( sketch,
-                0, self.config.roller_diameter * 1/4.0, 0,
-                0.155
+                0, self.geometry.cam_eccentricity, 0,
+                self.geometry.CAM_SHAFT_RADIUS
             )
 
             helpers.AddCircle( sketch, 0,0,0, self.config.cam_bearing_inner_diameter * 0.5 )
@@ -773,7 +894,7 @@ class CycloidalComponent:
                 helpers.CreateCollection(
                     sketch.profiles.item(1)
                 ),
-                0.44,
+                2.0 * self.geometry.CAM_HALF_HEIGHT,
                 adsk.fusion.FeatureOperations.NewBodyFeatureOperation
             )
 
@@ -782,19 +903,30 @@ class CycloidalComponent:
                     sketch.profiles.item(1),
                     sketch.profiles.item(2)
                 ),
-                0.22,
-                0.04,
+                self.geometry.CAM_HALF_HEIGHT,
+                self.geometry.CAM_LIP_HEIGHT,
                 adsk.fusion.ExtentDirections.PositiveExtentDirection,
                 adsk.fusion.FeatureOperations.JoinFeatureOperation
             )
 
-            out.bodies.item(0).name = "Cam"
+            cam = out.bodies.item(0)
+            cam.name = "Cam"
+            if self.geometry.disc_count > 1:
+                self.AddCamLobes(cam)
         except Exception as error:
-            if self.ui:
-                self.ui.messageBox("Cam Failed : " + str(error)) 
+            self.result.Fail("Cam", error)
             return None
 
+    # one lobe per disc turned with its layer, the shaft hole of a lobe ends
+    # up where its disc puts the shaft so the lobes are separate bodies
+    def AddCamLobes(self, cam):
+        lobes = helpers.AddTransformedCopies(self.compo, [cam], self.LayerMatrices())
+        for index, lobe in enumerate(lobes):
+            lobe.name = "Cam {}".format(index + 2)
+
     def BuildBrace(self):
+        # deactivate temporarily to avoid conflicts when cutting
+        self.compo.isBodiesFolderLightBulbOn = False
         try:
             Brace.Brace(
                 self.compo,
@@ -805,9 +937,8 @@ class CycloidalComponent:
                 self.config.ring_bolt_count
             )
         except Exception as error:
-            if self.ui:
-                self.ui.messageBox("Brace Failed : " + str(error)) 
-            return None
+            self.result.Fail("Brace", error)
+        self.compo.isBodiesFolderLightBulbOn = True
 
     def BuildOutputDisc(self):
         try:
@@ -816,13 +947,13 @@ class CycloidalComponent:
                 self.ui,
                 self.median_radius + self.roller_rad * 0.42,
                 self.disc_bolt_circle_radius,
+                self.geometry.output_hole_radius,
                 self.output_cut_plane,
                 self.config,
                 self.printer_config
             )
         except Exception as error:
-            if self.ui:
-                self.ui.messageBox("OutputDisc Failed : " + str(error))
+            self.result.Fail("OutputDisc", error)
             return None
 
     def CreateWheelAssembly(self):
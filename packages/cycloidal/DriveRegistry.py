@@ -0,0 +1,102 @@
+# Copyright (C) 2018  Martin Muehlhaeuser <github@mmone.de>
+
+import json
+import uuid
+import adsk.core, adsk.fusion
+
+GROUP = 'CycloidalDrive'
+
+# Keeps track of the drives in a design. Each drive component carries its
+# config and id, its occurrence the id, and the design an index of
+# id -> name, fingerprint and occurrence token so a drive is found without
+# walking the design.
+class DriveRegistry:
+    def __init__(self, design):
+        self.design = design
+        self.index = self.LoadIndex()
+
+    def LoadIndex(self):
+        attribute = self.design.attributes.itemByName(GROUP, 'drive_index')
+        if attribute:
+            try:
+                return json.loads(attribute.value)
+            except ValueError:
+                pass
+        return {}
+
+    def SaveIndex(self):
+        self.design.attributes.add(GROUP, 'drive_index', json.dumps(self.index, sort_keys = True))
+
+    def Register(self, occurrence, drive_config, drive_id = None):
+        if not drive_id:
+            drive_id = uuid.uuid4().hex
+        component = occurrence.component
+        component.attributes.add(GROUP, 'drive_config', drive_config.ToString())
+        component.attributes.add(GROUP, 'drive_id', drive_id)
+        occurrence.attributes.add(GROUP, 'drive_id', drive_id)
+
+        self.index[drive_id] = {
+            'name': component.name,
+            'fingerprint': drive_config.Fingerprint(),
+            'token': occurrence.entityToken
+        }
+        self.SaveIndex()
+        return drive_id
+
+    def Remove(self, drive_id):
+        if self.index.pop(drive_id, None):
+            self.SaveIndex()
+
+    def Occurrence(self, drive_id):
+        entry = self.index.get(drive_id)
+        if not entry:
+            return None
+
+        for entity in self.design.findEntityByToken(entry['token']):
+            occurrence = adsk.fusion.Occurrence.cast(entity)
+            if occurrence and occurrence.isValid:
+                return occurrence
+
+        # the token went stale, search the occurrence attributes
+        for attribute in self.design.findAttributes(GROUP, 'drive_id'):
+            occurrence = adsk.fusion.Occurrence.cast(attribute.parent)
+            if occurrence and attribute.value == drive_id:
+                entry['token'] = occurrence.entityToken
+                self.SaveIndex()
+                return occurrence
+        return None
+
+    # loads the config of a drive into drive_config
+    def LoadConfig(self, drive_id, drive_config):
+        occurrence = self.Occurrence(drive_id)
+        if not occurrence:
+            return False
+        attribute = occurrence.component.attributes.itemByName(GROUP, 'drive_config')
+        if not attribute:
+            return False
+        drive_config.Load(attribute.value)
+        return True
+
+    # id of the drive an occurrence, body or other selected entity belongs to
+    def DriveOf(self, entity):
+        occurrence = adsk.fusion.Occurrence.cast(entity)
+        if not occurrence:
+            occurrence = getattr(entity, 'assemblyContext', None)
+        while occurrence:
+            attribute = occurrence.attributes.itemByName(GROUP, 'drive_id')
+            if attribute and attribute.value in self.index:
+                return attribute.value
+            occurrence = occurrence.assemblyContext
+        return None
+
+    def FindByFingerprint(self, fingerprint):
+        return [drive_id for drive_id, entry in self.index.items() if entry['fingerprint'] == fingerprint]
+
+    # (id, name) of all drives still in the design, deleted ones are dropped
+    def Drives(self):
+        stale = [drive_id for drive_id in self.index if not self.Occurrence(drive_id)]
+        for drive_id in stale:
+            del self.index[drive_id]
+        if stale:
+            self.SaveIndex()
+        return sorted(((drive_id, entry['name']) for drive_id, entry in self.index.items()), key = lambda d: d[1])
@@ -0,0 +1,47 @@
+# Copyright (C) 2018  Martin Muehlhaeuser <github@mmone.de>
+
+import gc
+import weakref
+
+# Holds event handlers for as long as Fusion needs them alive and detaches
+# them again on Release, one registry per add-in and per command invocation.
+# Counts are kept across registries to watch the add-in footprint.
+class HandlerRegistry:
+    created = 0
+    released = 0
+    live = weakref.WeakSet()
+
+    def __init__(self, name = ''):
+        self.name = name
+        self.handlers = []
+
+    def __len__(self):
+        return len(self.handlers)
+
+    def Add(self, event, handler):
+        event.add(handler)
+        self.handlers.append((event, handler))
+        HandlerRegistry.created += 1
+        HandlerRegistry.live.add(handler)
+        return handler
+
+    def Release(self):
+        for event, handler in self.handlers:
+            try:
+                event.remove(handler)
+            except Exception:
+                # the event is gone with its command already
+                pass
+            HandlerRegistry.released += 1
+        self.handlers = []
+
+    # handlers still referenced anywhere, not only by registries
+    @staticmethod
+    def Stats():
+        gc.collect()
+        return {
+            'created': HandlerRegistry.created,
+            'released': HandlerRegistry.released,
+            'live_handlers': len(HandlerRegistry.live),
+            'gc_objects': len(gc.get_objects())
+        }
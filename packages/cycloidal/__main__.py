@@ -0,0 +1,195 @@
+# Copyright (C) 2018  Martin Muehlhaeuser <github@mmone.de>
+#
+# Generates drives without Fusion from the pure python geometry layer:
+#
+#   python -m cycloidal --roller-count 15 --analyze mass,contact
+#   python -m cycloidal drives.csv --export dxf,3mf --output-dir out
+#
+# Configs come from a JSON object or list of objects, or a CSV with one config
+# per row, both keyed by the DriveConfig attribute names. Flags override every
+# config. Lengths are in cm like DriveConfig, one JSON line is written per
+# config. The exit status is 1 if any config is invalid or failed.
+
+import argparse
+import csv
+import json
+import os
+import sys
+import traceback
+from .components import DriveConfig, DriveGeometry, DriveValidator, PrinterConfig
+from .analysis import MassEstimator, ContactModel, TransmissionError, ToleranceAnalyzer
+from .export import ProfileExporter, PointCloudExporter, RaceMeshExporter
+
+ANALYSES = ['mass', 'contact', 'transmission', 'tolerance']
+EXPORTS = ['dxf', 'svg', '3mf', 'points']
+
+# value of the type of default parsed from text or a JSON value
+def ParseValue(default, value):
+    if isinstance(default, set):
+        if isinstance(value, str):
+            value = value.split(',')
+        return set(item.strip() for item in value if item.strip())
+    if not isinstance(value, str):
+        return type(default)(value)
+    if isinstance(default, bool):
+        if value.lower() in ('1', 'true', 'yes', 'on'):
+            return True
+        if value.lower() in ('0', 'false', 'no', 'off', ''):
+            return False
+        raise ValueError('{} is not a boolean'.format(value))
+    return type(default)(value)
+
+def ApplyValues(drive_config, values):
+    defaults = DriveConfig.DriveConfig().__dict__
+    for key, value in values.items():
+        if key not in defaults:
+            raise ValueError('unknown setting {}'.format(key))
+        setattr(drive_config, key, ParseValue(defaults[key], value))
+    return drive_config
+
+# (source, values) of every config in path, a CSV or JSON file or - for JSON on stdin
+def ReadConfigs(path):
+    if path == '-':
+        return JsonConfigs('stdin', json.load(sys.stdin))
+    with open(path, newline = '') as f:
+        if path.lower().endswith('.csv'):
+            return [('{}:{}'.format(path, i + 2), row) for i, row in enumerate(csv.DictReader(f))]
+        return JsonConfigs(path, json.load(f))
+
+def JsonConfigs(source, data):
+    if isinstance(data, dict):
+        return [(source, data)]
+    return [('{}:{}'.format(source, i), values) for i, values in enumerate(data)]
+
+def ArgumentParser():
+    parser = argparse.ArgumentParser(prog = 'python -m cycloidal',
+        description = 'Validates, analyzes and exports cycloidal drives without Fusion 360.'
+    )
+    parser.add_argument('configs', nargs = '*', help = 'JSON or CSV files of drive configs, - reads JSON from stdin')
+    parser.add_argument('--nozzle-width', type = float, default = 0.4, help = 'mm')
+    parser.add_argument('--layer-height', type = float, default = 0.2, help = 'mm')
+    parser.add_argument('--analyze', default = 'mass', help = 'comma separated of ' + ', '.join(ANALYSES) + ' or none')
+    parser.add_argument('--material', default = 'PLA')
+    parser.add_argument('--torque', type = float, default = 1.0, help = 'Nm on the output for the contact model')
+    parser.add_argument('--samples', type = int, default = 10000, help = 'Monte Carlo samples of the tolerance analysis')
+    parser.add_argument('--export', default = '', help = 'comma separated of ' + ', '.join(EXPORTS))
+    parser.add_argument('--output-dir', default = '.')
+    parser.add_argument('--units', default = 'mm', choices = sorted(ProfileExporter.UNIT_SCALES), help = 'of the DXF and SVG profiles')
+    parser.add_argument('--points', type = int, default = 10 ** 5, help = 'samples of the point cloud export')
+
+    settings = parser.add_argument_group('drive settings', 'override the values of every config')
+    for key, default in sorted(DriveConfig.DriveConfig().__dict__.items()):
+        settings.add_argument('--' + key.replace('_', '-'), dest = 'set_' + key, metavar = type(default).__name__.upper())
+    return parser
+
+def Selection(text, choices, name):
+    selected = [item.strip() for item in text.split(',') if item.strip() and item.strip() != 'none']
+    for item in selected:
+        if item not in choices:
+            raise SystemExit('unknown {} {}, choose from {}'.format(name, item, ', '.join(choices)))
+    return selected
+
+def Dimensions(g):
+    return {
+        'ratio': DriveGeometry.DriveGeometry.ReductionRatio(g.config.roller_count),
+        'median_diameter': g.median_dia,
+        'outer_diameter': 2.0 * g.ring_outer_radius,
+        'disc_outer_diameter': 2.0 * g.disc_outer_radius,
+        'thickness': g.thickness,
+        'height': g.ring_extend,
+        'ring_bolt_circle_radius': g.ring_bolt_circle_radius,
+        'disc_bolt_circle_radius': g.disc_bolt_circle_radius,
+        'cam_eccentricity': g.cam_eccentricity
+    }
+
+def ConfigDict(drive_config):
+    values = dict(drive_config.__dict__)
+    values['components'] = sorted(values['components'])
+    return values
+
+def Process(index, source, drive_config, printer_config, args, analyses, exports):
+    record = {
+        'index': index,
+        'source': source,
+        'fingerprint': drive_config.Fingerprint(),
+        'config': ConfigDict(drive_config)
+    }
+
+    errors = DriveValidator.DriveValidator(drive_config, printer_config).errors
+    record['valid'] = not errors
+    record['errors'] = errors
+    if errors:
+        return record
+
+    record['dimensions'] = Dimensions(DriveGeometry.DriveGeometry(drive_config, printer_config))
+
+    if 'mass' in analyses:
+        estimator = MassEstimator.MassEstimator(printer_config, args.material)
+        estimates = estimator.Estimate(drive_config)
+        record['mass'] = {
+            'totals': estimator.Totals(estimates),
+            'parts': dict((name, part.ToDict()) for name, part in estimates.items())
+        }
+    if 'contact' in analyses:
+        record['contact'] = ContactModel.ContactModel(printer_config, args.material, args.torque).Evaluate(drive_config).ToDict()
+    if 'transmission' in analyses:
+        record['transmission'] = TransmissionError.TransmissionError(printer_config).Summary(drive_config)
+    if 'tolerance' in analyses:
+        stats = ToleranceAnalyzer.ToleranceAnalyzer(printer_config).Analyze(drive_config, args.samples)
+        record['tolerance'] = dict((name, s.ToDict()) for name, s in stats.items())
+
+    paths = []
+    base = os.path.join(args.output_dir, 'drive-{}-{}'.format(index, record['fingerprint'][:8]))
+    for export in exports:
+        if export in ('dxf', 'svg'):
+            path = '{}.{}'.format(base, export)
+            ProfileExporter.ProfileExporter(drive_config, printer_config, args.units).Write(path)
+        elif export == '3mf':
+            path = base + '.3mf'
+            RaceMeshExporter.RaceMeshExporter(drive_config, printer_config).Write(path)
+        elif export == 'points':
+            path = base + '.pts'
+            PointCloudExporter.PointCloudExporter(drive_config, printer_config).Write(path, args.points)
+        paths.append(path)
+    if paths:
+        record['exports'] = paths
+    return record
+
+def Main(argv = None):
+    args = ArgumentParser().parse_args(argv)
+    analyses = Selection(args.analyze, ANALYSES, 'analysis')
+    exports = Selection(args.export, EXPORTS, 'export')
+    if exports:
+        os.makedirs(args.output_dir, exist_ok = True)
+
+    printer_config = PrinterConfig.PrinterConfig(args.nozzle_width, args.layer_height)
+    overrides = dict((key[4:], value) for key, value in vars(args).items()
+        if key.startswith('set_') and value is not None)
+
+    sources = []
+    for path in args.configs:
+        sources += ReadConfigs(path)
+    if not sources:
+        sources = [('flags', {})]
+
+    status = 0
+    for index, (source, values) in enumerate(sources):
+        try:
+            drive_config = ApplyValues(ApplyValues(DriveConfig.DriveConfig(), values), overrides)
+            record = Process(index, source, drive_config, printer_config, args, analyses, exports)
+        except Exception as error:
+            record = {
+                'index': index,
+                'source': source,
+                'valid': False,
+                'errors': [str(error)],
+                'traceback': traceback.format_exc()
+            }
+        if not record['valid']:
+            status = 1
+        sys.stdout.write(json.dumps(record, sort_keys = True) + '\n')
+        sys.stdout.flush()
+    return status
+
+if __name__ == '__main__':
+    sys.exit(Main())
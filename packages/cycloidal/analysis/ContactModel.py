@@ -0,0 +1,167 @@
+# Copyright (C) 2018  Martin Muehlhaeuser <github@mmone.de>
+
+import math
+from ..components import DriveGeometry
+
+# Young's modulus (Pa), Poisson's ratio and compressive strength (Pa) of
+# printed parts
+MATERIALS = {
+    'PLA': (3.5e9, 0.36, 60e6),
+    'PETG': (2.1e9, 0.38, 50e6),
+    'ABS': (2.0e9, 0.35, 45e6),
+    'ASA': (2.0e9, 0.35, 45e6),
+    'Nylon': (1.8e9, 0.39, 40e6)
+}
+
+# input angles sampled over one revolution
+ANGLE_SAMPLES = 64
+
+# peak pressure (Pa) of an elliptical Hertz contact with load (N), principal
+# relative radii rx, ry (m) and reduced modulus (Pa), Hamrock-Brewe fit
+def HertzPressure(load, rx, ry, modulus):
+    if load <= 0:
+        return 0.0
+    if rx > ry:
+        rx, ry = ry, rx
+    ratio = ry / rx
+    k = ratio ** (2.0 / math.pi)
+    e = 1.0 + (math.pi * 0.5 - 1.0) / ratio
+    r = 1.0 / (1.0 / rx + 1.0 / ry)
+    a = (6.0 * k * k * e * load * r / (math.pi * modulus)) ** (1.0 / 3.0)
+    b = (6.0 * e * load * r / (math.pi * k * modulus)) ** (1.0 / 3.0)
+    return 3.0 * load / (2.0 * math.pi * a * b)
+
+class ContactResult:
+    def __init__(self, strength):
+        self.strength = strength
+        self.ring_stress = 0.0
+        self.disc_stress = 0.0
+        self.roller_load = 0.0
+        self.active_rollers = 0.0
+        self.pin_load = 0.0
+        self.pin_pressure = 0.0
+        # roller loads (N) per sampled angle
+        self.roller_loads = []
+
+    def PeakContactStress(self):
+        return max(self.ring_stress, self.disc_stress)
+
+    def ContactSafety(self):
+        stress = self.PeakContactStress()
+        return self.strength / stress if stress > 0 else float('inf')
+
+    def PinSafety(self):
+        return self.strength / self.pin_pressure if self.pin_pressure > 0 else float('inf')
+
+    def Passes(self, safety = 1.0):
+        return self.ContactSafety() >= safety and self.PinSafety() >= safety
+
+    def ToDict(self):
+        return {
+            'ring_stress': self.ring_stress,
+            'disc_stress': self.disc_stress,
+            'roller_load': self.roller_load,
+            'active_rollers': self.active_rollers,
+            'pin_load': self.pin_load,
+            'pin_pressure': self.pin_pressure,
+            'contact_safety': self.ContactSafety(),
+            'pin_safety': self.PinSafety()
+        }
+
+# Load sharing and contact stress of the rollers against the ring and disc
+# races and of the output pins in the disc holes, for an output torque (N m)
+# over one input revolution. Lengths are converted from cm to m.
+class ContactModel:
+    def __init__(self, printer_config, material = 'PLA', torque = 1.0, angle_samples = ANGLE_SAMPLES):
+        self.printer_config = printer_config
+        self.modulus, self.poisson, self.strength = MATERIALS[material]
+        # both bodies are printed from the same material
+        self.reduced_modulus = self.modulus / (1.0 - self.poisson * self.poisson)
+        self.torque = torque
+        self.angles = [2.0 * math.pi * i / angle_samples for i in range(0, angle_samples)]
+
+    # race radius, slope and contact diameter of every roller at every angle
+    def Race(self, g, lobes, groove_root_radius, side):
+        n = g.config.roller_count
+        # slope of the faceted race as built
+        step = math.pi / (lobes * g.CURVE_SUBSAMPLING)
+        positions = [2.0 * math.pi * i / n for i in range(0, n)]
+
+        radii = []
+        slopes = []
+        contacts = []
+        for angle in self.angles:
+            phases = [lobes * p - angle for p in positions]
+            amps = [math.sin(phase) for phase in phases]
+            radii.append([g.RaceRadius(groove_root_radius, side, amp) for amp in amps])
+            slopes.append([
+                (g.RaceRadius(groove_root_radius, side, math.sin(phase + lobes * step)) -
+                g.RaceRadius(groove_root_radius, side, math.sin(phase - lobes * step))) / (2.0 * step)
+                for phase in phases
+            ])
+            contacts.append([g.ContactDiameter(amp) for amp in amps])
+        return radii, slopes, contacts
+
+    # peak pressure of the two flank contacts of each roller, the flanks are
+    # straight in section and follow the race curvature along it
+    def RaceStress(self, g, loads, radii, contacts, side):
+        roller_radius = g.roller_rad * 0.01
+        peak = 0.0
+        for row_loads, row_radii, row_contacts in zip(loads, radii, contacts):
+            for load, radius, contact in zip(row_loads, row_radii, row_contacts):
+                if load <= 0:
+                    continue
+                ratio = contact / g.config.roller_diameter
+                normal = load * 0.5 / ratio
+                curvature = side * ratio / (radius * 0.01)
+                rx = 1.0 / (1.0 / roller_radius + curvature)
+                peak = max(peak, HertzPressure(normal, rx, roller_radius, self.reduced_modulus))
+        return peak
+
+    def Evaluate(self, drive_config):
+        g = DriveGeometry.DriveGeometry(drive_config, self.printer_config)
+        n = drive_config.roller_count
+        result = ContactResult(self.strength)
+
+        disc_radii, disc_slopes, disc_contacts = self.Race(g, n - 1, g.disc_groove_root_radius, 1.0)
+        ring_radii, _, ring_contacts = self.Race(g, n + 1, g.ring_groove_root_radius, -1.0)
+
+        # rollers whose disc flank faces the load carry it in proportion to
+        # their lever arm, sum(F * l) = torque
+        active = 0
+        for row_radii, row_slopes in zip(disc_radii, disc_slopes):
+            levers = [
+                r * 0.01 * s / math.sqrt(r * r + s * s)
+                for r, s in zip(row_radii, row_slopes)
+            ]
+            total = sum(l * l for l in levers if l > 0)
+            loads = [self.torque * l / total if l > 0 and total > 0 else 0.0 for l in levers]
+            active += sum(1 for load in loads if load > 0)
+            result.roller_loads.append(loads)
+
+        result.roller_load = max(max(row) for row in result.roller_loads)
+        result.active_rollers = active / float(len(self.angles))
+        result.disc_stress = self.RaceStress(g, result.roller_loads, disc_radii, disc_contacts, 1.0)
+        result.ring_stress = self.RaceStress(g, result.roller_loads, ring_radii, ring_contacts, -1.0)
+
+        self.Pins(g, result)
+        return result
+
+    # output pins on the disc bolt circle, a pin carries the torque in
+    # proportion to the sine of its angle to the cam eccentricity
+    def Pins(self, g, result):
+        count = g.config.disc_bolt_count
+        lever = g.disc_bolt_circle_radius * 0.01
+        if lever <= 0:
+            result.pin_load = float('inf')
+            result.pin_pressure = float('inf')
+            return
+
+        for angle in self.angles:
+            sines = [math.sin(2.0 * math.pi * i / count + angle) for i in range(0, count)]
+            total = sum(s * s for s in sines if s > 0)
+            result.pin_load = max(result.pin_load, self.torque * max(sines) / (lever * total))
+
+        # projected bearing area of a pin over the disc thickness
+        area = g.config.output_pin_diameter * 0.01 * g.thickness * 0.01
+        result.pin_pressure = result.pin_load / area
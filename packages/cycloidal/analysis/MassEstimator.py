@@ -0,0 +1,311 @@
+# Copyright (C) 2018  Martin Muehlhaeuser <github@mmone.de>
+
+import math
+from ..components import DriveGeometry
+
+# g/cm^3
+DENSITIES = {
+    'PLA': 1.24,
+    'PETG': 1.27,
+    'ABS': 1.04,
+    'ASA': 1.07,
+    'Nylon': 1.14
+}
+
+# race samples per lobe, the race is smooth so few samples integrate it well
+RACE_SUBSAMPLING = 4
+
+def Overlap(a0, a1, b0, b1):
+    return max(0.0, min(a1, b1) - max(a0, b0))
+
+# area of the part of a circle of radius r whose center is d away from the
+# center of a circle of radius R that lies inside the latter
+def CircleOverlapArea(R, r, d):
+    if d >= R + r:
+        return 0.0
+    if d <= abs(R - r):
+        return math.pi * min(R, r) ** 2
+    a = r * r * math.acos((d * d + r * r - R * R) / (2 * d * r))
+    b = R * R * math.acos((d * d + R * R - r * r) / (2 * d * R))
+    c = 0.5 * math.sqrt((-d + r + R) * (d + r - R) * (d - r + R) * (d + r + R))
+    return a + b - c
+
+# area and centroid distance of the segment of a circle of radius r cut off
+# by a chord at distance d from the center
+def CircleSegment(r, d):
+    if d >= r:
+        return 0.0, 0.0
+    angle = 2.0 * math.acos(d / r)
+    area = 0.5 * r * r * (angle - math.sin(angle))
+    centroid = 4.0 * r * math.sin(angle * 0.5) ** 3 / (3.0 * (angle - math.sin(angle)))
+    return area, centroid
+
+# Race loft between the groove root circle (z = 0) and the race curve
+# (|z| = height), mirrored at z = 0 like the builder does.
+class Loft:
+    def __init__(self, geometry, lobes, groove_root_radius, side):
+        self.root = groove_root_radius
+        self.height = geometry.half_race_height
+        count = lobes * RACE_SUBSAMPLING
+        self.dtheta = 2.0 * math.pi / count
+        self.deltas = [
+            geometry.RaceRadius(groove_root_radius, side, math.sin(2.0 * math.pi * i / count * lobes)) - groove_root_radius
+            for i in range(0, count)
+        ]
+
+    def Integral(self, delta, a, b, clip):
+        # integral of (max(r, clip)^2 - clip^2) / 2 over s in [a, b] with r = root + delta * s
+        if delta == 0:
+            r = self.root
+            return 0.5 * (r * r - clip * clip) * (b - a) if r > clip else 0.0
+        crossing = (clip - self.root) / delta
+        if delta > 0:
+            a = max(a, crossing)
+        else:
+            b = min(b, crossing)
+        if b <= a:
+            return 0.0
+        ra = self.root + delta * a
+        rb = self.root + delta * b
+        return (rb ** 3 - ra ** 3) / (6.0 * delta) - 0.5 * clip * clip * (b - a)
+
+    # volume of the loft between z0 and z1 outside the radius clip
+    def Volume(self, z0, z1, clip = 0.0):
+        h = self.height
+        ranges = []
+        if z1 > 0 and z0 < h:
+            ranges.append((max(z0, 0.0) / h, min(z1, h) / h))
+        if z0 < 0 and z1 > -h:
+            ranges.append((-min(z1, 0.0) / h, -max(z0, -h) / h))
+
+        total = 0.0
+        for a, b in ranges:
+            for delta in self.deltas:
+                total += self.Integral(delta, a, b, clip)
+        return total * self.dtheta * h
+
+class PartEstimate:
+    def __init__(self, name, volume, bbox, quantity = 1):
+        self.name = name
+        self.volume = volume
+        self.bbox = bbox
+        self.quantity = quantity
+        self.mass = 0.0
+        self.filament_m = 0.0
+        self.print_seconds = 0.0
+
+    def ToDict(self):
+        return {
+            'volume': self.volume,
+            'mass': self.mass,
+            'bbox': self.bbox,
+            'quantity': self.quantity,
+            'filament_m': self.filament_m,
+            'print_seconds': self.print_seconds
+        }
+
+# Estimates volume (cm^3), mass (g), bounding box (cm) and print time and
+# filament use of every generated part from the config alone.
+class MassEstimator:
+    def __init__(self, printer_config, material = 'PLA', print_speed = 50.0, filament_diameter = 1.75):
+        self.printer_config = printer_config
+        self.density = DENSITIES[material]
+        # mm^3/s extruded at the configured line width and layer height
+        self.flow = printer_config.nozzle_width * printer_config.layer_height * print_speed
+        self.filament_area = math.pi * (filament_diameter * 0.5) ** 2
+
+    def Estimate(self, drive_config):
+        g = DriveGeometry.DriveGeometry(drive_config, self.printer_config)
+        components = drive_config.components
+
+        parts = []
+        if 'Ring' in components:
+            parts += self.Ring(g)
+        if 'Disc' in components:
+            parts += self.Disc(g)
+        if 'Cage' in components:
+            parts.append(self.Cage(g))
+        if 'Cam' in components:
+            parts.append(self.Cam(g))
+        if 'Rollers' in components:
+            parts.append(PartEstimate('Roller',
+                4.0 / 3.0 * math.pi * g.roller_rad ** 3,
+                (g.config.roller_diameter,) * 3,
+                g.config.roller_count * g.disc_count
+            ))
+        if 'Brace' in components:
+            parts.append(self.Brace(g))
+        if 'Output' in components:
+            parts += self.OutputDisc(g)
+
+        estimates = {}
+        for part in parts:
+            part.mass = part.volume * self.density
+            # cm^3 to mm^3
+            part.filament_m = part.volume * 1000.0 / self.filament_area * 0.001
+            part.print_seconds = part.volume * 1000.0 / self.flow
+            estimates[part.name] = part
+        return estimates
+
+    def Totals(self, estimates):
+        return {
+            'volume': sum(p.volume * p.quantity for p in estimates.values()),
+            'mass': sum(p.mass * p.quantity for p in estimates.values()),
+            'filament_m': sum(p.filament_m * p.quantity for p in estimates.values()),
+            'print_seconds': sum(p.print_seconds * p.quantity for p in estimates.values())
+        }
+
+    def Ring(self, g):
+        c = g.config
+        p = self.printer_config
+        z0 = g.ring_bottom
+        z1 = z0 + g.ring_extend
+        cut = g.cage_slot_height * 0.5
+        cuts = g.LayerCutHeights()
+        count = c.ring_bolt_count
+
+        hole_r = g.ring_bolt_hole_radius
+        boss_r = g.ring_bolt_boss_radius
+        boss_outside = math.pi * boss_r ** 2 - CircleOverlapArea(g.ring_outer_radius, boss_r, g.ring_bolt_circle_radius)
+        area = math.pi * (g.ring_outer_radius ** 2 - g.ring_inner_radius ** 2) + count * (boss_outside - math.pi * hole_r ** 2)
+
+        loft = Loft(g, c.roller_count + 1, g.ring_groove_root_radius, -1.0)
+        slot_area = math.pi * (g.slot_radius ** 2 - g.ring_inner_radius ** 2)
+
+        key_inner = g.ring_outer_radius - c.ring_bolt_diameter * 0.5
+        sector = 0.5 * (math.pi / count) * (g.ring_outer_radius ** 2 - key_inner ** 2) * count
+
+        def Volume(za, zb):
+            v = area * Overlap(za, zb, z0, z1)
+            # race and slot of every layer, relative to the layer center
+            for layer in range(0, g.disc_count):
+                shift = layer * g.layer_pitch
+                la = za + shift
+                lb = zb + shift
+                v -= loft.Volume(la, lb, g.ring_inner_radius)
+                slot0 = max(la, -cut)
+                slot1 = min(lb, cut)
+                if slot1 > slot0:
+                    # the race already removed part of the slot
+                    v -= slot_area * (slot1 - slot0) - (loft.Volume(slot0, slot1, g.ring_inner_radius) - loft.Volume(slot0, slot1, g.slot_radius))
+            return v
+
+        diameter = 2.0 * max(g.ring_outer_radius, g.ring_bolt_circle_radius + boss_r)
+        top_end = g.output_cut_height if 'Output' in c.components else z1
+
+        parts = [
+            PartEstimate('Ring-bottom', Volume(z0, cuts[-1]) - sector * p.lToCm(6), (diameter, diameter, cuts[-1] - z0)),
+            PartEstimate('Ring-top', Volume(cut, top_end) + sector * p.lToCm(5), (diameter, diameter, top_end - cut + p.lToCm(5)))
+        ]
+        for layer in range(1, g.disc_count):
+            za = cuts[layer]
+            zb = cuts[layer - 1]
+            parts.append(PartEstimate('Ring-middle {}'.format(layer),
+                Volume(za, zb) + sector * (p.lToCm(5) - p.lToCm(6)),
+                (diameter, diameter, zb - za + p.lToCm(5))
+            ))
+        if 'Output' in c.components:
+            parts.append(PartEstimate('Output-top', Volume(top_end, z1), (diameter, diameter, z1 - top_end)))
+        return parts
+
+    def Disc(self, g):
+        c = g.config
+        p = self.printer_config
+        h = g.half_race_height
+        plate = p.lToCm(4)
+        cut = g.cage_slot_height * 0.5
+        bottom = -h - plate
+        top = h + plate
+
+        loft = Loft(g, c.roller_count - 1, g.disc_groove_root_radius, 1.0)
+        plate_area = math.pi * g.disc_outer_radius ** 2
+        holes = c.disc_bolt_count * math.pi * (c.disc_bolt_diameter * 0.5) ** 2
+
+        seat_r = (c.cam_bearing_outer_diameter - 0.16) * 0.5
+        seat_step = math.pi * ((c.cam_bearing_outer_diameter * 0.5) ** 2 - seat_r ** 2)
+        has_seat = 'Bearing Seat' in c.components
+
+        def Volume(za, zb):
+            v = loft.Volume(za, zb)
+            v += plate_area * (Overlap(za, zb, h, top) + Overlap(za, zb, bottom, -h))
+            v -= holes * Overlap(za, zb, bottom, top)
+            v -= loft.Volume(max(za, -cut), min(zb, cut), g.disc_slot_radius)
+            if has_seat:
+                v -= math.pi * seat_r ** 2 * Overlap(za, zb, bottom, top) + seat_step * Overlap(za, zb, -0.21, 0.21)
+            return v
+
+        diameter = 2.0 * g.disc_outer_radius
+        return [
+            PartEstimate('Disc-bottom', Volume(bottom, cut), (diameter, diameter, cut - bottom), g.disc_count),
+            PartEstimate('Disc-top', Volume(cut, top), (diameter, diameter, top - cut), g.disc_count)
+        ]
+
+    def Cage(self, g):
+        height = g.cage_slot_height - self.printer_config.lToCm(1)
+        area = math.pi * (g.cage_outer_radius ** 2 - g.cage_inner_radius ** 2) - g.config.roller_count * math.pi * g.cage_pocket_radius ** 2
+        diameter = 2.0 * g.cage_outer_radius
+        return PartEstimate('Cage', area * height, (diameter, diameter, height), g.disc_count)
+
+    def Cam(self, g):
+        c = g.config
+        inner = c.cam_bearing_inner_diameter * 0.5
+        lip = (c.cam_bearing_inner_diameter + 0.08) * 0.5
+        height = 2.0 * g.CAM_HALF_HEIGHT + g.CAM_LIP_HEIGHT
+        volume = (math.pi * inner ** 2 * 2.0 * g.CAM_HALF_HEIGHT + math.pi * lip ** 2 * g.CAM_LIP_HEIGHT
+            - math.pi * g.CAM_SHAFT_RADIUS ** 2 * height)
+        width = 2.0 * lip
+        # one lobe per disc
+        return PartEstimate('Cam', volume, (width, width, height), g.disc_count)
+
+    # the brace sketch is solved by constraints, arms are taken as trapezoids
+    # between hub and bolt ring
+    def Brace(self, g):
+        c = g.config
+        hub_r = 0.6
+        count = c.ring_bolt_count
+        bolt_r = c.ring_bolt_diameter * 0.5
+        ring_r = bolt_r + 3 * 0.04
+        radius = g.ring_bolt_circle_radius
+
+        arm = 0.5 * ((c.ring_bolt_diameter + 0.4) + hub_r * 1.1 * 2.0) * (radius - hub_r)
+        plate = math.pi * hub_r ** 2 + count * (arm + math.pi * ring_r ** 2 - math.pi * bolt_r ** 2) - math.pi * (c.shaft_diameter * 0.5) ** 2
+
+        outer = radius * 0.65
+        inner = radius * 0.15
+        outer_hole = math.pi * outer / count
+        inner_hole = math.pi * inner / count
+        lightening = count * (0.5 * (outer_hole + inner_hole) * (outer - inner) + math.pi * (outer_hole * 0.5) ** 2)
+
+        volume = (plate - lightening) * 0.2
+        volume += count * math.pi * (ring_r ** 2 - bolt_r ** 2) * 0.15
+        volume += math.pi * (hub_r ** 2 - (hub_r * 0.5) ** 2) * 0.1
+
+        diameter = 2.0 * (radius + ring_r)
+        return PartEstimate('Brace', max(volume, 0.0), (diameter, diameter, 0.35))
+
+    def OutputDisc(self, g):
+        c = g.config
+        p = self.printer_config
+        cage_width = p.ewToCm(3)
+        gap = p.ewToCm(2)
+        height = c.output_bearing_ball_diameter + 2 * 0.08
+
+        disc_r = g.ring_inner_radius - cage_width - 2 * gap
+        pin_r = g.output_hole_radius
+        area = math.pi * (disc_r ** 2 - (c.shaft_diameter * 0.5) ** 2) - c.disc_bolt_count * math.pi * pin_r ** 2
+
+        # ball groove revolved at the rim
+        race_center = g.ring_inner_radius - cage_width * 0.5 - gap
+        segment, centroid = CircleSegment(c.output_bearing_ball_diameter * 0.5 + 0.01, race_center - disc_r)
+        groove = 2.0 * math.pi * (race_center - centroid) * segment
+
+        hole = c.output_bearing_ball_diameter + 0.02
+        cage_height = hole + 2 * 0.06
+        cage_inner = g.ring_inner_radius - cage_width - gap
+        cage_outer = g.ring_inner_radius - gap
+        cage = math.pi * (cage_outer ** 2 - cage_inner ** 2) * cage_height - c.disc_bolt_count * math.pi * (hole * 0.5) ** 2 * cage_width
+
+        return [
+            PartEstimate('Output Disc', area * height - groove, (2.0 * disc_r, 2.0 * disc_r, height)),
+            PartEstimate('Output Cage', cage, (2.0 * cage_outer, 2.0 * cage_outer, cage_height))
+        ]
@@ -0,0 +1,119 @@
+# Copyright (C) 2018  Martin Muehlhaeuser <github@mmone.de>
+
+import copy
+from ..components import DriveConfig, DriveGeometry, DriveValidator
+from . import MassEstimator, ContactModel
+
+# input angles of the contact model, the peak is found well with few
+CONTACT_ANGLE_SAMPLES = 16
+
+def Range(start, stop, step):
+    count = int(round((stop - start) / step))
+    return [start + i * step for i in range(0, count + 1)]
+
+class Candidate:
+    def __init__(self, config, ratio, outer_diameter, mass, stress):
+        self.config = config
+        self.ratio = ratio
+        self.outer_diameter = outer_diameter
+        self.mass = mass
+        self.stress = stress
+        self.score = 0.0
+
+    def Objectives(self):
+        return (self.outer_diameter, self.mass, self.stress)
+
+    def Dominates(self, other):
+        mine = self.Objectives()
+        theirs = other.Objectives()
+        return all(a <= b for a, b in zip(mine, theirs)) and any(a < b for a, b in zip(mine, theirs))
+
+    def ToDict(self):
+        return {
+            'roller_count': self.config.roller_count,
+            'roller_diameter': self.config.roller_diameter,
+            'roller_spacing': self.config.roller_spacing,
+            'ratio': self.ratio,
+            'outer_diameter': self.outer_diameter,
+            'mass': self.mass,
+            'stress': self.stress,
+            'score': self.score
+        }
+
+# Searches roller count, diameter and spacing for drives matching a reduction
+# ratio inside an envelope and returns the Pareto set of outer diameter, mass
+# and roller contact stress, best weighted score first.
+class Optimizer:
+    def __init__(self, printer_config, base_config = None, material = 'PLA', torque = 1.0):
+        self.printer_config = printer_config
+        self.base_config = base_config if base_config else DriveConfig.DriveConfig()
+        self.material = material
+        self.torque = torque
+        self.estimator = MassEstimator.MassEstimator(printer_config, material)
+        self.contact = ContactModel.ContactModel(printer_config, material, torque, CONTACT_ANGLE_SAMPLES)
+
+    def RollerCounts(self, target_ratio, ratio_tolerance):
+        return [n for n in range(6, 101)
+            if abs(DriveGeometry.DriveGeometry.ReductionRatio(n) - target_ratio) <= ratio_tolerance + 1e-9]
+
+    def Evaluate(self, config, max_outer_diameter, min_wall):
+        if not DriveValidator.DriveValidator(config, self.printer_config, min_wall).IsValid():
+            return None
+
+        geometry = DriveGeometry.DriveGeometry(config, self.printer_config)
+        outer_diameter = 2.0 * geometry.ring_outer_radius
+        if outer_diameter > max_outer_diameter:
+            return None
+
+        estimates = self.estimator.Estimate(config)
+        return Candidate(config,
+            DriveGeometry.DriveGeometry.ReductionRatio(config.roller_count),
+            outer_diameter,
+            self.estimator.Totals(estimates)['mass'],
+            self.contact.Evaluate(config).PeakContactStress()
+        )
+
+    def Candidates(self, target_ratio, max_outer_diameter, ratio_tolerance = 0.0,
+            diameters = None, spacings = None, min_wall = None):
+        if diameters is None:
+            diameters = Range(0.3, 1.0, 0.05)
+        if spacings is None:
+            spacings = Range(0.5, 2.0, 0.1)
+
+        candidates = []
+        for roller_count in self.RollerCounts(target_ratio, ratio_tolerance):
+            for roller_diameter in diameters:
+                for roller_spacing in spacings:
+                    config = copy.deepcopy(self.base_config)
+                    config.roller_count = roller_count
+                    config.roller_diameter = roller_diameter
+                    config.roller_spacing = roller_spacing
+
+                    candidate = self.Evaluate(config, max_outer_diameter, min_wall)
+                    if candidate:
+                        candidates.append(candidate)
+        return candidates
+
+    @staticmethod
+    def ParetoSet(candidates):
+        return [c for c in candidates if not any(other.Dominates(c) for other in candidates)]
+
+    # weights for outer diameter, mass and stress, objectives are normalized
+    # to the range of the Pareto set
+    @staticmethod
+    def Rank(candidates, weights = (1.0, 1.0, 1.0)):
+        if not candidates:
+            return []
+        lows = [min(c.Objectives()[i] for c in candidates) for i in range(0, 3)]
+        highs = [max(c.Objectives()[i] for c in candidates) for i in range(0, 3)]
+        for c in candidates:
+            c.score = sum(
+                w * ((value - low) / (high - low) if high > low else 0.0)
+                for w, value, low, high in zip(weights, c.Objectives(), lows, highs)
+            )
+        return sorted(candidates, key = lambda c: c.score)
+
+    def Optimize(self, target_ratio, max_outer_diameter, ratio_tolerance = 0.0,
+            diameters = None, spacings = None, min_wall = None, weights = (1.0, 1.0, 1.0)):
+        candidates = self.Candidates(target_ratio, max_outer_diameter, ratio_tolerance, diameters, spacings, min_wall)
+        return self.Rank(self.ParetoSet(candidates), weights)
@@ -0,0 +1,119 @@
+# Copyright (C) 2018  Martin Muehlhaeuser <github@mmone.de>
+
+import copy
+import itertools
+from ..components import DriveConfig, DriveGeometry
+from . import Optimizer
+
+class StageSolution:
+    def __init__(self, candidates):
+        self.candidates = candidates
+        self.configs = [c.config for c in candidates]
+        self.ratios = [c.ratio for c in candidates]
+        self.ratio = 1.0
+        for ratio in self.ratios:
+            self.ratio *= ratio
+        self.outer_diameter = max(c.outer_diameter for c in candidates)
+        self.envelope_mismatch = self.outer_diameter - min(c.outer_diameter for c in candidates)
+        self.mass = sum(c.mass for c in candidates)
+        self.stress = max(c.stress for c in candidates)
+
+    def ToDict(self):
+        return {
+            'ratio': self.ratio,
+            'ratios': self.ratios,
+            'outer_diameter': self.outer_diameter,
+            'envelope_mismatch': self.envelope_mismatch,
+            'mass': self.mass,
+            'stress': self.stress,
+            'stages': [c.ToDict() for c in self.candidates]
+        }
+
+# Solves the configs of a compound drive together. The stage ratios multiply
+# up to the target ratio, every stage fits the envelope and the rings of all
+# stages end up with the same outer diameter within envelope_tolerance (cm) so
+# the housings stack. Every stage sees the output torque of the one before.
+class StageSolver:
+    def __init__(self, printer_config, base_config = None, material = 'PLA', torque = 1.0):
+        self.printer_config = printer_config
+        self.base_config = base_config if base_config else DriveConfig.DriveConfig()
+        self.material = material
+        self.torque = torque
+
+    # stage configs built from the base, only the last stage may drop the output
+    def StageBase(self, stage, stage_count):
+        config = copy.deepcopy(self.base_config)
+        if stage < stage_count - 1:
+            config.components.add('Output')
+        return config
+
+    # roller count tuples whose ratios multiply up to the target
+    @staticmethod
+    def RollerCounts(target_ratio, stage_count, ratio_tolerance, counts = range(6, 101)):
+        tuples = []
+        for combination in itertools.combinations_with_replacement(counts, stage_count):
+            ratio = 1.0
+            for n in combination:
+                ratio *= DriveGeometry.DriveGeometry.ReductionRatio(n)
+            # ascending, the smaller ratio first keeps the torque on the
+            # later stages down
+            if abs(ratio - target_ratio) <= ratio_tolerance + 1e-9:
+                tuples.append(combination)
+        return tuples
+
+    def StageCandidates(self, stage, stage_count, roller_count, torque, max_outer_diameter,
+            diameters, spacings, min_wall):
+        optimizer = Optimizer.Optimizer(self.printer_config,
+            self.StageBase(stage, stage_count), self.material, torque
+        )
+        ratio = DriveGeometry.DriveGeometry.ReductionRatio(roller_count)
+        return optimizer.Candidates(ratio, max_outer_diameter, 0.0, diameters, spacings, min_wall)
+
+    # lightest candidate per stage within the envelope of anchor
+    @staticmethod
+    def Match(anchor, stage_candidates, envelope_tolerance):
+        chosen = []
+        for candidates in stage_candidates:
+            fitting = [c for c in candidates if abs(c.outer_diameter - anchor.outer_diameter) <= envelope_tolerance + 1e-9]
+            if not fitting:
+                return None
+            chosen.append(min(fitting, key = lambda c: c.mass))
+        return chosen
+
+    # solutions best first: closest ratio, then envelope, then mass
+    def Solve(self, target_ratio, stage_count, max_outer_diameter, ratio_tolerance = 0.0,
+            envelope_tolerance = 0.1, diameters = None, spacings = None, min_wall = None):
+        tuples = self.RollerCounts(target_ratio, stage_count, ratio_tolerance)
+
+        # the candidates of a stage depend on its roller count and the torque
+        # the stages before hand on, each is evaluated once. They are pure
+        # python, threads would not run them in parallel under the GIL and
+        # the Fusion interpreter can't start worker processes
+        candidates = {}
+        for counts in tuples:
+            torque = self.torque
+            for stage, roller_count in enumerate(counts):
+                key = counts[:stage + 1]
+                if key not in candidates:
+                    candidates[key] = self.StageCandidates(
+                        stage, stage_count, roller_count, torque,
+                        max_outer_diameter, diameters, spacings, min_wall
+                    )
+                torque *= DriveGeometry.DriveGeometry.ReductionRatio(roller_count)
+
+        solutions = []
+        for counts in tuples:
+            stage_candidates = [candidates[counts[:stage + 1]] for stage in range(0, stage_count)]
+            for anchor in stage_candidates[0]:
+                chosen = self.Match(anchor, stage_candidates, envelope_tolerance)
+                if chosen:
+                    solutions.append(StageSolution(chosen))
+
+        # drop repeats found from different anchors
+        unique = {}
+        for solution in solutions:
+            key = tuple(id(c) for c in solution.candidates)
+            unique[key] = solution
+        return sorted(unique.values(),
+            key = lambda s: (abs(s.ratio - target_ratio), s.envelope_mismatch, s.mass)
+        )
@@ -0,0 +1,188 @@
+# Copyright (C) 2018  Martin Muehlhaeuser <github@mmone.de>
+
+import copy
+import math
+import random
+from ..components import DriveGeometry, PrinterConfig
+from . import TransmissionError
+
+SAMPLES = 100000
+
+# percentiles reported for every clearance
+PERCENTILES = (0.01, 0.5, 0.99)
+
+ARCMIN = 180.0 * 60.0 / math.pi
+
+# layers the ring key slot is cut deep and the key is high, see BuildRing
+KEY_SLOT_LAYERS = 6
+KEY_LAYERS = 5
+
+# steps of the roller play and backlash tables over the roller growth, which
+# spans GROWTH_SIGMAS standard deviations to both sides
+GROWTH_STEPS = 32
+GROWTH_SIGMAS = 6.0
+
+def Percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+# linear interpolation in a table of values at equal steps from start,
+# clamped to its ends
+def Interpolate(table, start, step, x):
+    f = min(max((x - start) / step, 0.0), len(table) - 1.0)
+    i = min(int(f), len(table) - 2)
+    return table[i] + (table[i + 1] - table[i]) * (f - i)
+
+class ClearanceStats:
+    def __init__(self, name, nominal, values):
+        self.name = name
+        self.nominal = nominal
+        ordered = sorted(values)
+        count = float(len(ordered))
+        self.mean = sum(ordered) / count
+        self.std = math.sqrt(sum((v - self.mean) ** 2 for v in ordered) / count)
+        self.min = ordered[0]
+        self.max = ordered[-1]
+        self.percentiles = [Percentile(ordered, p) for p in PERCENTILES]
+        # share of prints that assemble without rework
+        self.yield_ = sum(1 for v in ordered if v >= 0) / count
+
+    def ToDict(self):
+        return {
+            'name': self.name,
+            'nominal': self.nominal,
+            'mean': self.mean,
+            'std': self.std,
+            'min': self.min,
+            'max': self.max,
+            'percentiles': dict(zip(['p{}'.format(int(p * 100)) for p in PERCENTILES], self.percentiles)),
+            'yield': self.yield_
+        }
+
+# Monte Carlo analysis of the clearances the drive gets from PrinterConfig
+# and the nominal dimensions. Every sample is one print at a perturbed
+# PrinterConfig: z features get their layer count at the real layer height
+# through lToCm plus noise, outer contours grow and holes shrink by half the
+# difference of the real to the drawn ewToCm width, holes shrink further and
+# the rollers vary in diameter. The drawn clearances come from DriveGeometry,
+# the roller play and backlash from the contact solve of TransmissionError on
+# the races with the rollers grown by the roller and width error. Width and
+# layer deviations are relative to the printer settings, the others in mm.
+# Clearances are reported in mm and the backlash in arcmin.
+class ToleranceAnalyzer:
+    def __init__(self, printer_config, width_sigma = 0.05, layer_sigma = 0.05,
+            roller_sigma = 0.02, hole_shrink = 0.1, hole_sigma = 0.05, seed = 0):
+        self.printer_config = printer_config
+        self.width_sigma = width_sigma
+        self.layer_sigma = layer_sigma
+        self.roller_sigma = roller_sigma
+        self.hole_shrink = hole_shrink
+        self.hole_sigma = hole_sigma
+        self.seed = seed
+
+    # layers of a z feature drawn length high
+    def Layers(self, length):
+        return int(round(length / self.printer_config.lToCm(1)))
+
+    # radial gaps and hole clearances (cm) as drawn
+    @staticmethod
+    def DrawnClearances(g):
+        layers = range(0, g.disc_count)
+        # the cage is drawn about the roller circle, y_offset off the ring
+        # axis, every layer is turned with its slot
+        cage_shift = max(math.hypot(*g.LayerPoint(layer, 0.0, g.y_offset, 0.0)[:2]) for layer in layers)
+        # the output holes leave the eccentric and layer offset of the pins
+        pin_room = min(g.output_hole_radius - g.cam_eccentricity - g.PinOffset(layer) for layer in layers)
+        output_gap = g.printer_config.ewToCm(2)
+        return {
+            'cage_ring_gap': g.slot_radius - g.cage_outer_radius - cage_shift,
+            'cage_disc_gap': g.cage_inner_radius - g.y_offset - g.disc_slot_radius,
+            'cage_pocket': g.cage_pocket_radius - g.roller_rad,
+            'output_disc_gap': output_gap,
+            'ring_bolt_hole': 2.0 * g.ring_bolt_hole_radius - g.config.ring_bolt_diameter,
+            'disc_bolt_hole': 2.0 * g.disc_bolt_hole_radius - g.config.disc_bolt_diameter,
+            'output_pin_hole': 2.0 * pin_room - g.config.output_pin_diameter
+        }
+
+    # (roller play (cm), backlash (rad)) with the rollers grown by growth
+    # (cm), at the drawn input angle and the races as built
+    @staticmethod
+    def RacePlay(g, transmission, growth):
+        subsampling = g.CURVE_SUBSAMPLING
+        angles = transmission.RollerAngles(g, 0.0)
+        window = transmission.Window(g)
+        free = transmission.FreeAngle(g, subsampling, angles, 0.0, window, growth)
+        leading, lagging = transmission.FreeRange(g, subsampling, angles, 0.0, window, growth)
+        return transmission.Room(g, subsampling, angles, free, growth), lagging - leading
+
+    def Analyze(self, drive_config, samples = SAMPLES):
+        g = DriveGeometry.DriveGeometry(drive_config, self.printer_config)
+        rng = random.Random(self.seed)
+        gauss = rng.gauss
+        layer = self.printer_config.layer_height
+        width = self.printer_config.nozzle_width
+        drawn = self.DrawnClearances(g)
+
+        slot_layers = self.Layers(g.cage_slot_height)
+        cage_layers = self.Layers(g.cage_slot_height - self.printer_config.lToCm(1))
+
+        # the roller radius and half the width error grow the rollers into
+        # the races alike, play and backlash are tabulated over the sum
+        growth_sigma = math.hypot(self.roller_sigma * 0.5, self.width_sigma * width * 0.5) * 0.1
+        growth_step = 2.0 * GROWTH_SIGMAS * growth_sigma / GROWTH_STEPS
+        growth_start = -GROWTH_SIGMAS * growth_sigma
+        transmission = TransmissionError.TransmissionError(self.printer_config)
+        plays = [self.RacePlay(g, transmission, growth_start + i * growth_step) for i in range(0, GROWTH_STEPS + 1)]
+        play_table = [play for play, backlash in plays]
+        backlash_table = [backlash for play, backlash in plays]
+
+        names = ['cage_slot', 'ring_key', 'cage_ring_gap', 'cage_disc_gap', 'cage_pocket',
+            'output_disc_gap', 'ring_bolt_hole', 'disc_bolt_hole', 'output_pin_hole', 'roller_play']
+        columns = dict((name, []) for name in names)
+        backlash = []
+
+        for i in range(0, samples):
+            printed = PrinterConfig.PrinterConfig(
+                width * (1.0 + gauss(0.0, self.width_sigma)),
+                layer * (1.0 + gauss(0.0, self.layer_sigma))
+            )
+            z = self.layer_sigma * printed.lToCm(1)
+            w = printed.ewToCm(1) - self.printer_config.ewToCm(1)
+            roller_growth = gauss(0.0, self.roller_sigma) * 0.05
+
+            # the cage is one layer lower than its slot, the ring key one layer lower than the key slot
+            columns['cage_slot'].append(printed.lToCm(slot_layers) - printed.lToCm(cage_layers) + gauss(0.0, z) - gauss(0.0, z))
+            columns['ring_key'].append(printed.lToCm(KEY_SLOT_LAYERS) - printed.lToCm(KEY_LAYERS) + gauss(0.0, z) - gauss(0.0, z))
+
+            # both walls of a gap move by half the width error
+            columns['cage_ring_gap'].append(drawn['cage_ring_gap'] - w)
+            columns['cage_disc_gap'].append(drawn['cage_disc_gap'] - w)
+            columns['cage_pocket'].append(drawn['cage_pocket'] - w * 0.5 - roller_growth)
+            columns['output_disc_gap'].append(drawn['output_disc_gap'] - w)
+
+            # holes shrink by the width error and beyond
+            for name in ('ring_bolt_hole', 'disc_bolt_hole', 'output_pin_hole'):
+                columns[name].append(drawn[name] - w - gauss(self.hole_shrink, self.hole_sigma) * 0.1)
+
+            # negative play is preload
+            growth = roller_growth + w * 0.5
+            columns['roller_play'].append(Interpolate(play_table, growth_start, growth_step, growth))
+            backlash.append(Interpolate(backlash_table, growth_start, growth_step, growth) * ARCMIN)
+
+        stats = dict((name, ClearanceStats(name, 0.0, [v * 10.0 for v in columns[name]])) for name in names)
+        stats['cage_slot'].nominal = self.printer_config.lToCm(slot_layers - cage_layers) * 10.0
+        stats['ring_key'].nominal = self.printer_config.lToCm(KEY_SLOT_LAYERS - KEY_LAYERS) * 10.0
+        for name, value in drawn.items():
+            stats[name].nominal = value * 10.0
+        stats['roller_play'].nominal = Interpolate(play_table, growth_start, growth_step, 0.0) * 10.0
+        stats['backlash'] = ClearanceStats('backlash', 0.0, backlash)
+        stats['backlash'].nominal = Interpolate(backlash_table, growth_start, growth_step, 0.0) * ARCMIN
+        return stats
+
+    # analyzes one drive for several printer settings
+    def Compare(self, drive_config, printer_configs, samples = SAMPLES):
+        results = []
+        for printer_config in printer_configs:
+            analyzer = copy.copy(self)
+            analyzer.printer_config = printer_config
+            results.append((printer_config, analyzer.Analyze(drive_config, samples)))
+        return results
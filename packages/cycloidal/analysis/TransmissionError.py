@@ -0,0 +1,198 @@
+# Copyright (C) 2018  Martin Muehlhaeuser <github@mmone.de>
+
+import cmath
+import math
+from ..components import DriveGeometry
+
+# input angles per revolution, a power of two for the FFT
+ANGLE_SAMPLES = 256
+
+# number of spectrum peaks in a summary
+PEAK_COUNT = 5
+
+ARCSEC = 180.0 * 3600.0 / math.pi
+
+# disc angles sampled around the nominal one for the free position and
+# bisections of the angle the disc is stopped at
+SEARCH_STEPS = 24
+BISECTIONS = 24
+
+# iterative radix-2 FFT, len(values) must be a power of two
+def FFT(values):
+    n = len(values)
+    if n & (n - 1):
+        raise ValueError('FFT size {} is not a power of two'.format(n))
+
+    out = [complex(v) for v in values]
+    j = 0
+    for i in range(1, n):
+        bit = n >> 1
+        while j & bit:
+            j ^= bit
+            bit >>= 1
+        j |= bit
+        if i < j:
+            out[i], out[j] = out[j], out[i]
+
+    size = 2
+    while size <= n:
+        step = cmath.exp(-2j * math.pi / size)
+        half = size // 2
+        for start in range(0, n, size):
+            w = 1.0
+            for k in range(start, start + half):
+                t = w * out[k + half]
+                out[k + half] = out[k] - t
+                out[k] = out[k] + t
+                w *= step
+        size *= 2
+    return out
+
+# one sided amplitude spectrum, index = order per input revolution
+def Spectrum(values):
+    n = len(values)
+    transform = FFT(values)
+    return [abs(transform[k]) * (1.0 if k == 0 else 2.0) / n for k in range(0, n // 2)]
+
+# Unloaded transmission error of the disc over one input revolution from a
+# contact solve on the race functions. The cage carries the rollers round at
+# 1 / roller_count of the input, each roller sits radially free between the
+# ball center bounds of the ring and the disc race. Per input angle the disc
+# lags behind its nominal angle until the first roller is pinched between
+# both races, its offset from the nominal angle is the transmission error.
+class TransmissionError:
+    def __init__(self, printer_config, angle_samples = ANGLE_SAMPLES):
+        self.printer_config = printer_config
+        self.angles = [2.0 * math.pi * i / angle_samples for i in range(0, angle_samples)]
+
+    # race radius at profile phase u of the polyline with subsampling points
+    # per lobe, 0 evaluates the smooth race
+    @staticmethod
+    def FacetedRadius(g, groove_root_radius, side, lobes, subsampling, u):
+        if not subsampling:
+            return g.RaceRadius(groove_root_radius, side, math.sin(u))
+
+        pitch = 2.0 * math.pi / subsampling
+        k = math.floor(u / pitch)
+        r1 = g.RaceRadius(groove_root_radius, side, math.sin(k * pitch))
+        r2 = g.RaceRadius(groove_root_radius, side, math.sin((k + 1) * pitch))
+        # intersection of the ray at angle t with the chord between the points
+        span = pitch / lobes
+        t = (u - k * pitch) / lobes
+        return r1 * r2 * math.sin(span) / (r1 * math.sin(t) + r2 * math.sin(span - t))
+
+    # radius of the center of a roller in the race at angle a of the race,
+    # the groove is lofted from the top race radius to the groove root, the
+    # roller touches both of its flanks. A roller grown by growth, or flanks
+    # grown by it towards the roller, push the center along the flank normals
+    @classmethod
+    def BallCenterRadius(cls, g, race, subsampling, a, growth = 0.0):
+        lobes, root, side = race
+        # the race points lead or lag by a quarter lobe, see IterRacePoints
+        u = (lobes * a + side * math.pi * 0.5) % (2.0 * math.pi)
+        width = (cls.FacetedRadius(g, root, side, lobes, subsampling, u) - root) / g.half_race_height
+        return root + side * (g.roller_rad + growth) * math.sqrt(1.0 + width * width)
+
+    # room left between the races for every roller, negative if it is
+    # squeezed, with the rollers at angles and the disc at disc_angle
+    def Rooms(self, g, subsampling, angles, disc_angle, growth = 0.0):
+        return [
+            self.BallCenterRadius(g, g.ring_race, subsampling, a, -growth) -
+            self.BallCenterRadius(g, g.disc_race, subsampling, a - disc_angle, growth)
+            for a in angles
+        ]
+
+    def Room(self, g, subsampling, angles, disc_angle, growth = 0.0):
+        return min(self.Rooms(g, subsampling, angles, disc_angle, growth))
+
+    # disc angle with the most room within window of nominal, the disc is
+    # free about it
+    def FreeAngle(self, g, subsampling, angles, nominal, window, growth = 0.0):
+        steps = [nominal + window * (2.0 * i / SEARCH_STEPS - 1.0) for i in range(0, SEARCH_STEPS + 1)]
+        return max(steps, key = lambda disc_angle: self.Room(g, subsampling, angles, disc_angle, growth))
+
+    # (leading, lagging) disc angle (rad) the rollers at angles stop the disc
+    # at. Both are the free angle if the rollers are squeezed there
+    def FreeRange(self, g, subsampling, angles, nominal, window, growth = 0.0):
+        room = lambda disc_angle: self.Room(g, subsampling, angles, disc_angle, growth)
+
+        free = self.FreeAngle(g, subsampling, angles, nominal, window, growth)
+        if room(free) <= 0.0:
+            return free, free
+
+        stops = []
+        for direction in (-1.0, 1.0):
+            # turning away from the free angle until the first roller is pinched
+            step = direction * window / SEARCH_STEPS
+            low = free
+            high = free + step
+            while room(high) > 0.0 and abs(high - nominal) < 2.0 * window:
+                low = high
+                high += step
+            for i in range(0, BISECTIONS):
+                middle = (low + high) * 0.5
+                if room(middle) > 0.0:
+                    low = middle
+                else:
+                    high = middle
+            stops.append(low)
+        return tuple(stops)
+
+    # disc angle (rad) where the lagging disc is stopped by the rollers
+    def SolveDiscAngle(self, g, subsampling, angles, nominal, window):
+        return self.FreeRange(g, subsampling, angles, nominal, window)[1]
+
+    # disc angles around nominal a disc lobe can be held in
+    @staticmethod
+    def Window(g):
+        # within half a disc lobe the disc can only be held by its own rollers
+        return math.pi / g.disc_race[0] * 0.5
+
+    # roller angles at input angle, the cage carries them at 1 / roller_count
+    @staticmethod
+    def RollerAngles(g, angle):
+        n = g.config.roller_count
+        return [2.0 * math.pi * i / n - angle / n for i in range(0, n)]
+
+    # disc angle error (rad) per input angle, 0 subsampling evaluates the
+    # smooth races, None the polylines the builder creates
+    def Evaluate(self, drive_config, subsampling = None):
+        g = DriveGeometry.DriveGeometry(drive_config, self.printer_config)
+        if subsampling is None:
+            subsampling = g.CURVE_SUBSAMPLING
+
+        window = self.Window(g)
+        ratio = DriveGeometry.DriveGeometry.ReductionRatio(drive_config.roller_count)
+
+        errors = []
+        for angle in self.angles:
+            nominal = -angle / ratio
+            errors.append(self.SolveDiscAngle(g, subsampling, self.RollerAngles(g, angle), nominal, window) - nominal)
+
+        mean = sum(errors) / len(errors)
+        return [e - mean for e in errors]
+
+    @staticmethod
+    def Statistics(errors):
+        spectrum = Spectrum(errors)
+        orders = sorted(range(1, len(spectrum)), key = lambda k: spectrum[k], reverse = True)[:PEAK_COUNT]
+        return {
+            'rms': math.sqrt(sum(e * e for e in errors) / len(errors)) * ARCSEC,
+            'peak_to_peak': (max(errors) - min(errors)) * ARCSEC,
+            'peak_orders': [[k, spectrum[k] * ARCSEC] for k in orders]
+        }
+
+    # error of the built races and, as faceting, its difference to the
+    # error of the smooth races
+    def Summary(self, drive_config, subsampling = None):
+        smooth = self.Evaluate(drive_config, 0)
+        faceted = self.Evaluate(drive_config, subsampling)
+
+        summary = self.Statistics(faceted)
+        summary['roller_count'] = drive_config.roller_count
+        summary['smooth'] = self.Statistics(smooth)
+        summary['faceting'] = self.Statistics([f - s for f, s in zip(faceted, smooth)])
+        return summary
+
+    def Summaries(self, drive_configs, subsampling = None):
+        return [self.Summary(drive_config, subsampling) for drive_config in drive_configs]
@@ -0,0 +1,294 @@
+# Copyright (C) 2018  Martin Muehlhaeuser <github@mmone.de>
+
+import adsk.core, adsk.fusion, traceback
+import math
+from . import helpers
+
+# extent of the tool bodies used to split bodies at a height
+SPLIT_EXTENT = 1000.0
+
+def PolygonNormal(points):
+    # Newell's method, robust for non convex planar polygons
+    nx = ny = nz = 0.0
+    for i in range(0, len(points)):
+        x0, y0, z0 = points[i]
+        x1, y1, z1 = points[(i + 1) % len(points)]
+        nx += (y0 - y1) * (z0 + z1)
+        ny += (z0 - z1) * (x0 + x1)
+        nz += (x0 - x1) * (y0 + y1)
+    return (nx, ny, nz)
+
+def Oriented(face, points, outward):
+    normal = PolygonNormal([points[i] for i in face])
+    if normal[0] * outward[0] + normal[1] * outward[1] + normal[2] * outward[2] < 0:
+        return list(reversed(face))
+    return face
+
+# Builds ring, disc, cage and cam in memory with the TemporaryBRepManager and
+# adds every finished part to the component with a single base feature.
+# Fillets and chamfers of the feature based builder are not applied.
+class BRepBackend:
+    def __init__(self, compo, result, geometry):
+        self.compo = compo
+        self.result = result
+        self.geometry = geometry
+        self.config = geometry.config
+        self.printer_config = geometry.printer_config
+        self.temp_brep = adsk.fusion.TemporaryBRepManager.get()
+
+    def Cylinder(self, x, y, z0, z1, radius):
+        return self.temp_brep.createCylinderOrCone(
+            adsk.core.Point3D.create(x, y, z0), radius,
+            adsk.core.Point3D.create(x, y, z1), radius
+        )
+
+    def Annulus(self, inner_radius, outer_radius, z0, z1, x = 0, y = 0):
+        body = self.Cylinder(x, y, z0, z1, outer_radius)
+        self.Subtract(body, self.Cylinder(x, y, z0, z1, inner_radius))
+        return body
+
+    def Union(self, target, tool):
+        self.temp_brep.booleanOperation(target, tool, adsk.fusion.BooleanTypes.UnionBooleanType)
+
+    def Subtract(self, target, tool):
+        self.temp_brep.booleanOperation(target, tool, adsk.fusion.BooleanTypes.DifferenceBooleanType)
+
+    def Intersect(self, target, tool):
+        self.temp_brep.booleanOperation(target, tool, adsk.fusion.BooleanTypes.IntersectionBooleanType)
+
+    def Rotated(self, body, angle, cx = 0, cy = 0):
+        copy = self.temp_brep.copy(body)
+        mat = adsk.core.Matrix3D.create()
+        mat.setToRotation(angle, adsk.core.Vector3D.create(0, 0, 1), adsk.core.Point3D.create(cx, cy, 0))
+        self.temp_brep.transform(copy, mat)
+        return copy
+
+    # copy of body in the given disc layer
+    def Placed(self, body, layer):
+        copy = self.temp_brep.copy(body)
+        self.temp_brep.transform(copy, helpers.PlacementMatrix(*self.geometry.LayerPlacement(layer)))
+        return copy
+
+    # union of count copies of body rotated about the z axis through (cx, cy)
+    def Pattern(self, body, count, cx = 0, cy = 0):
+        out = self.temp_brep.copy(body)
+        for i in range(1, count):
+            self.Union(out, self.Rotated(body, 2.0 * math.pi * i / count, cx, cy))
+        return out
+
+    # returns the parts of body below and above the height z
+    def Split(self, body, z):
+        below = self.temp_brep.copy(body)
+        self.Intersect(below, self.Cylinder(0, 0, -SPLIT_EXTENT, z, SPLIT_EXTENT))
+        above = self.temp_brep.copy(body)
+        self.Intersect(above, self.Cylinder(0, 0, z, SPLIT_EXTENT, SPLIT_EXTENT))
+        return below, above
+
+    # closed solid from planar faces, each face lists point indices counter
+    # clockwise seen from outside
+    def Polyhedron(self, points, faces):
+        body_def = adsk.fusion.BRepBodyDefinition.create()
+        shell_def = body_def.lumpDefinitions.add().shellDefinitions.add()
+
+        vertices = [body_def.createVertexDefinition(adsk.core.Point3D.create(*p)) for p in points]
+        edges = {}
+
+        for face in faces:
+            face_points = [points[i] for i in face]
+            plane = adsk.core.Plane.create(
+                adsk.core.Point3D.create(*face_points[0]),
+                adsk.core.Vector3D.create(*PolygonNormal(face_points))
+            )
+            loop_def = shell_def.faceDefinitions.add(plane, False).loopDefinitions.add()
+
+            for a, b in zip(face, face[1:] + face[:1]):
+                if (b, a) in edges:
+                    loop_def.bRepCoEdgeDefinitions.add(edges[(b, a)], True)
+                else:
+                    edge = body_def.createEdgeDefinitionByCurve(
+                        vertices[a], vertices[b],
+                        adsk.core.Line3D.create(
+                            adsk.core.Point3D.create(*points[a]),
+                            adsk.core.Point3D.create(*points[b])
+                        )
+                    )
+                    edges[(a, b)] = edge
+                    loop_def.bRepCoEdgeDefinitions.add(edge, False)
+
+        return body_def.createBody()
+
+    def Prism(self, polygon, z0, z1):
+        # counter clockwise in xy so the side faces point outwards
+        if PolygonNormal([(x, y, 0) for x, y in polygon])[2] < 0:
+            polygon = list(reversed(polygon))
+
+        n = len(polygon)
+        points = [(x, y, z0) for x, y in polygon] + [(x, y, z1) for x, y in polygon]
+        faces = [list(reversed(range(0, n))), list(range(n, 2 * n))]
+        for i in range(0, n):
+            j = (i + 1) % n
+            faces.append([i, j, n + j, n + i])
+        return self.Polyhedron(points, faces)
+
+    # the race loft from the top race polyline to the groove root circle,
+    # mirrored at the xy plane, as one faceted solid
+    def RaceSolid(self, race_points, groove_root_radius):
+        n = len(race_points)
+        points = list(race_points)
+        for x, y, z in race_points:
+            o = math.sqrt(x * x + y * y)
+            points.append((x / o * groove_root_radius, y / o * groove_root_radius, 0.0))
+        points += [(x, y, -z) for x, y, z in race_points]
+
+        faces = [
+            Oriented(list(range(0, n)), points, (0, 0, 1)),
+            Oriented(list(range(2 * n, 3 * n)), points, (0, 0, -1))
+        ]
+        for i in range(0, n):
+            j = (i + 1) % n
+            for top, mid in ((0, n), (2 * n, n)):
+                outward = (points[i][0], points[i][1], 0)
+                faces.append(Oriented([top + i, top + j, mid + j], points, outward))
+                faces.append(Oriented([top + i, mid + j, mid + i], points, outward))
+        return self.Polyhedron(points, faces)
+
+    def KeySectorPolygon(self, inner_radius, outer_radius, segments = 8):
+        rad = 2 * math.pi / self.config.ring_bolt_count
+        start = rad / 4.0
+        end = rad - rad / 4.0
+        angles = [start + (end - start) * i / segments for i in range(0, segments + 1)]
+
+        polygon = [(math.sin(a) * outer_radius, math.cos(a) * outer_radius) for a in angles]
+        polygon += [(math.sin(a) * inner_radius, math.cos(a) * inner_radius) for a in reversed(angles)]
+        return polygon
+
+    def Commit(self, named_bodies):
+        if self.compo.parentDesign.designType == adsk.fusion.DesignTypes.DirectDesignType:
+            for body, name in named_bodies:
+                self.compo.bRepBodies.add(body).name = name
+            return None
+
+        base = self.compo.features.baseFeatures.add()
+        base.startEdit()
+        for body, name in named_bodies:
+            self.compo.bRepBodies.add(body, base).name = name
+        base.finishEdit()
+        return base
+
+    def BuildRing(self, race_points):
+        try:
+            g = self.geometry
+            z0 = g.ring_bottom
+            z1 = z0 + g.ring_extend
+
+            ring = self.Annulus(g.ring_inner_radius, g.ring_outer_radius, z0, z1)
+
+            # bolt bosses and holes
+            boss = self.Cylinder(0, g.ring_bolt_circle_radius, z0, z1,
+                g.ring_bolt_boss_radius
+            )
+            self.Union(ring, self.Pattern(boss, self.config.ring_bolt_count))
+
+            hole = self.Cylinder(0, g.ring_bolt_circle_radius, z0, z1, g.ring_bolt_hole_radius)
+            self.Subtract(ring, self.Pattern(hole, self.config.ring_bolt_count))
+
+            # race and cage slot of every disc layer
+            race = self.RaceSolid(race_points, g.ring_groove_root_radius)
+            cut_z = g.cage_slot_height * 0.5
+            slot = self.Cylinder(0, 0, -cut_z, cut_z, g.slot_radius)
+            for layer in range(0, g.disc_count):
+                self.Subtract(ring, self.Placed(race, layer))
+                self.Subtract(ring, self.Placed(slot, layer))
+
+            # split at every layer with keys, from the top down
+            sector = self.KeySectorPolygon(
+                g.ring_outer_radius - self.config.ring_bolt_diameter * 0.5,
+                g.ring_outer_radius
+            )
+            middles = []
+            lower = ring
+            for layer, cut_z in enumerate(g.LayerCutHeights()):
+                lower, upper = self.Split(lower, cut_z)
+                slot = self.Prism(sector, cut_z - self.printer_config.lToCm(6), cut_z)
+                self.Subtract(lower, self.Pattern(slot, self.config.ring_bolt_count))
+                key = self.Prism(sector, cut_z - self.printer_config.lToCm(5), cut_z)
+                self.Union(upper, self.Pattern(key, self.config.ring_bolt_count))
+                if layer == 0:
+                    top = upper
+                else:
+                    middles.append((upper, "Ring-middle {}".format(layer)))
+
+            bodies = [(lower, "Ring-bottom")] + middles
+            if 'Output' in self.config.components:
+                top, output_top = self.Split(top, g.output_cut_height)
+                bodies += [(top, "Ring-top"), (output_top, "Output-top")]
+            else:
+                bodies.append((top, "Ring-top"))
+
+            return self.Commit(bodies)
+        except Exception as error:
+            self.result.Fail("buildRing", error)
+            return None
+
+    def BuildDisc(self, race_points):
+        try:
+            g = self.geometry
+            plate = self.printer_config.lToCm(4)
+            cut_z = g.cage_slot_height * 0.5
+
+            disc = self.RaceSolid(race_points, g.disc_groove_root_radius)
+
+            # top and bottom plate
+            self.Union(disc, self.Cylinder(0, 0, g.half_race_height, g.half_race_height + plate, g.disc_outer_radius))
+            self.Union(disc, self.Cylinder(0, 0, -g.half_race_height - plate, -g.half_race_height, g.disc_outer_radius))
+
+            hole = self.Cylinder(0, g.disc_bolt_circle_radius,
+                -g.thickness * 0.5, g.thickness * 0.5,
+                g.disc_bolt_hole_radius
+            )
+            self.Subtract(disc, self.Pattern(hole, self.config.disc_bolt_count))
+
+            # cage slot
+            self.Subtract(disc, self.Annulus(g.disc_slot_radius, g.disc_outer_radius, -cut_z, cut_z))
+
+            bottom, top = self.Split(disc, cut_z)
+            return self.Commit([(bottom, "Disc-bottom"), (top, "Disc-top")])
+        except Exception as error:
+            self.result.Fail("BuildDisc", error)
+            return None
+
+    def BuildRollerCage(self):
+        try:
+            g = self.geometry
+            half_height = (g.cage_slot_height - self.printer_config.lToCm(1)) * 0.5
+
+            cage = self.Annulus(g.cage_inner_radius, g.cage_outer_radius, -half_height, half_height, 0, g.y_offset)
+            pocket = self.Cylinder(0, g.median_radius + g.y_offset, -half_height, half_height, g.cage_pocket_radius)
+            self.Subtract(cage, self.Pattern(pocket, self.config.roller_count, 0, g.y_offset))
+
+            bodies = [(cage, "Cage")]
+            for layer in range(1, g.disc_count):
+                bodies.append((self.Placed(cage, layer), "Cage {}".format(layer + 1)))
+            return self.Commit(bodies)
+        except Exception as error:
+            self.result.Fail("Build Cage", error)
+            return None
+
+    def BuildCam(self):
+        try:
+            g = self.geometry
+            e = g.cam_eccentricity
+            half = g.CAM_HALF_HEIGHT
+            top = half + g.CAM_LIP_HEIGHT
+            lobe = self.Cylinder(0, 0, -half, half, self.config.cam_bearing_inner_diameter * 0.5)
+            self.Union(lobe, self.Cylinder(0, 0, half, top, (self.config.cam_bearing_inner_diameter + 0.08) * 0.5))
+            self.Subtract(lobe, self.Cylinder(0, e, -half, top, g.CAM_SHAFT_RADIUS))
+
+            # one lobe per disc turned with its layer, separate bodies
+            bodies = [(lobe, "Cam")]
+            for layer in range(1, g.disc_count):
+                bodies.append((self.Placed(lobe, layer), "Cam {}".format(layer + 1)))
+            return self.Commit(bodies)
+        except Exception as error:
+            self.result.Fail("Cam", error)
+            return None
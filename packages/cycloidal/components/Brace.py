@@ -134,7 +134,8 @@ class Brace:
                 feat2
             ),
             self.compo.zConstructionAxis,
-            self.arm_count
+            self.arm_count,
+            isolated = True
         )
 
         # center bushing
@@ -241,5 +242,6 @@ class Brace:
         helpers.CircularPattern(self.compo,
             inputEntites,
             self.compo.zConstructionAxis,
-            repeat_count
+            repeat_count,
+            isolated = True
         )
\ No newline at end of file
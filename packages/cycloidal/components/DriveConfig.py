@@ -2,6 +2,8 @@
 
 import pickle
 import codecs
+import hashlib
+import json
 
 class DriveConfig:
     def __init__(self):
@@ -13,6 +15,8 @@ class DriveConfig:
         self.cam_bearing_inner_diameter = 1.0
         self.shaft_bearing_diameter = 0.3
         self.shaft_diameter = 0.31
+        # discs phase shifted by 360 / disc_count degrees on one multi-lobe cam
+        self.disc_count = 1
 
         # flange
         self.ring_bolt_count = 12
@@ -29,8 +33,22 @@ class DriveConfig:
         # components
         self.components = set(['Ring', 'Disc', 'Bearing Seat', 'Rollers', 'Cage', 'Cam', 'Brace', 'Output'])
 
+        # build
+        self.instance_rollers = True
+        self.keep_history = True
+        # 'features' builds with timeline features, 'brep' builds ring, disc,
+        # cage and cam in memory
+        self.solid_backend = 'features'
+
     def Load(self, pickle_string):
-        self.__dict__ = pickle.loads(codecs.decode(pickle_string.encode(), "base64"))
+        # merge so configs saved by older versions keep the defaults of newer settings
+        self.__dict__.update(pickle.loads(codecs.decode(pickle_string.encode(), "base64")))
 
     def ToString(self):
-        return codecs.encode(pickle.dumps(self.__dict__), "base64").decode()
\ No newline at end of file
+        return codecs.encode(pickle.dumps(self.__dict__), "base64").decode()
+
+    # stable hash of all settings
+    def Fingerprint(self):
+        values = dict(self.__dict__)
+        values['components'] = sorted(values['components'])
+        return hashlib.sha1(json.dumps(values, sort_keys=True).encode()).hexdigest()
\ No newline at end of file
@@ -0,0 +1,231 @@
+# Copyright (C) 2018  Martin Muehlhaeuser <github@mmone.de>
+
+import math
+
+# Derived dimensions and race curves of a drive. Pure python so it can be
+# evaluated without Fusion, all lengths in cm like the API.
+class DriveGeometry:
+    RACE_HEIGHT_RAD_PLUS = 0.01
+    CURVE_SUBSAMPLING = 32
+    # the cam is drawn 2 * CAM_HALF_HEIGHT high about the disc center with
+    # a shaft hole of CAM_SHAFT_RADIUS and a CAM_LIP_HEIGHT lip on top
+    CAM_HALF_HEIGHT = 0.22
+    CAM_SHAFT_RADIUS = 0.155
+    CAM_LIP_HEIGHT = 0.04
+
+    def __init__(self, drive_config, printer_config):
+        self.config = drive_config
+        self.printer_config = printer_config
+
+        self.cage_slot_height = self.printer_config.lToCm(5)
+
+        # calculates the diameter from the length of the circle segment intersected with the main planet orbit
+        self.median_dia = self.CalculateMedianDiameter(
+            self.config.roller_diameter,
+            self.config.roller_count,
+            self.config.roller_spacing
+        )
+        self.median_radius = self.median_dia * 0.5
+        self.roller_rad = self.config.roller_diameter * 0.5
+        self.thickness = self.config.roller_diameter + 2 * self.printer_config.lToCm(5) + 2 * self.RACE_HEIGHT_RAD_PLUS
+        self.half_race_height = self.roller_rad + self.RACE_HEIGHT_RAD_PLUS
+        self.y_offset = self.config.roller_diameter / 12.0
+        # the shaft runs through the cam eccentric to the disc
+        self.cam_eccentricity = self.config.roller_diameter / 4.0
+
+        # further discs are stacked below the first one, away from the output,
+        # each layer turned about the ring axis by its phase
+        self.disc_count = self.config.disc_count
+        self.layer_pitch = self.thickness
+        self.stack_height = (self.disc_count - 1) * self.layer_pitch
+
+        self.ring_outer_radius = self.CalculateOuterRadius(
+            self.median_radius,
+            self.config.roller_diameter,
+            self.config.ring_bolt_diameter
+        )
+        self.ring_inner_radius = self.median_radius + self.roller_rad * 0.42
+        self.ring_bolt_circle_radius = self.ring_outer_radius - self.config.ring_bolt_diameter * 0.25
+        self.disc_bolt_circle_radius = self.median_radius - (self.roller_rad * 3.0) - self.config.disc_bolt_diameter * 0.5
+        self.slot_radius = self.median_radius + (self.roller_rad * 2.25)
+        # bolt holes are drawn at the bolt size
+        self.ring_bolt_hole_radius = self.config.ring_bolt_diameter * 0.5
+        self.disc_bolt_hole_radius = self.config.disc_bolt_diameter * 0.5
+        # the ring bolts sit in bosses that may stand out of the housing
+        self.ring_bolt_boss_radius = self.ring_bolt_hole_radius + self.printer_config.ewToCm(3)
+
+        groove = self.GrooveRootToBallCenter(self.config.roller_diameter)
+        self.ring_groove_root_radius = (self.median_dia + groove + self.roller_rad) * 0.5
+        self.disc_groove_root_radius = (self.median_dia - groove - self.roller_rad) * 0.5
+        self.disc_slot_radius = self.median_radius - self.roller_rad * 2.25
+        # lobes, groove root radius and side of the races
+        self.ring_race = (self.config.roller_count + 1, self.ring_groove_root_radius, -1.0)
+        self.disc_race = (self.config.roller_count - 1, self.disc_groove_root_radius, 1.0)
+
+        self.disc_outer_radius = self.disc_groove_root_radius + self.TangentFunctionInverse(
+            self.config.roller_diameter,
+            self.config.roller_diameter * 3/4.0,
+            self.half_race_height
+        )
+
+        self.cage_outer_radius = self.median_radius + (self.roller_rad * 1.7)
+        self.cage_inner_radius = self.median_radius - (self.roller_rad * 1.7)
+        self.cage_pocket_radius = self.roller_rad * 1.1
+
+        if 'Output' in self.config.components:
+            self.ring_extend = self.thickness + self.config.output_bearing_ball_diameter + 2 * self.printer_config.lToCm(5)
+        else:
+            self.ring_extend = self.thickness
+        self.ring_bottom = -self.thickness * 0.5 - self.stack_height
+        self.ring_extend += self.stack_height
+
+        self.output_hole_radius = max(self.OutputHoleRadius(layer) for layer in range(0, self.disc_count))
+
+        self.output_cut_height = self.thickness * 0.5 + self.printer_config.lToCm(5) + self.config.output_bearing_ball_diameter * 0.5
+
+    @staticmethod
+    def CalculateMedianDiameter(roller_diameter, roller_count, roller_gap_factor):
+        return roller_diameter / (2 * math.sin(math.pi / ((1 + roller_gap_factor) * roller_count * 2.0)))
+
+    @staticmethod
+    def CalculateOuterRadius(median_radius, roller_diameter, ring_bolt_diameter):
+        return median_radius + roller_diameter + ring_bolt_diameter * 1.5
+
+    # the ring race has roller_count + 1 lobes, the disc race roller_count - 1,
+    # with the ring fixed the disc turns once per (roller_count - 1) / 2 cam turns
+    @staticmethod
+    def ReductionRatio(roller_count):
+        return (roller_count - 1) / 2.0
+
+    def DiscPhase(self, layer):
+        return 2.0 * math.pi * layer / self.disc_count
+
+    # rotation and height offset of a disc layer as (angle, center x,
+    # center y, z offset). Every part of a layer, the ring race and cage slot
+    # as well as disc, rollers, cage and cam lobe, is turned about the ring
+    # axis so the layer keeps the relation of the first one
+    def LayerPlacement(self, layer):
+        return (self.DiscPhase(layer), 0.0, 0.0, -layer * self.layer_pitch)
+
+    def LayerPoint(self, layer, x, y, z):
+        angle, cx, cy, dz = self.LayerPlacement(layer)
+        s = math.sin(angle)
+        c = math.cos(angle)
+        return (
+            cx + (x - cx) * c - (y - cy) * s,
+            cy + (x - cx) * s + (y - cy) * c,
+            z + dz
+        )
+
+    # distance of the disc bolt holes of a layer from the nearest output pin,
+    # the pins sit on the disc bolt circle about the output axis
+    def PinOffset(self, layer):
+        count = self.config.disc_bolt_count
+        pins = [(
+            math.sin(2.0 * math.pi * i / count) * self.disc_bolt_circle_radius,
+            math.cos(2.0 * math.pi * i / count) * self.disc_bolt_circle_radius
+        ) for i in range(0, count)]
+
+        offset = 0.0
+        for x, y in pins:
+            hx, hy, hz = self.LayerPoint(layer, x, y, 0.0)
+            offset = max(offset, min(math.hypot(hx - px, hy - py) for px, py in pins))
+        return offset
+
+    # output hole the pins of a layer need, the eccentric play of the pins
+    # plus how far the turned disc moves them off the output pins
+    def OutputHoleRadius(self, layer):
+        return (self.config.output_pin_diameter + self.config.roller_diameter * 0.5) * 0.5 + self.PinOffset(layer)
+
+    # heights of the planes the ring and disc are split at, one per layer
+    def LayerCutHeights(self):
+        return [self.cage_slot_height * 0.5 - layer * self.layer_pitch for layer in range(0, self.disc_count)]
+
+    # offsets (x, y, z) of the stages of a compound drive, the housings are
+    # stacked on the drive axis, each stage on the ring of the one below
+    @staticmethod
+    def StagePlacements(geometries):
+        placements = [(0.0, 0.0, 0.0)]
+        for below, above in zip(geometries, geometries[1:]):
+            x, y, z = placements[-1]
+            placements.append((x, y, z + below.ring_bottom + below.ring_extend - above.ring_bottom))
+        return placements
+
+    # the output of below turns about the drive axis, the cam shaft of above
+    # cam_eccentricity off it, the coupling between them takes up the offset.
+    # Heights in the frame of below from the output disc over the gap up to
+    # the cam of above and through it, and the offset of the cam shaft
+    @classmethod
+    def StageCoupling(cls, below, above):
+        interface = below.ring_bottom + below.ring_extend
+        gap = above.thickness * 0.5 - cls.CAM_HALF_HEIGHT
+        return (
+            (below.output_cut_height, interface, interface + gap, interface + gap + 2.0 * cls.CAM_HALF_HEIGHT),
+            above.cam_eccentricity
+        )
+
+    @staticmethod
+    def GrooveRootToBallCenter(planet_diameter):
+        return (planet_diameter * planet_diameter) / (2.0 * (planet_diameter * 3/4.0))
+
+    @staticmethod
+    def TangentFunction(planet_diameter, contact_diameter, x):
+        return contact_diameter / math.sqrt(planet_diameter * planet_diameter - contact_diameter * contact_diameter) * x
+
+    @staticmethod
+    def TangentFunctionInverse(planet_diameter, contact_diameter, y):
+        if( contact_diameter == planet_diameter):
+            return 0
+        elif ( contact_diameter == 0):
+            return planet_diameter * 0.5
+        else:
+            return y / (contact_diameter / math.sqrt(planet_diameter * planet_diameter - contact_diameter * contact_diameter))
+
+    # effective contact diameter of a roller at race amplitude amp in [-1, 1]
+    def ContactDiameter(self, amp):
+        return self.config.roller_diameter * (1 - (0.25 * ((amp + 1) * 0.5) ))
+
+    # race polyline at the top of the race (z = half_race_height), the ring
+    # has roller_count + 1 lobes, the disc roller_count - 1
+    def RingRacePoints(self, subsampling = None):
+        return self.RacePoints(*self.ring_race, subsampling = subsampling)
+
+    def DiscRacePoints(self, subsampling = None):
+        return self.RacePoints(*self.disc_race, subsampling = subsampling)
+
+    def RaceRadius(self, groove_root_radius, side, amp):
+        return groove_root_radius + side * self.TangentFunctionInverse(
+            self.config.roller_diameter,
+            self.ContactDiameter(amp),
+            self.half_race_height
+        )
+
+    def RacePoints(self, lobes, groove_root_radius, side, subsampling = None):
+        return list(self.IterRacePoints(lobes, groove_root_radius, side, subsampling))
+
+    # generates the race points one by one, for exports of large drives
+    def IterRacePoints(self, lobes, groove_root_radius, side, subsampling = None):
+        if subsampling is None:
+            subsampling = self.CURVE_SUBSAMPLING
+
+        # 1/4 phase, the ring leads and the disc lags
+        radOffset = -side * 2.0 * math.pi * 0.25 / lobes
+
+        div = lobes * subsampling
+        for i in range(0, div):
+            rad = 2.0 * math.pi * (i / div * 1.0)
+            amp = math.sin(rad * lobes)
+            o = self.RaceRadius(groove_root_radius, side, amp)
+            yield (
+                math.sin(rad + radOffset) * o,
+                math.cos(rad + radOffset) * o,
+                self.half_race_height
+            )
+
+    def RollerCenters(self):
+        radOffset = math.pi * 2.0 / self.config.roller_count
+        return [(
+            math.sin(radOffset * i) * self.median_radius,
+            math.cos(radOffset * i) * self.median_radius + self.y_offset,
+            0.0
+        ) for i in range(0, self.config.roller_count)]
@@ -0,0 +1,170 @@
+# Copyright (C) 2018  Martin Muehlhaeuser <github@mmone.de>
+
+import copy
+import math
+from . import DriveGeometry
+
+# Checks a config for geometry that can't be built before any CAD call is made.
+# All values in cm, errors are collected as user readable messages.
+class DriveValidator:
+    def __init__(self, drive_config, printer_config, min_wall = None):
+        self.config = drive_config
+        self.printer_config = printer_config
+        self.min_wall = min_wall if min_wall is not None else self.printer_config.ewToCm(2)
+        self.errors = []
+
+        self.CheckValues()
+        if self.errors:
+            return
+
+        self.geometry = DriveGeometry.DriveGeometry(drive_config, printer_config)
+        self.CheckCam()
+        self.CheckDisc()
+        self.CheckRing()
+        self.CheckLayers()
+        if 'Output' in self.config.components:
+            self.CheckOutput()
+
+    def IsValid(self):
+        return not self.errors
+
+    def Require(self, condition, message):
+        if not condition:
+            self.errors.append(message)
+
+    # minimal distance between the centers of count holes on a circle
+    @staticmethod
+    def HoleSpacing(circle_radius, count):
+        return 2.0 * circle_radius * math.sin(math.pi / count)
+
+    # largest value of the config attribute name up to value whose geometry
+    # passes check, None if even a small one fails. The checks only get
+    # tighter with a larger value
+    def Largest(self, name, value, check):
+        config = copy.copy(self.config)
+
+        def Passes(x):
+            setattr(config, name, x)
+            return check(DriveGeometry.DriveGeometry(config, self.printer_config))
+
+        low = value * 0.01
+        if not Passes(low):
+            return None
+        high = value
+        for i in range(0, 40):
+            middle = (low + high) * 0.5
+            if Passes(middle):
+                low = middle
+            else:
+                high = middle
+        return low
+
+    # requires check to pass for the config, else adds message with the
+    # largest value of name that would pass, shown in mm
+    def RequireAtMost(self, check, name, label, message):
+        if check(self.geometry):
+            return
+        limit = self.Largest(name, getattr(self.config, name), check)
+        if limit is None:
+            self.errors.append(message + '.')
+        else:
+            self.errors.append('{}, the {} must be {:.2f} mm or less.'.format(message, label, math.floor(limit * 1000.0) / 100.0))
+
+    def CheckValues(self):
+        c = self.config
+        self.Require(c.roller_count >= 6, 'The number of rollers must be 6 or more.')
+        self.Require(c.roller_diameter > 0, 'The roller diameter must be positive.')
+        self.Require(c.roller_spacing >= 0, 'The roller spacing must not be negative.')
+        self.Require(c.ring_bolt_count >= 3, 'The number of ring bolts must be 3 or more.')
+        self.Require(c.disc_bolt_count >= 3, 'The number of disc bolts must be 3 or more.')
+        self.Require(c.ring_bolt_diameter > 0 and c.disc_bolt_diameter > 0, 'Bolt diameters must be positive.')
+        self.Require(c.output_pin_diameter > 0, 'The output pin diameter must be positive.')
+        self.Require(c.cam_bearing_inner_diameter > 0, 'The cam bearing inner diameter must be positive.')
+        self.Require(c.cam_bearing_inner_diameter < c.cam_bearing_outer_diameter,
+            'The cam bearing inner diameter must be smaller than the outer diameter.')
+        self.Require(c.disc_count in (1, 2, 3), 'The number of discs must be 1, 2 or 3.')
+
+    def CheckCam(self):
+        # eccentric shaft hole of the cam
+        self.Require(
+            self.config.roller_diameter / 4.0 + DriveGeometry.DriveGeometry.CAM_SHAFT_RADIUS + self.min_wall < self.config.cam_bearing_inner_diameter * 0.5,
+            'The cam bearing inner diameter is too small for the eccentric shaft.'
+        )
+
+    def CheckDisc(self):
+        g = self.geometry
+        hole_radius = g.disc_bolt_hole_radius
+
+        self.Require(g.disc_groove_root_radius > 0, 'The disc race has no room, increase the number of rollers.')
+        self.Require(
+            g.disc_bolt_circle_radius - hole_radius > self.config.cam_bearing_outer_diameter * 0.5 + self.min_wall,
+            'The disc bolt circle lies inside the cam bearing.'
+        )
+        self.Require(
+            g.disc_bolt_circle_radius + hole_radius + self.min_wall < g.disc_slot_radius,
+            'The disc bolt holes cut into the cage slot.'
+        )
+        self.Require(
+            self.HoleSpacing(g.disc_bolt_circle_radius, self.config.disc_bolt_count) > self.config.disc_bolt_diameter + self.min_wall,
+            'The disc bolt holes overlap.'
+        )
+        # the turned layers have to line up on the same output pins
+        self.Require(
+            self.config.disc_bolt_count % self.config.disc_count == 0,
+            'The number of disc bolts must be a multiple of the number of discs.'
+        )
+
+    def CheckRing(self):
+        g = self.geometry
+
+        self.RequireAtMost(
+            lambda g: g.ring_bolt_circle_radius - g.ring_bolt_hole_radius > g.slot_radius + self.min_wall,
+            'roller_diameter', 'roller diameter',
+            'The ring bolt holes cut into the cage slot'
+        )
+        self.Require(
+            self.HoleSpacing(g.ring_bolt_circle_radius, self.config.ring_bolt_count) > self.config.ring_bolt_diameter + self.min_wall,
+            'The ring bolt holes overlap.'
+        )
+
+    # the parts of a turned layer have to keep to the race and cage slot
+    # of the ring the same as in the first layer
+    def CheckLayers(self):
+        g = self.geometry
+        for layer in range(1, g.disc_count):
+            of_disc = ' (disc {})'.format(layer + 1)
+            roller_reach = max(
+                math.hypot(*g.LayerPoint(layer, x, y, z)[:2]) for x, y, z in g.RollerCenters()
+            ) + g.roller_rad
+            cage_reach = math.hypot(*g.LayerPoint(layer, 0.0, g.y_offset, 0.0)[:2]) + g.cage_outer_radius
+
+            self.Require(
+                roller_reach < g.ring_groove_root_radius + 1e-6,
+                'The rollers cut into the ring race' + of_disc + '.'
+            )
+            self.Require(
+                cage_reach < g.slot_radius,
+                'The cage cuts into the cage slot of the ring' + of_disc + '.'
+            )
+
+    def CheckOutput(self):
+        g = self.geometry
+        cage_width = self.printer_config.ewToCm(3)
+        cage_race_gap = self.printer_config.ewToCm(2)
+
+        # pins of a turned disc that don't land on the output pins need
+        # larger output holes
+        for layer in range(0, g.disc_count):
+            of_disc = ' (disc {})'.format(layer + 1) if layer else ''
+            checks = [
+                (lambda g: g.disc_bolt_circle_radius + g.OutputHoleRadius(layer) + self.min_wall < g.disc_groove_root_radius,
+                    'The output pins collide with the disc race'),
+                (lambda g: g.disc_bolt_circle_radius - g.OutputHoleRadius(layer) > self.config.shaft_diameter * 0.5 + self.min_wall,
+                    'The output pins collide with the shaft'),
+                (lambda g: self.HoleSpacing(g.disc_bolt_circle_radius, self.config.disc_bolt_count) > g.OutputHoleRadius(layer) * 2 + self.min_wall,
+                    'The output pins overlap'),
+                (lambda g: g.disc_bolt_circle_radius + g.OutputHoleRadius(layer) + self.min_wall < g.ring_inner_radius - cage_width - 2 * cage_race_gap,
+                    'The output pins don\'t fit on the output disc')
+            ]
+            for check, message in checks:
+                self.RequireAtMost(check, 'output_pin_diameter', 'output pin diameter', message + of_disc)
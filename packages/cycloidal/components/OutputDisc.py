@@ -5,10 +5,11 @@ import math
 from . import helpers
 
 class OutputDisc:
-    def __init__(self, parent_compo, ui, ring_inner_radius, pin_circle_radius, bearing_plane, drive_config, printer_config):
+    def __init__(self, parent_compo, ui, ring_inner_radius, pin_circle_radius, pin_hole_radius, bearing_plane, drive_config, printer_config):
         self.ui = ui
         self.ring_inner_radius = ring_inner_radius
         self.pin_circle_radius = pin_circle_radius
+        self.pin_hole_radius = pin_hole_radius
         self.bearing_plane = bearing_plane
         self.drive_config = drive_config
         self.printer_config = printer_config
@@ -31,10 +32,7 @@ class OutputDisc:
         helpers.AddCircle(sketch, 0,0,0, self.drive_config.shaft_diameter * 0.5 )
         helpers.AddCircle(sketch, 0,0,0, self.ring_inner_radius - self.cage_width - 2 * self.cage_race_gap )
 
-        helpers.AddCircle(sketch,
-            0, self.pin_circle_radius, 0,
-            (self.drive_config.output_pin_diameter + self.drive_config.roller_diameter * 0.5) * 0.5
-        )
+        helpers.AddCircle(sketch, 0, self.pin_circle_radius, 0, self.pin_hole_radius)
         
         sketch.isComputeDeferred = False
         
@@ -66,7 +64,7 @@ class OutputDisc:
             ),
             self.compo.zConstructionAxis,
             self.drive_config.disc_bolt_count,
-            adsk.fusion.PatternComputeOptions.IdenticalPatternCompute
+            isolated = True
         )
 
         #filletEdges = adsk.core.ObjectCollection.create()
@@ -150,7 +148,8 @@ class OutputDisc:
                 hole
             ),
             self.compo.zConstructionAxis,
-            self.drive_config.disc_bolt_count
+            self.drive_config.disc_bolt_count,
+            isolated = True
         )
 
         out.bodies.item(0).name = "Cage"
\ No newline at end of file
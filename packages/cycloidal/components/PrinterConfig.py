@@ -1,5 +1,8 @@
 # Copyright (C) 2018  Martin Muehlhaeuser <github@mmone.de>
 
+import hashlib
+import json
+
 class PrinterConfig:
     def __init__(self, nozzle_width_mm, layer_height_mm):
         self.nozzle_width = nozzle_width_mm
@@ -9,4 +12,7 @@ class PrinterConfig:
         return layer_count * self.layer_height * 0.1
 
     def ewToCm(self, extrusion_count):
-        return extrusion_count * self.nozzle_width * 0.1
\ No newline at end of file
+        return extrusion_count * self.nozzle_width * 0.1
+
+    def Fingerprint(self):
+        return hashlib.sha1(json.dumps(self.__dict__, sort_keys=True).encode()).hexdigest()
\ No newline at end of file
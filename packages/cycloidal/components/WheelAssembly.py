@@ -167,7 +167,8 @@ class WheelAssembly:
             self.compo,
             input_entities, 
             self.compo.zConstructionAxis,
-            self.pin_count
+            self.pin_count,
+            isolated = True
         )
     
     def CreateRollerCage(self):
@@ -227,7 +228,8 @@ class WheelAssembly:
             self.compo,
             input_entities, 
             self.compo.zConstructionAxis,
-            12
+            12,
+            isolated = True
         )
 
         out.bodies.item(0).name = "Ball Cage"
\ No newline at end of file
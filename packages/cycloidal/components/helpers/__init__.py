@@ -50,12 +50,53 @@ def OneSideExtrude(component, profiles, offset, extend, direction, operation, bo
     #    feature.timelineObject.rollTo(False)
     return feature
 
-def CircularPattern(component, entities, axis, quantity, compute_option = None):
+# When enabled every pattern computed in a fast mode is recomputed once in
+# adjust mode and the resulting body volumes are compared. Patterns whose
+# volumes differ are left in adjust mode.
+VALIDATE_PATTERNS = False
+PATTERN_VOLUME_TOLERANCE = 1e-6
+
+def CircularPattern(component, entities, axis, quantity, compute_option = None, isolated = False):
+    # isolated: the patterned features only touch the body they were created on,
+    # so every instance terminates the same way and identical compute is safe
+    if compute_option is None and isolated:
+        compute_option = adsk.fusion.PatternComputeOptions.IdenticalPatternCompute
+
     circular_input = component.features.circularPatternFeatures.createInput(entities, axis)
     circular_input.quantity = adsk.core.ValueInput.createByReal(quantity)
-    if(compute_option):
+    if compute_option is not None:
         circular_input.patternComputeOption = compute_option
-    return component.features.circularPatternFeatures.add(circular_input)
+    pattern = component.features.circularPatternFeatures.add(circular_input)
+
+    if VALIDATE_PATTERNS and compute_option is not None \
+            and compute_option != adsk.fusion.PatternComputeOptions.AdjustPatternCompute:
+        ValidatePattern(pattern, compute_option)
+    return pattern
+
+def BodyVolumes(bodies):
+    return [bodies.item(i).volume for i in range(0, bodies.count)]
+
+def SetPatternComputeOption(pattern, compute_option):
+    pattern.timelineObject.rollTo(True)
+    pattern.patternComputeOption = compute_option
+    pattern.timelineObject.rollTo(False)
+
+def ValidatePattern(pattern, compute_option):
+    fast = BodyVolumes(pattern.bodies)
+    SetPatternComputeOption(pattern, adsk.fusion.PatternComputeOptions.AdjustPatternCompute)
+    adjusted = BodyVolumes(pattern.bodies)
+
+    matches = len(fast) == len(adjusted)
+    if matches:
+        for a, b in zip(fast, adjusted):
+            if abs(a - b) > PATTERN_VOLUME_TOLERANCE * max(abs(b), 1.0):
+                matches = False
+                break
+
+    # keep the slow but correct result when the fast mode differs
+    if matches:
+        SetPatternComputeOption(pattern, compute_option)
+    return matches
 
 def Mirror(component, entities, plane):
     mirror_input = component.features.mirrorFeatures.createInput(
@@ -78,6 +119,7 @@ def Combine(
         target_entity,
         collection
     )
+    create_input.operation = operation
     return component.features.combineFeatures.add(create_input)
 
 def Revolve(component, profile, axis, operation, bodies = None):
@@ -135,6 +177,91 @@ def AddLine(sketch, x1, y1, z1, x2, y2, z2, fixed = True):
     )
     line.isFixed = fixed
     return line
+
+# rotation about the z axis through (cx, cy) followed by a shift along z,
+# as given by DriveGeometry.LayerPlacement
+def PlacementMatrix(angle, cx, cy, dz):
+    mat = adsk.core.Matrix3D.create()
+    mat.setToRotation(angle, adsk.core.Vector3D.create(0, 0, 1), adsk.core.Point3D.create(cx, cy, 0))
+    shift = adsk.core.Matrix3D.create()
+    shift.translation = adsk.core.Vector3D.create(0, 0, dz)
+    mat.transformBy(shift)
+    return mat
+
+# adds a copy of bodies per matrix without recomputing the features that made
+# them, copies are numbered from 2 on like the layers they belong to
+def AddTransformedCopies(component, bodies, matrices):
+    temp_brep = adsk.fusion.TemporaryBRepManager.get()
+    copies = []
+    for i, mat in enumerate(matrices):
+        for body in bodies:
+            copy = temp_brep.copy(body)
+            temp_brep.transform(copy, mat)
+            copies.append((copy, '{} {}'.format(body.name, i + 2)))
+
+    added = []
+    if component.parentDesign.designType == adsk.fusion.DesignTypes.DirectDesignType:
+        for copy, name in copies:
+            body = component.bRepBodies.add(copy)
+            body.name = name
+            added.append(body)
+        return added
+
+    base = component.features.baseFeatures.add()
+    base.startEdit()
+    for copy, name in copies:
+        body = component.bRepBodies.add(copy, base)
+        body.name = name
+        added.append(body)
+    base.finishEdit()
+    return added
+
+def DeleteAll(collection):
+    for i in reversed(range(0, collection.count)):
+        # deleting a feature can take later ones with it
+        if i < collection.count:
+            collection.item(i).deleteMe()
+
+# Removes everything generated in component so a drive can be built into it
+# again. The component and the occurrences of it keep their identity, so
+# joints and references to them survive.
+def ClearComponent(component, keep_occurrences = False):
+    if not keep_occurrences:
+        DeleteAll(component.occurrences)
+    DeleteAll(component.features)
+    DeleteAll(component.sketches)
+    DeleteAll(component.constructionPlanes)
+    DeleteAll(component.constructionAxes)
+    DeleteAll(component.bRepBodies)
+
+# Replaces the features of component and the components below it by a single
+# base feature each holding copies of their bodies. Freezes in place like
+# ClearComponent, components used by several occurrences are frozen once.
+def FreezeComponent(component, frozen = None):
+    if frozen is None:
+        frozen = set()
+    if component.id in frozen:
+        return None
+    frozen.add(component.id)
+
+    for i in range(0, component.occurrences.count):
+        FreezeComponent(component.occurrences.item(i).component, frozen)
+
+    temp_brep = adsk.fusion.TemporaryBRepManager.get()
+    bodies = [component.bRepBodies.item(i) for i in range(0, component.bRepBodies.count)]
+    copies = [(temp_brep.copy(body), body.name, body.isLightBulbOn) for body in bodies]
+    ClearComponent(component, keep_occurrences = True)
+    if not copies:
+        return None
+
+    base = component.features.baseFeatures.add()
+    base.startEdit()
+    for copy, name, visible in copies:
+        body = component.bRepBodies.add(copy, base)
+        body.name = name
+        body.isLightBulbOn = visible
+    base.finishEdit()
+    return base
 '''
 def AddHex(sketch, width):
     inc = math.pi * 2.0 / 6.0
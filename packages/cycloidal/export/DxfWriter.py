@@ -0,0 +1,96 @@
+# Copyright (C) 2018  Martin Muehlhaeuser <github@mmone.de>
+
+# $INSUNITS codes
+UNITS = {
+    'in': 1,
+    'mm': 4,
+    'cm': 5
+}
+
+# Writes entities to an ASCII DXF as they come in. Polylines use the R12
+# POLYLINE/VERTEX form so vertices never have to be counted or held, splines
+# need the R2000 SPLINE entity which readers accept without the object tables.
+class DxfWriter:
+    def __init__(self, stream, units = 'mm', layers = (), splines = False):
+        self.stream = stream
+        self.write = stream.write
+        self.Pair(0, 'SECTION')
+        self.Pair(2, 'HEADER')
+        self.Pair(9, '$ACADVER')
+        self.Pair(1, 'AC1015' if splines else 'AC1009')
+        self.Pair(9, '$INSUNITS')
+        self.Pair(70, UNITS[units])
+        self.Pair(0, 'ENDSEC')
+
+        self.Pair(0, 'SECTION')
+        self.Pair(2, 'TABLES')
+        self.Pair(0, 'TABLE')
+        self.Pair(2, 'LAYER')
+        self.Pair(70, len(layers))
+        for i, layer in enumerate(layers):
+            self.Pair(0, 'LAYER')
+            self.Pair(2, layer)
+            self.Pair(70, 0)
+            self.Pair(62, i % 7 + 1)
+            self.Pair(6, 'CONTINUOUS')
+        self.Pair(0, 'ENDTAB')
+        self.Pair(0, 'ENDSEC')
+
+        self.Pair(0, 'SECTION')
+        self.Pair(2, 'ENTITIES')
+
+    def Pair(self, code, value):
+        if isinstance(value, float):
+            value = '{:.6f}'.format(value)
+        self.write('{}\n{}\n'.format(code, value))
+
+    def Point(self, x, y, code = 10):
+        self.Pair(code, float(x))
+        self.Pair(code + 10, float(y))
+        self.Pair(code + 20, 0.0)
+
+    def Circle(self, layer, x, y, radius):
+        self.Pair(0, 'CIRCLE')
+        self.Pair(8, layer)
+        self.Point(x, y)
+        self.Pair(40, float(radius))
+
+    # vertices are (x, y) or (x, y, bulge), the bulge bends the segment to
+    # the next vertex into an arc of 4 * atan(bulge)
+    def Polyline(self, layer, vertices, closed = True):
+        self.Pair(0, 'POLYLINE')
+        self.Pair(8, layer)
+        self.Pair(66, 1)
+        self.Point(0, 0)
+        self.Pair(70, 1 if closed else 0)
+        for vertex in vertices:
+            self.Pair(0, 'VERTEX')
+            self.Pair(8, layer)
+            self.Point(vertex[0], vertex[1])
+            if len(vertex) > 2 and vertex[2]:
+                self.Pair(42, float(vertex[2]))
+        self.Pair(0, 'SEQEND')
+        self.Pair(8, layer)
+
+    # cubic spline through count fit points
+    def Spline(self, layer, points, count, closed = True):
+        self.Pair(0, 'SPLINE')
+        self.Pair(100, 'AcDbEntity')
+        self.Pair(8, layer)
+        self.Pair(100, 'AcDbSpline')
+        self.Pair(70, (1 if closed else 0) | 8)
+        self.Pair(71, 3)
+        self.Pair(72, 0)
+        self.Pair(73, 0)
+        self.Pair(74, count + 1 if closed else count)
+        first = None
+        for point in points:
+            if first is None:
+                first = point
+            self.Point(point[0], point[1], 11)
+        if closed and first is not None:
+            self.Point(first[0], first[1], 11)
+
+    def Close(self):
+        self.Pair(0, 'ENDSEC')
+        self.Pair(0, 'EOF')
@@ -0,0 +1,103 @@
+# Copyright (C) 2018  Martin Muehlhaeuser <github@mmone.de>
+
+import os
+import adsk.core, adsk.fusion
+from . import PlateNester, ThreeMfWriter
+
+# Writes the bodies of one or more built drives to one 3MF per print plate.
+# Bodies are named like the builders named them, prefixed with the drive
+# when there are several, laid out by PlateNester and meshed one at a time.
+class PlateExporter:
+    def __init__(self, printer_config, nester = None, quality = None):
+        self.printer_config = printer_config
+        self.nester = nester if nester else PlateNester.PlateNester()
+        if quality is None:
+            quality = adsk.fusion.TriangleMeshQualityOptions.NormalQualityTriangleMesh
+        self.quality = quality
+
+    # (unique name, body) of every body below component, bodies inside
+    # occurrences are proxies placed like the occurrence
+    def Parts(self, component, prefix = ''):
+        parts = []
+        names = {}
+        def Add(bodies):
+            for i in range(0, bodies.count):
+                body = bodies.item(i)
+                name = prefix + body.name
+                names[name] = names.get(name, 0) + 1
+                if names[name] > 1:
+                    name = '{} {}'.format(name, names[name])
+                parts.append((name, body))
+        def Walk(occurrences):
+            for i in range(0, occurrences.count):
+                occurrence = occurrences.item(i)
+                Add(occurrence.bRepBodies)
+                Walk(occurrence.childOccurrences)
+        Add(component.bRepBodies)
+        Walk(component.occurrences)
+        return parts
+
+    def Metadata(self, plate, count):
+        return {
+            'Title': 'Plate {} of {}'.format(plate + 1, count),
+            'Application': 'CycloidalDrive',
+            'cycloidal:nozzle_width': self.printer_config.nozzle_width,
+            'cycloidal:layer_height': self.printer_config.layer_height,
+            'cycloidal:printer_config': self.printer_config.Fingerprint()
+        }
+
+    # flat node coordinates and indices of the body mesh as generators, in mm
+    def Mesh(self, body):
+        calculator = body.meshManager.createMeshCalculator()
+        calculator.setQuality(self.quality)
+        mesh = calculator.calculate()
+        coordinates = mesh.nodeCoordinatesAsFloat
+        indices = mesh.nodeIndices
+        vertices = ((coordinates[i] * 10.0, coordinates[i + 1] * 10.0, coordinates[i + 2] * 10.0)
+            for i in range(0, len(coordinates), 3))
+        triangles = ((indices[i], indices[i + 1], indices[i + 2]) for i in range(0, len(indices), 3))
+        return vertices, triangles
+
+    # 3MF transform that moves the body center to the origin, its bottom to
+    # z = 0 and then onto its place on the plate, in mm
+    @staticmethod
+    def Transform(box, placed):
+        cx = (box.minPoint.x + box.maxPoint.x) * 0.5
+        cy = (box.minPoint.y + box.maxPoint.y) * 0.5
+        m = placed.Matrix()
+        # rotation of the centered body, 3MF multiplies row vectors
+        tx = m[3] - (m[0] * cx + m[1] * cy)
+        ty = m[7] - (m[4] * cx + m[5] * cy)
+        tz = -box.minPoint.z
+        return [
+            m[0], m[4], m[8],
+            m[1], m[5], m[9],
+            m[2], m[6], m[10],
+            tx * 10.0, ty * 10.0, tz * 10.0
+        ]
+
+    # components are drive components, returns the written paths
+    def Write(self, directory, components, basename = 'plate'):
+        parts = []
+        for component in components:
+            prefix = component.name + ' ' if len(components) > 1 else ''
+            parts += self.Parts(component, prefix)
+
+        bodies = dict(parts)
+        footprints = []
+        for name, body in parts:
+            box = body.boundingBox
+            footprints.append((name, box.maxPoint.x - box.minPoint.x, box.maxPoint.y - box.minPoint.y))
+        plates = self.nester.Pack(footprints)
+
+        paths = []
+        for index, plate in enumerate(plates):
+            path = os.path.join(directory, '{}-{}.3mf'.format(basename, index + 1))
+            writer = ThreeMfWriter.ThreeMfWriter(path, self.Metadata(index, len(plates)))
+            for placed in plate:
+                body = bodies[placed.name]
+                vertices, triangles = self.Mesh(body)
+                writer.AddObject(placed.name, vertices, triangles, self.Transform(body.boundingBox, placed))
+            writer.Close()
+            paths.append(path)
+        return paths
@@ -0,0 +1,141 @@
+# Copyright (C) 2018  Martin Muehlhaeuser <github@mmone.de>
+
+class PlacedPart:
+    def __init__(self, name, plate, x, y, width, depth, rotated):
+        self.name = name
+        self.plate = plate
+        # center on the plate, footprint after rotation, all in cm
+        self.x = x
+        self.y = y
+        self.width = width
+        self.depth = depth
+        self.rotated = rotated
+
+    # row major 4x4 like Matrix3D.asArray, rotation about z then translation
+    def Matrix(self):
+        if self.rotated:
+            return [0.0, -1.0, 0.0, self.x, 1.0, 0.0, 0.0, self.y, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0]
+        return [1.0, 0.0, 0.0, self.x, 0.0, 1.0, 0.0, self.y, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0]
+
+    def ToDict(self):
+        return {
+            'name': self.name,
+            'plate': self.plate,
+            'x': self.x,
+            'y': self.y,
+            'rotated': self.rotated
+        }
+
+# Packs rectangular part footprints onto as many plates of the given size as
+# needed. Skyline bottom-left heuristic, largest parts first, parts may be
+# turned by 90 degrees. Parts keep spacing (cm) to each other and half of it
+# to the plate edges.
+class PlateNester:
+    def __init__(self, plate_width = 20.0, plate_depth = 20.0, spacing = 0.5):
+        self.plate_width = plate_width
+        self.plate_depth = plate_depth
+        self.spacing = spacing
+
+    # footprints from MassEstimator estimates, one per printed part
+    @staticmethod
+    def EstimateFootprints(estimates, prefix = ''):
+        footprints = []
+        for name, estimate in sorted(estimates.items()):
+            for i in range(0, estimate.quantity):
+                label = name if estimate.quantity == 1 else '{} {}'.format(name, i + 1)
+                footprints.append((prefix + label, estimate.bbox[0], estimate.bbox[1]))
+        return footprints
+
+    # footprints from the body bounding boxes of a built component and its
+    # children, in the orientation they were built in
+    @staticmethod
+    def BodyFootprints(component, prefix = ''):
+        footprints = []
+        for i in range(0, component.bRepBodies.count):
+            body = component.bRepBodies.item(i)
+            box = body.boundingBox
+            footprints.append((prefix + body.name, box.maxPoint.x - box.minPoint.x, box.maxPoint.y - box.minPoint.y))
+        for i in range(0, component.occurrences.count):
+            footprints += PlateNester.BodyFootprints(component.occurrences.item(i).component, prefix)
+        return footprints
+
+    # position of a width x depth rectangle on a skyline, (top, x, index) or None
+    def Fit(self, skyline, width, depth):
+        best = None
+        for i in range(0, len(skyline)):
+            x = skyline[i][0]
+            if x + width > self.plate_width + 1e-9:
+                break
+            y = 0.0
+            j = i
+            while j < len(skyline) and skyline[j][0] < x + width - 1e-9:
+                y = max(y, skyline[j][1])
+                j += 1
+            if y + depth > self.plate_depth + 1e-9:
+                continue
+            if best is None or (y + depth, x) < best[:2]:
+                best = (y + depth, x, i)
+        return best
+
+    # skyline segments are [x, height, width] from left to right
+    @staticmethod
+    def Raise(skyline, index, width, top):
+        x = skyline[index][0]
+        end = x + width
+        raised = skyline[:index] + [[x, top, width]]
+        for segment in skyline[index:]:
+            segment_end = segment[0] + segment[2]
+            if segment_end <= end + 1e-9:
+                continue
+            start = max(segment[0], end)
+            raised.append([start, segment[1], segment_end - start])
+
+        merged = [raised[0]]
+        for segment in raised[1:]:
+            if abs(segment[1] - merged[-1][1]) < 1e-9:
+                merged[-1][2] += segment[2]
+            else:
+                merged.append(segment)
+        return merged
+
+    # footprints are (name, width, depth), returns plates of PlacedPart, parts
+    # larger than a plate raise a ValueError
+    def Pack(self, footprints):
+        s = self.spacing
+        parts = sorted(footprints, key = lambda f: (max(f[1], f[2]), f[1] * f[2]), reverse = True)
+        plates = []
+        skylines = []
+
+        for name, width, depth in parts:
+            options = [(width + s, depth + s, False)]
+            if abs(width - depth) > 1e-9:
+                options.append((depth + s, width + s, True))
+
+            placed = False
+            for plate, skyline in enumerate(skylines):
+                best = None
+                for w, d, rotated in options:
+                    fit = self.Fit(skyline, w, d)
+                    if fit and (best is None or fit[:2] < best[0][:2]):
+                        best = (fit, w, d, rotated)
+                if best:
+                    (top, x, index), w, d, rotated = best
+                    skylines[plate] = self.Raise(skyline, index, w, top)
+                    plates[plate].append(PlacedPart(name, plate,
+                        x + w * 0.5, top - d * 0.5, w - s, d - s, rotated
+                    ))
+                    placed = True
+                    break
+
+            if not placed:
+                skyline = [[0.0, 0.0, self.plate_width]]
+                for w, d, rotated in options:
+                    fit = self.Fit(skyline, w, d)
+                    if fit:
+                        top, x, index = fit
+                        skylines.append(self.Raise(skyline, index, w, top))
+                        plates.append([PlacedPart(name, len(plates), x + w * 0.5, top - d * 0.5, w - s, d - s, rotated)])
+                        break
+                else:
+                    raise ValueError('{} ({:.1f} x {:.1f}cm) does not fit on a plate'.format(name, width, depth))
+        return plates
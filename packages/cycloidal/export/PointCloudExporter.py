@@ -0,0 +1,109 @@
+# Copyright (C) 2018  Martin Muehlhaeuser <github@mmone.de>
+
+import math
+import struct
+import sys
+from array import array
+from ..components import DriveGeometry
+
+# Binary race surface format, all little endian:
+#
+#   0    8s   magic b'CYCLPTS1'
+#   8    I    version, 1
+#   12   I    surface count
+#   16   8s   units, b'cm'
+#   24   ...  surface count entries of
+#        16s  name, zero padded (b'ring', b'disc')
+#        Q    byte offset of the points
+#        I    rows, samples along the race
+#        I    columns, samples across the race from z = -h to z = h
+#
+# The header is padded to HEADER_SIZE. The points of a surface are rows *
+# columns * 3 contiguous float32 x, y, z, row major, so with numpy
+#
+#   np.memmap(path, dtype='<f4', mode='r', offset=offset, shape=(rows, columns, 3))
+#
+# Column j lies at s = 2j / (columns - 1) - 1 between the groove root circle
+# (s = 0) and the race polyline at z = s * half_race_height, mirrored below.
+MAGIC = b'CYCLPTS1'
+VERSION = 1
+HEADER = '<8sII8s'
+ENTRY = '<16sQII'
+HEADER_SIZE = 256
+
+# rows generated and written at once
+CHUNK_ROWS = 4096
+
+class PointCloudExporter:
+    def __init__(self, drive_config, printer_config, subsampling = None):
+        self.geometry = DriveGeometry.DriveGeometry(drive_config, printer_config)
+        self.subsampling = subsampling
+
+    # rows and columns per surface for about points samples over both races
+    @staticmethod
+    def Shape(points, columns = 64):
+        return int(math.ceil(points / (2.0 * columns))), columns
+
+    def Write(self, path, points = 10 ** 7, columns = 64):
+        g = self.geometry
+        rows, columns = self.Shape(points, columns)
+        surfaces = [(b'ring', g.ring_race), (b'disc', g.disc_race)]
+        size = rows * columns * 3 * 4
+
+        with open(path, 'wb') as f:
+            header = struct.pack(HEADER, MAGIC, VERSION, len(surfaces), b'cm')
+            offset = HEADER_SIZE
+            for name, race in surfaces:
+                header += struct.pack(ENTRY, name, offset, rows, columns)
+                offset += size
+            f.write(header.ljust(HEADER_SIZE, b'\0'))
+
+            for name, race in surfaces:
+                self.WriteSurface(f, race, rows, columns)
+
+    def WriteSurface(self, f, race, rows, columns):
+        g = self.geometry
+        lobes, groove_root_radius, side = race
+        polyline = g.RacePoints(lobes, groove_root_radius, side, self.subsampling)
+        count = len(polyline)
+        height = g.half_race_height
+        steps = [2.0 * j / (columns - 1) - 1.0 for j in range(0, columns)]
+
+        for start in range(0, rows, CHUNK_ROWS):
+            chunk = array('f')
+            for i in range(start, min(rows, start + CHUNK_ROWS)):
+                # point on the race polyline as built
+                t = float(i) * count / rows
+                k = int(t)
+                frac = t - k
+                x0, y0, z0 = polyline[k % count]
+                x1, y1, z1 = polyline[(k + 1) % count]
+                x = x0 + (x1 - x0) * frac
+                y = y0 + (y1 - y0) * frac
+
+                # matching point of the groove root circle
+                scale = groove_root_radius / math.hypot(x, y)
+                rx = x * scale
+                ry = y * scale
+                dx = x - rx
+                dy = y - ry
+                for s in steps:
+                    a = abs(s)
+                    chunk.extend((rx + dx * a, ry + dy * a, height * s))
+            if sys.byteorder != 'little':
+                chunk.byteswap()
+            chunk.tofile(f)
+
+    # header of a written file as a list of (name, offset, rows, columns)
+    @staticmethod
+    def ReadHeader(path):
+        with open(path, 'rb') as f:
+            data = f.read(HEADER_SIZE)
+        magic, version, count, units = struct.unpack_from(HEADER, data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('{} is not a race point file'.format(path))
+        surfaces = []
+        for i in range(0, count):
+            name, offset, rows, columns = struct.unpack_from(ENTRY, data, struct.calcsize(HEADER) + i * struct.calcsize(ENTRY))
+            surfaces.append((name.rstrip(b'\0').decode(), offset, rows, columns))
+        return surfaces
@@ -0,0 +1,189 @@
+# Copyright (C) 2018  Martin Muehlhaeuser <github@mmone.de>
+
+import math
+from ..components import DriveGeometry
+from . import DxfWriter, SvgWriter
+
+# export units per cm
+UNIT_SCALES = {
+    'mm': 10.0,
+    'cm': 1.0,
+    'in': 1.0 / 2.54
+}
+
+PROFILES = ['Ring', 'Ring Keys', 'Disc', 'Cage', 'Brace']
+
+# the brace hub diameter and bolt ring wall from Brace
+BRACE_HUB_DIAMETER = 1.2
+BRACE_BOLT_WALL = 3 * 0.04
+
+# Writes the 2D outlines of a drive as DXF or SVG straight from the geometry,
+# each profile on its own layer, all centered on the drive axis. Race curves
+# are refined until the polyline stays within tolerance (cm) of the race.
+class ProfileExporter:
+    def __init__(self, drive_config, printer_config, units = 'mm', splines = False, tolerance = 0.001):
+        self.config = drive_config
+        self.geometry = DriveGeometry.DriveGeometry(drive_config, printer_config)
+        self.units = units
+        self.scale = UNIT_SCALES[units]
+        self.splines = splines
+        self.tolerance = tolerance
+
+    def Write(self, path, profiles = None):
+        if profiles is None:
+            profiles = PROFILES
+        with open(path, 'w') as stream:
+            if path.lower().endswith('.svg'):
+                writer = SvgWriter.SvgWriter(stream, self.units, self.Extent() * self.scale)
+            else:
+                writer = DxfWriter.DxfWriter(stream, self.units, profiles, self.splines)
+            for profile in profiles:
+                getattr(self, profile.replace(' ', ''))(writer, profile)
+            writer.Close()
+
+    def Extent(self):
+        g = self.geometry
+        brace = g.ring_bolt_circle_radius + self.config.ring_bolt_diameter * 0.5 + BRACE_BOLT_WALL
+        return max(g.ring_outer_radius, brace) * 1.05
+
+    def Scaled(self, points):
+        s = self.scale
+        for point in points:
+            yield (point[0] * s, point[1] * s) + tuple(point[2:])
+
+    def Circle(self, writer, layer, x, y, radius):
+        writer.Circle(layer, x * self.scale, y * self.scale, radius * self.scale)
+
+    def Holes(self, writer, layer, circle_radius, count, diameter):
+        for i in range(0, count):
+            rad = 2.0 * math.pi * i / count
+            self.Circle(writer, layer, math.sin(rad) * circle_radius, math.cos(rad) * circle_radius, diameter * 0.5)
+
+    # smallest power of two multiple of CURVE_SUBSAMPLING whose chords stay
+    # within tolerance of the race over one lobe
+    def Subsampling(self, lobes, groove_root_radius, side):
+        g = self.geometry
+        subsampling = g.CURVE_SUBSAMPLING
+        while subsampling < 4096:
+            div = lobes * subsampling
+            error = 0.0
+            for i in range(0, subsampling):
+                a0 = 2.0 * math.pi * i / div
+                a1 = 2.0 * math.pi * (i + 1) / div
+                r0 = g.RaceRadius(groove_root_radius, side, math.sin(a0 * lobes))
+                r1 = g.RaceRadius(groove_root_radius, side, math.sin(a1 * lobes))
+                rm = g.RaceRadius(groove_root_radius, side, math.sin((a0 + a1) * 0.5 * lobes))
+                chord = math.hypot(
+                    (math.sin(a0) * r0 + math.sin(a1) * r1) * 0.5,
+                    (math.cos(a0) * r0 + math.cos(a1) * r1) * 0.5
+                )
+                error = max(error, abs(rm - chord))
+            if error <= self.tolerance:
+                break
+            subsampling *= 2
+        return subsampling
+
+    def Race(self, writer, layer, race):
+        subsampling = self.Subsampling(*race)
+        points = self.Scaled(self.geometry.IterRacePoints(*race, subsampling = subsampling))
+        if self.splines:
+            writer.Spline(layer, points, race[0] * subsampling)
+        else:
+            writer.Polyline(layer, points)
+
+    def Ring(self, writer, layer):
+        g = self.geometry
+        self.Housing(writer, layer)
+        self.Race(writer, layer, g.ring_race)
+        self.Holes(writer, layer, g.ring_bolt_circle_radius, self.config.ring_bolt_count, self.config.ring_bolt_diameter)
+
+    # outer circle of the ring joined with the bolt bosses standing out of it
+    # like CreateRingHoles, counter clockwise along arcs of the circle and
+    # the bosses
+    def Housing(self, writer, layer):
+        g = self.geometry
+        outer = g.ring_outer_radius
+        boss = g.ring_bolt_boss_radius
+        distance = g.ring_bolt_circle_radius
+        count = self.config.ring_bolt_count
+        if distance + boss <= outer:
+            self.Circle(writer, layer, 0, 0, outer)
+            return
+
+        # half the angle of the circle cut away by a boss about the drive
+        # axis and of the boss arc outside the circle about the boss center
+        cut = math.acos(min(1.0, (outer ** 2 + distance ** 2 - boss ** 2) / (2.0 * outer * distance)))
+        arc = math.acos(max(-1.0, (outer ** 2 - distance ** 2 - boss ** 2) / (2.0 * distance * boss)))
+
+        bosses = sorted((math.pi * 0.5 - 2.0 * math.pi * i / count) % (2.0 * math.pi) for i in range(0, count))
+        vertices = []
+        for i, direction in enumerate(bosses):
+            following = bosses[(i + 1) % count] + (2.0 * math.pi if i + 1 == count else 0.0)
+            between = (following - cut) - (direction + cut)
+            vertices += [
+                (math.cos(direction - cut) * outer, math.sin(direction - cut) * outer, math.tan(arc * 0.5)),
+                (math.cos(direction + cut) * outer, math.sin(direction + cut) * outer, math.tan(max(between, 0.0) / 4.0))
+            ]
+        writer.Polyline(layer, self.Scaled(vertices))
+
+    # annular sectors between the ring bolts like CreateRingKeyFeatures
+    def RingKeys(self, writer, layer):
+        g = self.geometry
+        outer = g.ring_outer_radius
+        inner = outer - self.config.ring_bolt_diameter * 0.5
+        rad = 2.0 * math.pi / self.config.ring_bolt_count
+        # clockwise like the sketch, arcs bulge negative
+        bulge = -math.tan(rad * 0.5 / 4.0)
+        for i in range(0, self.config.ring_bolt_count):
+            start = rad * i + rad / 4.0
+            end = rad * i + rad - rad / 4.0
+            writer.Polyline(layer, self.Scaled([
+                (math.sin(start) * outer, math.cos(start) * outer, bulge),
+                (math.sin(end) * outer, math.cos(end) * outer, 0.0),
+                (math.sin(end) * inner, math.cos(end) * inner, -bulge),
+                (math.sin(start) * inner, math.cos(start) * inner, 0.0)
+            ]))
+
+    def Disc(self, writer, layer):
+        g = self.geometry
+        self.Race(writer, layer, g.disc_race)
+        self.Circle(writer, layer, 0, 0, self.config.cam_bearing_outer_diameter * 0.5)
+        self.Holes(writer, layer, g.disc_bolt_circle_radius, self.config.disc_bolt_count, self.config.disc_bolt_diameter)
+
+    # carrier rings and pockets like BuildRollerCage
+    def Cage(self, writer, layer):
+        g = self.geometry
+        self.Circle(writer, layer, 0, g.y_offset, g.cage_outer_radius)
+        self.Circle(writer, layer, 0, g.y_offset, g.cage_inner_radius)
+        for x, y, z in g.RollerCenters():
+            self.Circle(writer, layer, x, y, g.cage_pocket_radius)
+
+    # hub and arms joined by tangent lines like Brace, the outline runs
+    # counter clockwise around the hub and the bolt rings of all arms
+    def Brace(self, writer, layer):
+        g = self.geometry
+        count = self.config.ring_bolt_count
+        hub = BRACE_HUB_DIAMETER * 0.5
+        bolt = self.config.ring_bolt_diameter * 0.5 + BRACE_BOLT_WALL
+        distance = g.ring_bolt_circle_radius
+        spread = math.acos((hub - bolt) / distance)
+
+        arms = sorted((math.pi * 0.5 - 2.0 * math.pi * i / count) % (2.0 * math.pi) for i in range(0, count))
+        vertices = []
+        for i, direction in enumerate(arms):
+            following = arms[(i + 1) % count] + (2.0 * math.pi if i + 1 == count else 0.0)
+            hub_arc = (following - spread) - (direction + spread)
+            cx = math.cos(direction) * distance
+            cy = math.sin(direction) * distance
+            right = direction - spread
+            left = direction + spread
+            vertices += [
+                (math.cos(right) * hub, math.sin(right) * hub, 0.0),
+                (cx + math.cos(right) * bolt, cy + math.sin(right) * bolt, math.tan(spread * 0.5)),
+                (cx + math.cos(left) * bolt, cy + math.sin(left) * bolt, 0.0),
+                (math.cos(left) * hub, math.sin(left) * hub, math.tan(max(hub_arc, 0.0) / 4.0))
+            ]
+        writer.Polyline(layer, self.Scaled(vertices))
+
+        self.Circle(writer, layer, 0, 0, self.config.shaft_diameter * 0.5)
+        self.Holes(writer, layer, distance, count, self.config.ring_bolt_diameter)
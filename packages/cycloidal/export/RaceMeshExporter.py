@@ -0,0 +1,61 @@
+# Copyright (C) 2018  Martin Muehlhaeuser <github@mmone.de>
+
+import math
+from ..components import DriveGeometry
+from . import ThreeMfWriter
+
+# Writes the race solids of ring and disc as closed triangle meshes to 3MF
+# straight from the geometry, like BRepBackend.RaceSolid builds them: the race
+# polyline on top, the groove root circle in the middle and the mirrored
+# polyline below, capped by fans around the axis. Vertices and triangles are
+# generated while they are written, lengths in mm.
+class RaceMeshExporter:
+    def __init__(self, drive_config, printer_config, subsampling = None):
+        self.geometry = DriveGeometry.DriveGeometry(drive_config, printer_config)
+        self.printer_config = printer_config
+        self.subsampling = subsampling if subsampling else self.geometry.CURVE_SUBSAMPLING
+
+    def Races(self):
+        g = self.geometry
+        return [('Ring Race', g.ring_race), ('Disc Race', g.disc_race)]
+
+    # n top, n root, n bottom points, then the top and bottom cap centers
+    def Vertices(self, race):
+        g = self.geometry
+        lobes, groove_root_radius, side = race
+        for x, y, z in g.IterRacePoints(lobes, groove_root_radius, side, self.subsampling):
+            yield (x * 10.0, y * 10.0, z * 10.0)
+        for x, y, z in g.IterRacePoints(lobes, groove_root_radius, side, self.subsampling):
+            s = groove_root_radius / math.sqrt(x * x + y * y) * 10.0
+            yield (x * s, y * s, 0.0)
+        for x, y, z in g.IterRacePoints(lobes, groove_root_radius, side, self.subsampling):
+            yield (x * 10.0, y * 10.0, -z * 10.0)
+        yield (0.0, 0.0, g.half_race_height * 10.0)
+        yield (0.0, 0.0, -g.half_race_height * 10.0)
+
+    # the race points run clockwise seen from above, triangles are counter
+    # clockwise seen from outside
+    @staticmethod
+    def Triangles(n):
+        top_center = 3 * n
+        bottom_center = 3 * n + 1
+        for i in range(0, n):
+            j = (i + 1) % n
+            yield (i, j, n + j)
+            yield (i, n + j, n + i)
+            yield (2 * n + i, n + j, 2 * n + j)
+            yield (2 * n + i, n + i, n + j)
+            yield (top_center, j, i)
+            yield (bottom_center, 2 * n + i, 2 * n + j)
+
+    def Write(self, path, metadata = None):
+        if metadata is None:
+            metadata = {
+                'Application': 'CycloidalDrive',
+                'cycloidal:nozzle_width': self.printer_config.nozzle_width,
+                'cycloidal:layer_height': self.printer_config.layer_height
+            }
+        writer = ThreeMfWriter.ThreeMfWriter(path, metadata)
+        for name, race in self.Races():
+            writer.AddObject(name, self.Vertices(race), self.Triangles(race[0] * self.subsampling))
+        writer.Close()
@@ -0,0 +1,96 @@
+# Copyright (C) 2018  Martin Muehlhaeuser <github@mmone.de>
+
+import math
+
+# Writes entities to an SVG as they come in, one group per layer. The y axis
+# points up like in the drive geometry, coordinates are in the export units.
+class SvgWriter:
+    def __init__(self, stream, units = 'mm', extent = 100.0):
+        self.stream = stream
+        self.write = stream.write
+        self.layer = None
+        size = 2.0 * extent
+        self.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        self.write('<svg xmlns="http://www.w3.org/2000/svg" width="{0:.4f}{1}" height="{0:.4f}{1}" viewBox="{2:.4f} {2:.4f} {0:.4f} {0:.4f}">\n'.format(
+            size, units, -extent
+        ))
+        self.write('<g transform="scale(1,-1)" fill="none" stroke="black" stroke-width="{:.4f}">\n'.format(size * 0.0005))
+
+    def Layer(self, layer):
+        if layer == self.layer:
+            return
+        if self.layer is not None:
+            self.write('</g>\n')
+        self.write('<g id="{}">\n'.format(layer))
+        self.layer = layer
+
+    def Circle(self, layer, x, y, radius):
+        self.Layer(layer)
+        self.write('<circle cx="{:.6f}" cy="{:.6f}" r="{:.6f}"/>\n'.format(x, y, radius))
+
+    # vertices are (x, y) or (x, y, bulge) like in DxfWriter
+    def Polyline(self, layer, vertices, closed = True):
+        self.Layer(layer)
+        self.write('<path d="')
+        first = None
+        previous = None
+        for vertex in vertices:
+            if previous is None:
+                first = vertex
+                self.write('M{:.6f} {:.6f}'.format(vertex[0], vertex[1]))
+            else:
+                self.Segment(previous, vertex)
+            previous = vertex
+        if closed and first is not None:
+            self.Segment(previous, first)
+            self.write('Z')
+        self.write('"/>\n')
+
+    def Segment(self, start, end):
+        bulge = start[2] if len(start) > 2 else 0.0
+        if not bulge:
+            self.write('L{:.6f} {:.6f}'.format(end[0], end[1]))
+            return
+        angle = 4.0 * math.atan(bulge)
+        chord = math.hypot(end[0] - start[0], end[1] - start[1])
+        radius = chord / (2.0 * math.sin(abs(angle) * 0.5))
+        self.write('A{0:.6f} {0:.6f} 0 {1} {2} {3:.6f} {4:.6f}'.format(
+            radius, 1 if abs(angle) > math.pi else 0, 1 if bulge > 0 else 0, end[0], end[1]
+        ))
+
+    # closed Catmull-Rom spline through the points as cubic Bezier segments,
+    # only the first three points and a window of four are kept
+    def Spline(self, layer, points, count, closed = True):
+        self.Layer(layer)
+        self.write('<path d="')
+        head = []
+        window = []
+        for point in points:
+            if len(head) < 3:
+                head.append(point)
+            window.append(point)
+            if len(window) == 4:
+                self.Bezier(*window)
+                window.pop(0)
+            elif len(window) == 2:
+                self.write('M{:.6f} {:.6f}'.format(point[0], point[1]))
+        if closed:
+            for point in head:
+                window.append(point)
+                self.Bezier(*window)
+                window.pop(0)
+            self.write('Z')
+        self.write('"/>\n')
+
+    # segment from p1 to p2
+    def Bezier(self, p0, p1, p2, p3):
+        self.write('C{:.6f} {:.6f} {:.6f} {:.6f} {:.6f} {:.6f}'.format(
+            p1[0] + (p2[0] - p0[0]) / 6.0, p1[1] + (p2[1] - p0[1]) / 6.0,
+            p2[0] - (p3[0] - p1[0]) / 6.0, p2[1] - (p3[1] - p1[1]) / 6.0,
+            p2[0], p2[1]
+        ))
+
+    def Close(self):
+        if self.layer is not None:
+            self.write('</g>\n')
+        self.write('</g>\n</svg>\n')
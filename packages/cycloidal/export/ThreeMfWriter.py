@@ -0,0 +1,77 @@
+# Copyright (C) 2018  Martin Muehlhaeuser <github@mmone.de>
+
+import zipfile
+from xml.sax.saxutils import quoteattr, escape
+
+CONTENT_TYPES = '''<?xml version="1.0" encoding="UTF-8"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="model" ContentType="application/vnd.ms-package.3dmanufacturing-3dmodel+xml"/>
+</Types>
+'''
+
+RELS = '''<?xml version="1.0" encoding="UTF-8"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Target="/3D/3dmodel.model" Id="rel0" Type="http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel"/>
+</Relationships>
+'''
+
+# vertices and triangles written per write call
+CHUNK = 4096
+
+# Writes a 3MF package with one mesh object per part. Vertices and
+# triangles are streamed into the zip entry as they come in, the build
+# items with their transforms follow at the end. Lengths in mm.
+class ThreeMfWriter:
+    def __init__(self, path, metadata = None):
+        self.archive = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED)
+        self.archive.writestr('[Content_Types].xml', CONTENT_TYPES)
+        self.archive.writestr('_rels/.rels', RELS)
+        self.stream = self.archive.open('3D/3dmodel.model', 'w', force_zip64 = True)
+        self.items = []
+
+        self.Write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        self.Write('<model unit="millimeter" xml:lang="en-US" '
+            'xmlns="http://schemas.microsoft.com/3dmanufacturing/core/2015/02" '
+            'xmlns:cycloidal="http://blog.mmone.de/cycloidal-drive/">\n')
+        for name, value in sorted((metadata or {}).items()):
+            self.Write('<metadata name={}>{}</metadata>\n'.format(quoteattr(name), escape(str(value))))
+        self.Write('<resources>\n')
+
+    def Write(self, text):
+        self.stream.write(text.encode('utf-8'))
+
+    # vertices are (x, y, z) and triangles (a, b, c) vertex indices,
+    # transform is the 3MF 3x4 matrix m00 m01 m02 m10 ... m32
+    def AddObject(self, name, vertices, triangles, transform = None):
+        object_id = len(self.items) + 1
+        self.Write('<object id="{}" type="model" name={}>\n<mesh>\n<vertices>\n'.format(object_id, quoteattr(name)))
+        self.WriteChunks('<vertex x="{:.4f}" y="{:.4f}" z="{:.4f}"/>\n', vertices)
+        self.Write('</vertices>\n<triangles>\n')
+        self.WriteChunks('<triangle v1="{}" v2="{}" v3="{}"/>\n', triangles)
+        self.Write('</triangles>\n</mesh>\n</object>\n')
+        self.items.append((object_id, transform))
+        return object_id
+
+    def WriteChunks(self, pattern, rows):
+        chunk = []
+        for row in rows:
+            chunk.append(pattern.format(*row))
+            if len(chunk) == CHUNK:
+                self.Write(''.join(chunk))
+                chunk = []
+        if chunk:
+            self.Write(''.join(chunk))
+
+    def Close(self):
+        self.Write('</resources>\n<build>\n')
+        for object_id, transform in self.items:
+            if transform:
+                self.Write('<item objectid="{}" transform="{}"/>\n'.format(
+                    object_id, ' '.join('{:.6f}'.format(v) for v in transform)
+                ))
+            else:
+                self.Write('<item objectid="{}"/>\n'.format(object_id))
+        self.Write('</build>\n</model>\n')
+        self.stream.close()
+        self.archive.close()
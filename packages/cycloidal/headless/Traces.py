@@ -0,0 +1,222 @@
+# Copyright (C) 2018  Martin Muehlhaeuser <github@mmone.de>
+#
+# Golden traces of the Fusion API calls the builder makes for a set of
+# reference drives, recorded against the headless stand-in:
+#
+#   python -m cycloidal.headless.Traces            checks against the snapshots
+#   python -m cycloidal.headless.Traces --update   records new snapshots
+#
+# A check fails if a trace differs from its snapshot or if the number of API
+# calls, features, sketches or sketch entities rises by more than the
+# tolerance. Intended changes are accepted by recording new snapshots.
+
+import argparse
+import copy
+import difflib
+import hashlib
+import os
+import re
+import sys
+from ..components import DriveConfig, PrinterConfig
+from . import Recorder, Install, Build
+
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'traces')
+
+# settings that differ from the defaults, each exercises other build paths
+REFERENCE_CONFIGS = [
+    ('default', {}),
+    ('flat-rollers', {'roller_count': 15, 'instance_rollers': False, 'keep_history': False}),
+    ('two-discs', {'disc_count': 2, 'roller_count': 17, 'output_pin_diameter': 0.2}),
+    ('brep', {'solid_backend': 'brep'}),
+    ('ring-disc', {'components': set(['Ring', 'Disc']), 'chamfer_ring_bolt_holes': True, 'chamfer_disc_bolt_holes': True})
+]
+
+COUNTERS = [
+    ('api_calls', re.compile(r'')),
+    ('features', re.compile(r'\.\w+Features\.add\(')),
+    ('sketches', re.compile(r'\.sketches\.add\w*\(')),
+    ('sketch_entities', re.compile(r'\.sketch(?:Curves\.\w+|Points|Texts)\.add\w*\('))
+]
+
+# blocks of calls repeated this often are stored once with a digest of the rest
+MAX_PERIOD = 12
+MIN_REPEATS = 3
+# longer stretches without a milestone, like the faces of an in memory body,
+# keep their first lines and a digest of the rest
+MAX_STRETCH = 64
+STRETCH_KEEP = 8
+MILESTONE = re.compile(r'Features\.add\(|\.sketches\.add|\.name := |bRepBodies\.add|occurrences\.add')
+
+RESULT_ID = re.compile(r'#\d+')
+NUMBER = re.compile(r'(?<![\w.#])-?\d+(?:\.\d*)?(?:e[-+]?\d+)?')
+
+RECORDER = Recorder()
+
+def ReferenceConfig(name):
+    values = dict(REFERENCE_CONFIGS)[name]
+    drive_config = DriveConfig.DriveConfig()
+    for key, value in values.items():
+        setattr(drive_config, key, copy.copy(value))
+    return drive_config
+
+def Record(drive_config, printer_config):
+    Install(RECORDER)
+    RECORDER.Reset()
+    builder, result = Build(drive_config, printer_config)
+    if not result.Succeeded():
+        raise RuntimeError(result.Summary())
+    return list(RECORDER.trace)
+
+def Counts(trace):
+    return dict((name, sum(1 for line in trace if pattern.search(line))) for name, pattern in COUNTERS)
+
+# the line without result numbers, they shift with every call added before it
+def Unnumbered(line):
+    return RESULT_ID.sub('#', line)
+
+def Shape(line):
+    return NUMBER.sub('_', Unnumbered(line))
+
+# keeps the first block of every run of blocks with the same calls and
+# replaces the others by their count and a digest of their values
+def Compact(trace):
+    shapes = [Shape(line) for line in trace]
+    compact = []
+    i = 0
+    while i < len(trace):
+        best = None
+        for period in range(1, MAX_PERIOD + 1):
+            block = shapes[i:i + period]
+            if len(block) < period:
+                break
+            repeats = 1
+            while shapes[i + repeats * period:i + (repeats + 1) * period] == block:
+                repeats += 1
+            if repeats >= MIN_REPEATS and (not best or repeats * period > best[0] * best[1]):
+                best = (period, repeats)
+
+        if not best:
+            compact.append(trace[i])
+            i += 1
+            continue
+
+        period, repeats = best
+        compact += trace[i:i + period]
+        compact.append('... {} more of {} lines {}'.format(
+            repeats - 1, period, Digest(trace[i + period:i + repeats * period])
+        ))
+        i += period * repeats
+    return Fold(compact)
+
+def Digest(lines):
+    return hashlib.sha1('\n'.join(Unnumbered(line) for line in lines).encode()).hexdigest()[:12]
+
+def Fold(lines):
+    folded = []
+    stretch = []
+    for line in lines + [None]:
+        if line is not None and not MILESTONE.search(line):
+            stretch.append(line)
+            continue
+        if len(stretch) > MAX_STRETCH:
+            rest = stretch[STRETCH_KEEP:]
+            folded += stretch[:STRETCH_KEEP]
+            folded.append('... {} lines {}'.format(len(rest), Digest(rest)))
+        else:
+            folded += stretch
+        stretch = []
+        if line is not None:
+            folded.append(line)
+    return folded
+
+def SnapshotPath(name, directory):
+    return os.path.join(directory, name + '.trace')
+
+def WriteSnapshot(path, counts, compact):
+    with open(path, 'w') as f:
+        for name, pattern in COUNTERS:
+            f.write('# {} {}\n'.format(name, counts[name]))
+        for line in compact:
+            f.write(line + '\n')
+
+def ReadSnapshot(path):
+    counts = {}
+    compact = []
+    with open(path) as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if line.startswith('# '):
+                name, value = line[2:].split(' ')
+                counts[name] = int(value)
+            else:
+                compact.append(line)
+    return counts, compact
+
+# problems of the current trace of name compared to its snapshot
+def Check(name, printer_config, directory = SNAPSHOT_DIR, tolerance = 0.0, context = 40):
+    path = SnapshotPath(name, directory)
+    if not os.path.exists(path):
+        return ['{}: no snapshot, record one with --update'.format(name)]
+
+    trace = Record(ReferenceConfig(name), printer_config)
+    counts = Counts(trace)
+    expected_counts, expected = ReadSnapshot(path)
+
+    problems = []
+    for counter, pattern in COUNTERS:
+        limit = expected_counts.get(counter, 0) * (1.0 + tolerance)
+        if counts[counter] > limit:
+            problems.append('{}: {} rose from {} to {}'.format(name, counter, expected_counts.get(counter, 0), counts[counter]))
+
+    compact = Compact(trace)
+    if [Unnumbered(line) for line in compact] != [Unnumbered(line) for line in expected]:
+        diff = list(difflib.unified_diff(
+            [Unnumbered(line) for line in expected],
+            [Unnumbered(line) for line in compact],
+            'snapshot', 'current', lineterm = ''
+        ))
+        if len(diff) > context:
+            diff = diff[:context] + ['... {} more diff lines'.format(len(diff) - context)]
+        problems.append('{}: the trace differs from the snapshot\n{}'.format(name, '\n'.join(diff)))
+    return problems
+
+def Update(name, printer_config, directory = SNAPSHOT_DIR):
+    trace = Record(ReferenceConfig(name), printer_config)
+    os.makedirs(directory, exist_ok = True)
+    WriteSnapshot(SnapshotPath(name, directory), Counts(trace), Compact(trace))
+    return Counts(trace)
+
+def Main(argv = None):
+    parser = argparse.ArgumentParser(prog = 'python -m cycloidal.headless.Traces',
+        description = 'Checks the Fusion API calls of reference builds against their snapshots.'
+    )
+    parser.add_argument('names', nargs = '*', help = 'reference configs, all by default: ' + ', '.join(name for name, values in REFERENCE_CONFIGS))
+    parser.add_argument('--update', action = 'store_true', help = 'record new snapshots')
+    parser.add_argument('--tolerance', type = float, default = 0.0, help = 'allowed relative rise of the counts')
+    parser.add_argument('--directory', default = SNAPSHOT_DIR)
+    args = parser.parse_args(argv)
+
+    names = args.names if args.names else [name for name, values in REFERENCE_CONFIGS]
+    known = dict(REFERENCE_CONFIGS)
+    for name in names:
+        if name not in known:
+            parser.error('unknown reference config {}'.format(name))
+
+    printer_config = PrinterConfig.PrinterConfig(0.4, 0.2)
+    failed = False
+    for name in names:
+        if args.update:
+            counts = Update(name, printer_config, args.directory)
+            print('{}: {}'.format(name, ', '.join('{} {}'.format(counter, counts[counter]) for counter, pattern in COUNTERS)))
+            continue
+
+        problems = Check(name, printer_config, args.directory, args.tolerance)
+        for problem in problems:
+            print(problem)
+        if not problems:
+            print('{}: ok'.format(name))
+        failed = failed or bool(problems)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(Main())
@@ -0,0 +1,143 @@
+# Copyright (C) 2018  Martin Muehlhaeuser <github@mmone.de>
+
+import sys
+import threading
+
+# Stand-in for the adsk modules so the builders can run without Fusion.
+# Every attribute, call and collection item resolves to another stand-in,
+# collections report a count of zero.
+class Stub:
+    def __init__(self, name):
+        object.__setattr__(self, '_name', name)
+
+    def __getattr__(self, attr):
+        if attr.startswith('__'):
+            raise AttributeError(attr)
+        if attr == 'count':
+            return 0
+        child = Stub(self._name + '.' + attr)
+        object.__setattr__(self, attr, child)
+        return child
+
+    def __call__(self, *args, **kwargs):
+        return Stub(self._name + '()')
+
+    def __iter__(self):
+        return iter(())
+
+    def __bool__(self):
+        return True
+
+    def __index__(self):
+        return 0
+
+    def __float__(self):
+        return 0.0
+
+    # allows subclassing the event handler base classes
+    def __mro_entries__(self, bases):
+        return (object,)
+
+    def __repr__(self):
+        return '<{}>'.format(self._name)
+
+MAX_STRING = 80
+
+# Collects the calls and property sets made on RecordingStubs in order, one
+# line each like '#3 = #1.sketches.add(#2)'. Call results are numbered from 1
+# on after every Reset, floats are rounded to 6 digits so traces of the same
+# build compare equal.
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.Reset()
+
+    def Reset(self):
+        self.trace = []
+        self.results = 0
+
+    def Format(self, value):
+        if isinstance(value, Stub):
+            return value._name
+        if isinstance(value, float):
+            return '{:.6g}'.format(value + 0.0 if value else 0.0)
+        # long strings like pickled configs are given by length, the order
+        # of pickled sets changes from run to run
+        if isinstance(value, str) and len(value) > MAX_STRING:
+            return '<{} chars>'.format(len(value))
+        if isinstance(value, (bool, int, str)) or value is None:
+            return repr(value)
+        if isinstance(value, (list, tuple)):
+            return '[' + ', '.join(self.Format(item) for item in value) + ']'
+        if isinstance(value, dict):
+            return '{' + ', '.join('{}: {}'.format(self.Format(k), self.Format(v)) for k, v in sorted(value.items())) + '}'
+        return type(value).__name__
+
+    def Call(self, name, args, kwargs):
+        arguments = [self.Format(arg) for arg in args]
+        arguments += ['{}={}'.format(key, self.Format(value)) for key, value in sorted(kwargs.items())]
+        with self.lock:
+            self.results += 1
+            result = '#{}'.format(self.results)
+            self.trace.append('{} = {}({})'.format(result, name, ', '.join(arguments)))
+        return result
+
+    def Set(self, name, value):
+        with self.lock:
+            self.trace.append('{} := {}'.format(name, self.Format(value)))
+
+# Stand-in that reports to a Recorder. Attributes read from a call result are
+# named after its number, so the trace stays short however deep the chain.
+class RecordingStub(Stub):
+    def __init__(self, name, recorder):
+        Stub.__init__(self, name)
+        object.__setattr__(self, '_recorder', recorder)
+
+    def __getattr__(self, attr):
+        if attr.startswith('__'):
+            raise AttributeError(attr)
+        if attr == 'count':
+            return 0
+        child = RecordingStub(self._name + '.' + attr, self._recorder)
+        object.__setattr__(self, attr, child)
+        return child
+
+    def __call__(self, *args, **kwargs):
+        return RecordingStub(self._recorder.Call(self._name, args, kwargs), self._recorder)
+
+    def __setattr__(self, attr, value):
+        self._recorder.Set(self._name + '.' + attr, value)
+        object.__setattr__(self, attr, value)
+
+# registers the stand-in unless the real adsk modules are loaded, with a
+# recorder the stand-in records into it. The adsk modules are bound on
+# import, so recording has to be installed before the first build.
+def Install(recorder = None):
+    if 'adsk' in sys.modules:
+        adsk = sys.modules['adsk']
+        if recorder and getattr(adsk, '_recorder', None) is not recorder:
+            raise RuntimeError('adsk is already loaded without this recorder')
+        return adsk
+
+    adsk = RecordingStub('adsk', recorder) if recorder else Stub('adsk')
+    sys.modules['adsk'] = adsk
+    for name in ('core', 'fusion', 'cam'):
+        sys.modules['adsk.' + name] = getattr(adsk, name)
+    return adsk
+
+# runs the builder against the stand-in, returns the builder and its build
+# result which is also written to result_path as json if given. Configs that
+# can't be built raise a ValueError.
+def Build(drive_config, printer_config, result_path = None):
+    from ..components import DriveValidator
+    validator = DriveValidator.DriveValidator(drive_config, printer_config)
+    if not validator.IsValid():
+        raise ValueError(' '.join(validator.errors))
+
+    adsk = Install()
+    from .. import CycloidalComponent
+
+    builder = CycloidalComponent.CycloidalComponent(adsk.fusion.Design(), None, drive_config, printer_config)
+    if result_path:
+        builder.result.WriteJson(result_path)
+    return builder, builder.result